@@ -0,0 +1,46 @@
+"""add sync change journal
+
+Revision ID: a3c91e2f7d10
+Revises: 6cfe603e6a0b, f519cb2005c2
+Create Date: 2026-10-18 10:12:41.208334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91e2f7d10'
+down_revision: Union[str, Sequence[str], None] = ('6cfe603e6a0b', 'f519cb2005c2')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'sync_changes',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(length=16), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('old_path', sa.String(), nullable=True),
+        sa.Column('is_dir', sa.Boolean(), server_default='false', nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_changes_id'), 'sync_changes', ['id'], unique=False)
+    op.create_index('ix_sync_changes_user_id_id', 'sync_changes', ['user_id', 'id'], unique=False)
+    op.add_column('devices', sa.Column('last_change_cursor', sa.BigInteger(), server_default='0', nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('devices', 'last_change_cursor')
+    op.drop_index('ix_sync_changes_user_id_id', table_name='sync_changes')
+    op.drop_index(op.f('ix_sync_changes_id'), table_name='sync_changes')
+    op.drop_table('sync_changes')
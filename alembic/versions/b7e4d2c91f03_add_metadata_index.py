@@ -0,0 +1,54 @@
+"""add metadata index columns to files and folders
+
+Revision ID: b7e4d2c91f03
+Revises: a3c91e2f7d10
+Create Date: 2026-10-18 16:40:12.517204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d2c91f03'
+down_revision: Union[str, Sequence[str], None] = 'a3c91e2f7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Both tables were never written before the index, so they are empty
+    op.add_column('files', sa.Column('path', sa.String(), nullable=False))
+    op.add_column('files', sa.Column('parent_path', sa.String(), nullable=False))
+    op.add_column('files', sa.Column('mtime', sa.Float(), nullable=False))
+    op.add_column('files', sa.Column('mime_type', sa.String(length=255), nullable=True))
+    op.add_column('files', sa.Column('hash', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_files_user_id_path', 'files', ['user_id', 'path'])
+    op.create_index('ix_files_user_id_parent_path', 'files', ['user_id', 'parent_path'], unique=False)
+
+    op.add_column('folders', sa.Column('parent_path', sa.String(), nullable=True))
+    op.add_column('folders', sa.Column('mtime', sa.Float(), nullable=True))
+    # Folder paths are relative to each user's root now, so only unique per user
+    op.drop_constraint('folders_path_key', 'folders', type_='unique')
+    op.create_unique_constraint('uq_folders_user_id_path', 'folders', ['user_id', 'path'])
+    op.create_index('ix_folders_user_id_parent_path', 'folders', ['user_id', 'parent_path'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_folders_user_id_parent_path', table_name='folders')
+    op.drop_constraint('uq_folders_user_id_path', 'folders', type_='unique')
+    op.create_unique_constraint('folders_path_key', 'folders', ['path'])
+    op.drop_column('folders', 'mtime')
+    op.drop_column('folders', 'parent_path')
+
+    op.drop_index('ix_files_user_id_parent_path', table_name='files')
+    op.drop_constraint('uq_files_user_id_path', 'files', type_='unique')
+    op.drop_column('files', 'hash')
+    op.drop_column('files', 'mime_type')
+    op.drop_column('files', 'mtime')
+    op.drop_column('files', 'parent_path')
+    op.drop_column('files', 'path')
@@ -0,0 +1,39 @@
+"""add folder listing sort indexes
+
+Revision ID: c4a81f6e2d57
+Revises: b7e4d2c91f03
+Create Date: 2026-10-18 18:05:33.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a81f6e2d57'
+down_revision: Union[str, Sequence[str], None] = 'b7e4d2c91f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The name indexes cover lookups by parent too, so they replace those
+    op.drop_index('ix_files_user_id_parent_path', table_name='files')
+    op.create_index('ix_files_listing_name', 'files', ['user_id', 'parent_path', 'filename'], unique=False)
+    op.create_index('ix_files_listing_size', 'files', ['user_id', 'parent_path', 'size', 'filename'], unique=False)
+    op.create_index('ix_files_listing_mtime', 'files', ['user_id', 'parent_path', 'mtime', 'filename'], unique=False)
+    op.drop_index('ix_folders_user_id_parent_path', table_name='folders')
+    op.create_index('ix_folders_listing_name', 'folders', ['user_id', 'parent_path', 'name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_folders_listing_name', table_name='folders')
+    op.create_index('ix_folders_user_id_parent_path', 'folders', ['user_id', 'parent_path'], unique=False)
+    op.drop_index('ix_files_listing_mtime', table_name='files')
+    op.drop_index('ix_files_listing_size', table_name='files')
+    op.drop_index('ix_files_listing_name', table_name='files')
+    op.create_index('ix_files_user_id_parent_path', 'files', ['user_id', 'parent_path'], unique=False)
@@ -0,0 +1,37 @@
+"""add trigram index for filename search
+
+Revision ID: d2f7a9c3e615
+Revises: c4a81f6e2d57
+Create Date: 2026-10-18 19:22:08.341570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7a9c3e615'
+down_revision: Union[str, Sequence[str], None] = 'c4a81f6e2d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lets PostgreSQL answer ILIKE/LIKE '%term%' on filenames from an index;
+    # other databases scan the user's rows
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_files_filename_trgm ON files USING gin (lower(filename) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_files_path_trgm ON files USING gin (lower(path) gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_files_path_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_files_filename_trgm')
@@ -0,0 +1,48 @@
+"""add content index tables
+
+Revision ID: e8b3c5d1a9f2
+Revises: d2f7a9c3e615
+Create Date: 2026-10-18 21:05:47.103922
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3c5d1a9f2'
+down_revision: Union[str, Sequence[str], None] = 'd2f7a9c3e615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'content_documents',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('length', sa.Integer(), nullable=False),
+        sa.Column('terms', sa.Integer(), nullable=False),
+        sa.Column('truncated', sa.Boolean(), nullable=False),
+        sa.Column('indexed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_table(
+        'content_postings',
+        sa.Column('term', sa.String(length=64), nullable=False),
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['hash'], ['content_documents.hash'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('term', 'hash')
+    )
+    op.create_index('ix_content_postings_hash', 'content_postings', ['hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_content_postings_hash', table_name='content_postings')
+    op.drop_table('content_postings')
+    op.drop_table('content_documents')
@@ -0,0 +1,29 @@
+"""add content posting offsets
+
+Revision ID: f3d6a2b8c4e1
+Revises: e8b3c5d1a9f2
+Create Date: 2026-10-18 23:12:09.418527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3d6a2b8c4e1'
+down_revision: Union[str, Sequence[str], None] = 'e8b3c5d1a9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postings indexed before this have no offset, their snippets scan the start of the file
+    op.add_column('content_postings', sa.Column('offset', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('content_postings', 'offset')
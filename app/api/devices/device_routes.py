@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api.dependencies import get_current_user, get_db
 from app.models.user import User
@@ -11,6 +12,7 @@ from app.schemas.device import (
 )
 from app.services.devices.device_utils import sanitize_folder_name, get_unique_folder_name
 from app.core.config import config
+from app.services.sync.change_journal import record_change
 import os
 import uuid
 import logging
@@ -59,6 +61,7 @@ async def register_device(
         # Create the device folder on filesystem
         user_base_path = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
         device_folder_path = os.path.join(user_base_path, folder_name)
+        folder_existed = os.path.isdir(device_folder_path)
         os.makedirs(device_folder_path, exist_ok=True)
         
         # Create device in database
@@ -78,6 +81,9 @@ async def register_device(
         db.add(new_device)
         db.commit()
         db.refresh(new_device)
+
+        if not folder_existed:
+            await run_in_threadpool(record_change, user, "create", device_folder_path, is_dir=True, db=db)
         
         logger.info(f"Device registered: {device_id} - {device_data.device_name}")
         
@@ -209,6 +215,7 @@ async def delete_device(
                 import shutil
                 shutil.rmtree(device_folder_path)
                 logger.info(f"Deleted device folder: {device_folder_path}")
+                await run_in_threadpool(record_change, user, "delete", device_folder_path, is_dir=True, db=db)
             
             # Delete device record
             db.delete(device)
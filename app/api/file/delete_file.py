@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.services.file.deleteFile import DeleteFile
@@ -18,7 +19,7 @@ async def delete_file(file_path: str, user: User = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Invalid file path")
 
     try:
-        DeleteFile(file_path, user)
+        await run_in_threadpool(DeleteFile, file_path, user)
     except:
         raise HTTPException(status_code=500, detail="Failed to delete file")
 
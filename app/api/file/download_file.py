@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.core.config import config
+from app.services.file.range_requests import RangedFileResponse
+from app.services.file.conditional_requests import file_etag, is_not_modified, not_modified_response
 import os
 import mimetypes
 
@@ -10,7 +11,7 @@ download_file_router = APIRouter()
 
 
 @download_file_router.get("/download/{path:path}")
-async def download_file(path: str, user: User = Depends(get_current_user)):
+async def download_file(path: str, request: Request, user: User = Depends(get_current_user)):
     """
     Download a specific file from the server.
     Returns the file with proper headers to trigger browser download.
@@ -50,10 +51,19 @@ async def download_file(path: str, user: User = Depends(get_current_user)):
     # Get just the filename (not the full path)
     filename = os.path.basename(file_path)
 
-    # Return file with download headers
-    return FileResponse(
+    # ETag from the content hash once known; unchanged files are answered
+    # with 304 without being read
+    stat_info = os.stat(file_path)
+    etag = await file_etag(file_path, stat_info)
+    if is_not_modified(request.headers, etag, stat_info.st_mtime):
+        return not_modified_response(etag, stat_info.st_mtime)
+
+    # Return file with download headers; Range requests let clients resume
+    # or fetch segments in parallel
+    return RangedFileResponse(
         path=file_path,
         media_type=mime_type,
         filename=filename,
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "ETag": etag},
+        stat_result=stat_info,
     )
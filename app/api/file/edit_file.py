@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from pydantic import BaseModel
@@ -6,6 +7,8 @@ import os
 from app.core.config import config
 from fastapi.exceptions import HTTPException
 import logging
+from app.services.sync.change_journal import record_change
+from app.services.file.content_index import TEXT_DOCUMENT_EXTENSIONS
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +34,7 @@ async def edit_file(
     """
     try:
         # check if path exists and if it is of a text-based file
-        if not request.file_path.endswith((".txt", ".md", ".json", ".csv")):
+        if not request.file_path.endswith(TEXT_DOCUMENT_EXTENSIONS):
             raise HTTPException(
                 status_code=400,
                 detail="Invalid file type. Only text-based files are allowed.",
@@ -67,6 +70,8 @@ async def edit_file(
         with open(full_path, "w") as file:
             file.write(content)
 
+        await run_in_threadpool(record_change, user, "modify", full_path, size=os.path.getsize(full_path))
+
         return {"message": "File edited successfully"}
     except HTTPException:
         raise
@@ -0,0 +1,224 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from app.api.dependencies import get_current_user, get_db
+from app.models.user import User
+from app.core.config import config
+from app.services.upload.upload_sessions import upload_sessions
+from app.services.sync.change_journal import record_changes
+from app.services.media.thumbnails import thumbnail_service
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import os
+import re
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+raw_upload_router = APIRouter()
+
+# Buffer request body data up to this size before each write
+RAW_WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # 4 MB
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+def parse_content_range(value: str) -> tuple[int, int, int]:
+    """Parse 'bytes start-end/total' into (start, end exclusive, total)."""
+    match = CONTENT_RANGE_PATTERN.match(value.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range header")
+
+    start, last, total = (int(group) for group in match.groups())
+    if start > last or last >= total:
+        raise HTTPException(status_code=416, detail="Invalid Content-Range header")
+    return start, last + 1, total
+
+
+def partial_path_for(file_path: str) -> str:
+    """Hidden file collecting a ranged upload next to its destination"""
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.part")
+
+
+def total_path_for(partial_path: str) -> str:
+    """File recording the total size the first piece of a ranged upload declared"""
+    return f"{partial_path}.total"
+
+
+def read_total(partial_path: str) -> Optional[int]:
+    try:
+        with open(total_path_for(partial_path)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def write_total(partial_path: str, total: int):
+    with open(total_path_for(partial_path), "w") as f:
+        f.write(str(total))
+
+
+def pwrite_all(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        count = os.pwrite(fd, view, offset)
+        offset += count
+        view = view[count:]
+
+
+def fsync_and_close(fd: int):
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def stream_to_fd(request: Request, fd: int, offset: int, limit: Optional[int]) -> int:
+    """
+    Write the request body to fd starting at offset, in large buffered writes.
+    Returns the number of bytes written. limit caps the body length.
+    """
+    written = 0
+    buffer = bytearray()
+
+    async for data in request.stream():
+        if limit is not None and written + len(buffer) + len(data) > limit:
+            raise HTTPException(status_code=400, detail="Body is larger than Content-Range")
+        buffer += data
+        if len(buffer) >= RAW_WRITE_BUFFER_SIZE:
+            await run_in_threadpool(pwrite_all, fd, bytes(buffer), offset + written)
+            written += len(buffer)
+            buffer.clear()
+
+    if buffer:
+        await run_in_threadpool(pwrite_all, fd, bytes(buffer), offset + written)
+        written += len(buffer)
+
+    return written
+
+
+@raw_upload_router.put("/raw/{path:path}")
+async def raw_upload(
+    path: str,
+    request: Request,
+    content_range: Optional[str] = Header(None),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload a file as the raw request body, streamed straight to disk
+    without multipart parsing or a spooled temporary copy.
+
+    Without Content-Range the body replaces the whole file. With
+    'Content-Range: bytes start-end/total' the ranges are appended in order
+    to a hidden partial file; the response's Range header tells the client
+    how much has been received, and the file is moved into place once the
+    last byte arrives. Every piece must declare the total of the first.
+    """
+    path = path.strip()
+    if not path:
+        raise HTTPException(status_code=400, detail="File path is required")
+
+    base_path = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
+    file_path = os.path.join(base_path, path)
+
+    # Security check: ensure file is within user's directory
+    file_path = os.path.realpath(file_path)
+    base_path = os.path.realpath(base_path)
+    try:
+        if os.path.commonpath([file_path, base_path]) != base_path or file_path == base_path:
+            raise HTTPException(status_code=403, detail="Access denied")
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if os.path.isdir(file_path):
+        raise HTTPException(status_code=400, detail="Path is a directory")
+
+    directory, filename = os.path.split(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    if content_range is None:
+        start, end, total = 0, None, None
+        target_path = os.path.join(directory, f".{filename}.upload-{uuid.uuid4().hex}")
+    else:
+        start, end, total = parse_content_range(content_range)
+        target_path = partial_path_for(file_path)
+
+    # Only one request may write a given partial file at a time
+    lock = upload_sessions.path_lock(target_path)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Upload already in progress")
+
+    try:
+        fd = os.open(target_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if total is not None:
+                received = os.fstat(fd).st_size
+                expected_total = read_total(target_path) if received else None
+                if expected_total is not None and expected_total != total:
+                    os.close(fd)
+                    return JSONResponse(
+                        status_code=409,
+                        content={"detail": "Content-Range total does not match the upload in progress"},
+                        headers={"Range": f"bytes=0-{received - 1}"},
+                    )
+                if received > total:
+                    os.ftruncate(fd, 0)
+                    received = 0
+                if expected_total is None:
+                    write_total(target_path, total)
+                if start != received:
+                    os.close(fd)
+                    return JSONResponse(
+                        status_code=409,
+                        content={"detail": "Content-Range does not start at the received offset"},
+                        headers={"Range": f"bytes=0-{received - 1}"} if received else {},
+                    )
+
+            limit = end - start if end is not None else None
+            written = await stream_to_fd(request, fd, start, limit)
+            if limit is not None and written != limit:
+                # The bytes that landed stay in the partial file for a resume
+                raise HTTPException(status_code=400, detail="Body is shorter than Content-Range")
+        except BaseException:
+            os.close(fd)
+            if total is None:
+                os.remove(target_path)
+            raise
+        await run_in_threadpool(fsync_and_close, fd)
+        received = start + written
+
+        if total is not None and received < total:
+            return JSONResponse(
+                status_code=202,
+                content={"success": True, "complete": False, "received": received, "total": total},
+                headers={"Range": f"bytes=0-{received - 1}"},
+            )
+
+        existed = os.path.exists(file_path)
+        os.replace(target_path, file_path)
+        if total is not None:
+            os.remove(total_path_for(target_path))
+    finally:
+        lock.release()
+        upload_sessions.release_path_lock(target_path)
+
+    # The temp files are gone as well, drop any rows an older index has for them
+    temp_paths = [target_path] if total is None else [target_path, total_path_for(target_path)]
+    await run_in_threadpool(
+        record_changes,
+        user,
+        [{"action": "delete", "path": path} for path in temp_paths]
+        + [{"action": "modify" if existed else "create", "path": file_path, "size": received}],
+        db=db,
+    )
+    thumbnail_service.schedule(file_path)
+
+    return {
+        "success": True,
+        "complete": True,
+        "file_location": file_path,
+        "size": received,
+    }
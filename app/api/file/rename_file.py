@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.services.file.renameFile import RenameMyFile
@@ -30,7 +31,7 @@ async def rename_file(
         raise HTTPException(status_code=400, detail="Invalid file path or new name")
 
     try:
-        new_file_location = RenameMyFile(old_file_path, new_file_name, user)
+        new_file_location = await run_in_threadpool(RenameMyFile, old_file_path, new_file_name, user)
         return JSONResponse(
             status_code=200,
             content={
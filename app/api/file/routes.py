@@ -1,16 +1,24 @@
 from fastapi import APIRouter
 from app.api.file.upload_file import upload_router
+from app.api.file.upload_session import upload_session_router
+from app.api.file.raw_upload import raw_upload_router
 from app.api.file.rename_file import rename_router
 from app.api.file.delete_file import delete_file_router
 from app.api.file.edit_file import edit_router
 from app.api.file.view_file import view_router
 from app.api.file.download_file import download_file_router
+from app.api.file.thumbnail import thumbnail_router
+from app.api.file.search_file import search_router
 
 filerouter = APIRouter()
 
 filerouter.include_router(upload_router)
+filerouter.include_router(upload_session_router)
+filerouter.include_router(raw_upload_router)
 filerouter.include_router(view_router)
 filerouter.include_router(download_file_router)
+filerouter.include_router(thumbnail_router)
+filerouter.include_router(search_router)
 filerouter.include_router(rename_router)
 filerouter.include_router(delete_file_router)
 filerouter.include_router(edit_router)
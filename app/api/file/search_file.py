@@ -0,0 +1,136 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.api.dependencies import get_current_user, get_db
+from app.models.user import User
+from app.services.file.content_index import content_index
+from app.services.file.search import search_content, search_files
+from app.services.sync.metadata_index import metadata_index, user_root
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+search_router = APIRouter()
+
+MAX_SEARCH_RESULTS = 500
+MAX_CONTENT_RESULTS = 100
+
+
+def parse_datetime(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date or datetime")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+@search_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=255, description="Terms that must all occur in the filename"),
+    ext: Optional[str] = Query(None, description="Comma-separated extensions, e.g. jpg,png"),
+    min_size: Optional[int] = Query(None, ge=0),
+    max_size: Optional[int] = Query(None, ge=0),
+    modified_after: Optional[str] = Query(None, description="ISO 8601 date or datetime"),
+    modified_before: Optional[str] = Query(None, description="ISO 8601 date or datetime"),
+    folder: str = Query("", description="Only search below this folder"),
+    limit: int = Query(50, ge=1, le=MAX_SEARCH_RESULTS),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Find files by name, with prefix and substring matching, from the
+    metadata index. "complete" is false while the index is still being
+    reconciled after a restart and may miss files written outside the API.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+
+    extensions = [e.strip() for e in ext.split(",") if e.strip()] if ext else None
+    folder = folder.strip().strip("/")
+    if folder == "root":
+        folder = ""
+
+    try:
+        results, has_more = await run_in_threadpool(
+            search_files,
+            db,
+            user.id,
+            q,
+            extensions=extensions,
+            min_size=min_size,
+            max_size=max_size,
+            modified_after=parse_datetime(modified_after, "modified_after"),
+            modified_before=parse_datetime(modified_before, "modified_before"),
+            folder=folder,
+            limit=limit,
+            offset=offset,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching files: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while searching.")
+
+    return {
+        "query": q,
+        "results": results,
+        "has_more": has_more,
+        "complete": metadata_index.is_ready(user.id),
+    }
+
+
+@search_router.get("/search/content")
+async def search_contents(
+    q: str = Query(..., min_length=1, max_length=255, description="Words to find in text documents"),
+    folder: str = Query("", description="Only search below this folder"),
+    limit: int = Query(20, ge=1, le=MAX_CONTENT_RESULTS),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over the user's .txt, .md, .json and .csv files,
+    ranked by relevance with a snippet around the first match. "index"
+    reports how many of the user's text files are searchable; files
+    written recently, or left out once the index is full, are pending.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+
+    folder = folder.strip().strip("/")
+    if folder == "root":
+        folder = ""
+
+    try:
+        results, has_more = await run_in_threadpool(
+            search_content, db, user.id, user_root(user), q, folder=folder, limit=limit, offset=offset
+        )
+        stats = await run_in_threadpool(content_index.user_stats, db, user.id)
+    except Exception as e:
+        logger.error(f"Error searching file contents: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while searching.")
+
+    return {
+        "query": q,
+        "results": results,
+        "has_more": has_more,
+        "index": stats,
+    }
+
+
+@search_router.get("/search/content/stats")
+async def get_content_index_stats(
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Size of the whole content index against its postings budget, with the
+    number of documents left out once it was full and those still queued.
+    """
+    return await run_in_threadpool(content_index.stats, db)
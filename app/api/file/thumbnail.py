@@ -0,0 +1,210 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Literal, Optional, Tuple
+from app.api.dependencies import get_current_user
+from app.services.folder.paths import resolve_user_path
+from app.models.user import User
+from app.services.file.conditional_requests import is_not_modified, not_modified_response
+from app.services.media.imaging import IMAGE_FORMATS, is_raster_image
+from app.services.media.thumbnails import THUMBNAIL_SIZES, ThumbnailError, thumbnail_service
+from urllib.parse import quote
+import asyncio
+import json
+import os
+import secrets
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+thumbnail_router = APIRouter()
+
+# Versioned URLs (?v=<content hash>) always name the same bytes
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Unversioned URLs follow the file, so caches must revalidate (cheap, 304)
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+# Most thumbnails returned by one batch request
+MAX_BATCH_THUMBNAILS = 500
+
+# Media type of the length-prefixed batch format
+THUMBNAIL_PACK_MEDIA_TYPE = "application/vnd.mudaserver.thumbnail-pack"
+
+
+class ThumbnailBatchRequest(BaseModel):
+    paths: list[str] = Field(..., min_length=1, max_length=MAX_BATCH_THUMBNAILS)
+    size: int
+    format: Optional[Literal["webp", "jpeg"]] = None
+    pack: Literal["multipart", "binary"] = "multipart"
+
+
+def negotiate_format(request: Request) -> str:
+    """WebP for clients that accept it, JPEG otherwise"""
+    accept = request.headers.get("accept", "")
+    return "webp" if "image/webp" in accept else "jpeg"
+
+
+def check_thumbnail_size(size: int):
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported thumbnail size, use one of: {', '.join(map(str, THUMBNAIL_SIZES))}",
+        )
+
+
+async def load_thumbnail(path: str, size: int, fmt: str, user: User) -> Tuple[str, str]:
+    """
+    Resolve a user path and return (thumbnail path, content hash),
+    rendering the thumbnails if needed.
+    """
+    path = path.strip()
+    if not path:
+        raise HTTPException(status_code=400, detail="File path is required")
+
+    file_path = resolve_user_path(path, user)
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not is_raster_image(file_path):
+        raise HTTPException(status_code=415, detail="File type has no thumbnail")
+
+    try:
+        return await thumbnail_service.get_thumbnail(file_path, size, fmt, os.stat(file_path))
+    except ThumbnailError:
+        raise HTTPException(status_code=422, detail="Image could not be decoded")
+    except Exception as e:
+        logger.error(f"Error creating thumbnail: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while creating the thumbnail.")
+
+
+@thumbnail_router.get("/thumb/{size}/{path:path}")
+async def get_thumbnail(
+    size: int,
+    path: str,
+    request: Request,
+    format: Optional[Literal["webp", "jpeg"]] = None,
+    v: Optional[str] = None,
+    user: User = Depends(get_current_user),
+):
+    """
+    Thumbnail of an image, fitted in a size x size box.
+
+    Thumbnails are rendered on first request (or in the background right
+    after an upload) and cached by content hash. The ETag is that hash, so
+    passing it back as ?v= gives a URL that can be cached forever.
+    """
+    check_thumbnail_size(size)
+    fmt = format or negotiate_format(request)
+    thumb_path, content_hash = await load_thumbnail(path, size, fmt, user)
+
+    etag = f'"{content_hash}-{size}-{fmt}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if v == content_hash else REVALIDATE_CACHE_CONTROL,
+        "X-Content-Hash": content_hash,
+    }
+    if format is None:
+        headers["Vary"] = "Accept"
+
+    stat_info = os.stat(thumb_path)
+    if is_not_modified(request.headers, etag, stat_info.st_mtime):
+        response = not_modified_response(etag, stat_info.st_mtime)
+        response.headers.update(headers)
+        return response
+
+    return FileResponse(thumb_path, media_type=IMAGE_FORMATS[fmt][1], headers=headers, stat_result=stat_info)
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def fetch_batch_item(path: str, size: int, fmt: str, user: User) -> Tuple[dict, bytes]:
+    """
+    Return (info, data) for one path of a batch. Failures are reported in
+    info["status"] instead of failing the whole batch.
+    """
+    try:
+        thumb_path, content_hash = await load_thumbnail(path, size, fmt, user)
+        data = await run_in_threadpool(read_file, thumb_path)
+    except HTTPException as e:
+        return {"path": path, "status": e.status_code, "detail": e.detail}, b""
+    except OSError:
+        return {"path": path, "status": 404, "detail": "File not found"}, b""
+
+    return {
+        "path": path,
+        "status": 200,
+        "content_type": IMAGE_FORMATS[fmt][1],
+        "hash": content_hash,
+    }, data
+
+
+async def iter_batch(paths: list[str], size: int, fmt: str, user: User) -> AsyncIterator[Tuple[dict, bytes]]:
+    """
+    Fetch every thumbnail of a batch concurrently, yielding them as they
+    become ready: cached thumbnails go out while missing ones render.
+    """
+    tasks = [asyncio.ensure_future(fetch_batch_item(path, size, fmt, user)) for path in dict.fromkeys(paths)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def multipart_batch(items: AsyncIterator[Tuple[dict, bytes]], boundary: str) -> AsyncIterator[bytes]:
+    """
+    multipart/mixed body with one part per path. Image parts carry the
+    image; failed paths are application/json parts with the error.
+    """
+    async for info, data in items:
+        headers = [f"Content-Location: {quote(info['path'])}", f"X-Status: {info['status']}"]
+        if info["status"] == 200:
+            headers += [f"Content-Type: {info['content_type']}", f'ETag: "{info["hash"]}"']
+        else:
+            headers.append("Content-Type: application/json")
+            data = json.dumps(info).encode()
+        headers.append(f"Content-Length: {len(data)}")
+        part_headers = "".join(f"{header}\r\n" for header in headers)
+        yield f"--{boundary}\r\n{part_headers}\r\n".encode() + data + b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+async def binary_batch(items: AsyncIterator[Tuple[dict, bytes]]) -> AsyncIterator[bytes]:
+    """
+    Length-prefixed pack: for every path, a big-endian uint32 length and
+    a JSON header (path, status, content_type, hash or detail), then a
+    uint32 length and the image bytes (empty for failed paths).
+    """
+    async for info, data in items:
+        header = json.dumps(info).encode()
+        yield struct.pack(">I", len(header)) + header + struct.pack(">I", len(data)) + data
+
+
+@thumbnail_router.post("/thumbs")
+async def get_thumbnails(
+    request_data: ThumbnailBatchRequest,
+    request: Request,
+    user: User = Depends(get_current_user),
+):
+    """
+    Thumbnails of many images in one response, so a gallery grid costs a
+    single request and authentication instead of one per tile. Missing
+    thumbnails are rendered on the fly, and results are streamed in the
+    order they become ready.
+    """
+    check_thumbnail_size(request_data.size)
+    fmt = request_data.format or negotiate_format(request)
+    items = iter_batch(request_data.paths, request_data.size, fmt, user)
+
+    if request_data.pack == "binary":
+        return StreamingResponse(binary_batch(items), media_type=THUMBNAIL_PACK_MEDIA_TYPE)
+
+    boundary = secrets.token_hex(16)
+    return StreamingResponse(
+        multipart_batch(items, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
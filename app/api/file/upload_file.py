@@ -6,13 +6,63 @@ from app.models.user import User
 from app.models.device import Device
 from app.core.config import config
 from app.services.upload.progress_tracker import progress_tracker  # ✅ Add this
+from app.services.sync.change_journal import record_changes
+from app.services.media.thumbnails import thumbnail_service
+from app.services.upload.chunk_assembler import ChunkedFile
+from app.services.upload.upload_sessions import upload_sessions
 import os
-import aiofiles
+from threading import Lock
 from typing import Optional
+from starlette.concurrency import run_in_threadpool
 
 upload_router = APIRouter()
 
 
+def start_assembly(
+    assembly: ChunkedFile,
+    lock: Lock,
+    total_chunks: int,
+    chunk_size: Optional[int],
+    total_size: Optional[int],
+    chunk_length: int,
+    is_last_chunk: bool,
+) -> dict:
+    """Load the upload's layout, creating it on the first chunk."""
+    with lock:
+        meta = assembly.load()
+        if meta is not None:
+            return meta
+        if chunk_size is None:
+            if not is_last_chunk or total_chunks == 1:
+                chunk_size = chunk_length
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail="chunk_size is required when the last chunk is sent first",
+                )
+        assembly.prepare(total_chunks, chunk_size, total_size)
+        return assembly.meta
+
+
+def complete_chunk(
+    assembly: ChunkedFile, lock: Lock, temp_dir: str, chunk_index: int, total_chunks: int, final_path: str
+) -> tuple[int, bool]:
+    """
+    Mark a written chunk as received and move the file into place once all
+    are. Only one request can observe the upload becoming complete.
+    Returns the number of chunks received and whether final_path existed.
+    """
+    with lock:
+        if not os.path.exists(assembly.meta_path):
+            raise HTTPException(status_code=409, detail="Upload already completed")
+        received = assembly.mark_received(chunk_index)
+        existed = os.path.exists(final_path)
+        if received == total_chunks:
+            assembly.finalize(final_path)
+            upload_sessions.release_path_lock(temp_dir)
+    return received, existed
+
+
 @upload_router.post("/upload-chunk")
 async def upload_chunk(
     user: User = Depends(get_current_user),
@@ -23,7 +73,14 @@ async def upload_chunk(
     file: UploadFile = File(...),
     folder_path: str = Form("root"),
     device_id: Optional[str] = Form(None),
+    chunk_size: Optional[int] = Form(None),
+    total_size: Optional[int] = Form(None),
 ):
+    """
+    Upload one chunk of a file. Chunks may arrive in any order; each is
+    written at chunk_index * chunk_size into a preallocated file, which is
+    moved into place once every chunk has been received.
+    """
     folder_path = folder_path.strip().lower()
     base_dir = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
     
@@ -44,42 +101,72 @@ async def upload_chunk(
     os.makedirs(base_dir, exist_ok=True)
 
     temp_dir = os.path.join(base_dir, f"{file_id}_parts")
-    os.makedirs(temp_dir, exist_ok=True)
+    assembly = ChunkedFile(temp_dir)
+
+    if chunk_index < 0 or chunk_index >= total_chunks:
+        raise HTTPException(status_code=400, detail="Invalid chunk index")
 
-    chunk_path = os.path.join(temp_dir, f"part_{chunk_index}")
-    async with aiofiles.open(chunk_path, "wb") as f:
-        while True:
-            chunk = await file.read(1024 * 1024)  # 1 MB at a time
-            if not chunk:
-                break
-            await f.write(chunk)
+    is_last_chunk = chunk_index == total_chunks - 1
+    chunk_length = file.size
+    if chunk_length is None:
+        file.file.seek(0, os.SEEK_END)
+        chunk_length = file.file.tell()
+        file.file.seek(0)
+
+    # Chunk size is fixed by the first chunk that arrives
+    lock = upload_sessions.path_lock(temp_dir)
+    meta = await run_in_threadpool(
+        start_assembly, assembly, lock, total_chunks, chunk_size, total_size, chunk_length, is_last_chunk
+    )
+    if meta["total_chunks"] != total_chunks or (
+        chunk_size is not None and meta["chunk_size"] != chunk_size
+    ):
+        raise HTTPException(status_code=409, detail="Chunk layout does not match upload")
+
+    if not is_last_chunk and chunk_length != meta["chunk_size"]:
+        raise HTTPException(status_code=400, detail="Chunk does not match chunk_size")
+    if is_last_chunk and meta["total_size"] and (
+        chunk_index * meta["chunk_size"] + chunk_length != meta["total_size"]
+    ):
+        raise HTTPException(status_code=400, detail="Chunk does not match total_size")
+
+    # Write straight into the final file at this chunk's offset
+    try:
+        await run_in_threadpool(assembly.write_chunk, chunk_index, file.file)
+    except FileNotFoundError:
+        # Another request finished the upload and removed the data file
+        raise HTTPException(status_code=409, detail="Upload already completed")
+
+    final_path = os.path.join(base_dir, file.filename)
+    received, existed = await run_in_threadpool(
+        complete_chunk, assembly, lock, temp_dir, chunk_index, total_chunks, final_path
+    )
 
     # ✅ Update progress after each chunk
     progress_tracker.set_progress(
         upload_id=file_id,
-        current=chunk_index + 1,
+        current=received,
         total=total_chunks,
         filename=file.filename,
     )
 
-    # merge if all chunks uploaded
-    uploaded_parts = len([p for p in os.listdir(temp_dir) if p.startswith("part_")])
-    if uploaded_parts == total_chunks:
-        final_path = os.path.join(base_dir, file.filename)
-        with open(final_path, "wb") as outfile:
-            for i in range(total_chunks):
-                part_path = os.path.join(temp_dir, f"part_{i}")
-                with open(part_path, "rb") as infile:
-                    outfile.write(infile.read())
-
-        # clean up parts
-        for p in os.listdir(temp_dir):
-            os.remove(os.path.join(temp_dir, p))
-        os.rmdir(temp_dir)
-
+    # all chunks are on disk, move the file into place
+    if received == total_chunks:
         # ✅ Remove progress when complete
         progress_tracker.remove_progress(file_id)
 
+        await run_in_threadpool(
+            record_changes,
+            user,
+            [
+                # Drops any rows an older index has for the chunk directory
+                {"action": "delete", "path": temp_dir, "is_dir": True},
+                {"action": "modify" if existed else "create", "path": final_path, "size": os.path.getsize(final_path)},
+            ],
+            db=db,
+        )
+        thumbnail_service.schedule(final_path)
+
         return JSONResponse(
             content={
                 "success": True,
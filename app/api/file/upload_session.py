@@ -0,0 +1,337 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from app.api.dependencies import get_current_user, get_db
+from app.models.user import User
+from app.models.device import Device
+from app.core.config import config
+from app.services.upload.upload_sessions import upload_sessions, UploadSession
+from app.services.upload.progress_tracker import progress_tracker
+from app.services.sync.change_journal import record_changes
+from app.services.media.thumbnails import thumbnail_service
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+upload_session_router = APIRouter()
+
+# Default chunk size handed to clients that do not pick one
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+MAX_CHUNK_SIZE = 256 * 1024 * 1024  # 256 MB
+
+# Buffer request body data up to this size before each positional write
+WRITE_BUFFER_SIZE = 1024 * 1024  # 1 MB
+
+# Version of the tus resumable upload protocol the offset endpoints follow
+TUS_VERSION = "1.0.0"
+
+
+class CreateUploadSessionRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    total_size: int = Field(..., ge=0)
+    chunk_size: int = Field(DEFAULT_CHUNK_SIZE, gt=0, le=MAX_CHUNK_SIZE)
+    folder_path: str = "root"
+    device_id: Optional[str] = None
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: list[int]
+    upload_offset: int
+
+
+def session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        filename=session.filename,
+        total_size=session.total_size,
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+        received_chunks=session.assembly.received_chunks(),
+        upload_offset=session.upload_offset(),
+    )
+
+
+def offset_headers(session: UploadSession, offset: int) -> dict:
+    return {
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(session.total_size),
+        "Tus-Resumable": TUS_VERSION,
+        "Cache-Control": "no-store",
+    }
+
+
+def complete_upload(session: UploadSession, db: Optional[Session] = None) -> bool:
+    """
+    Move a fully received upload into place exactly once.
+    Returns False if some chunks are still missing.
+    """
+    with session.lock:
+        if session.finalized:
+            raise HTTPException(status_code=409, detail="Upload already finalized")
+
+        received = session.assembly.received_chunks()
+        if len(received) != session.total_chunks:
+            return False
+
+        existed = os.path.exists(session.final_path)
+        session.assembly.finalize(session.final_path)
+        session.finalized = True
+
+    upload_sessions.remove(session.upload_id)
+    progress_tracker.remove_progress(session.upload_id)
+
+    record_changes(
+        session.owner,
+        [
+            # Drops any rows an older index has for the chunk directory
+            {"action": "delete", "path": session.assembly.temp_dir, "is_dir": True},
+            {"action": "modify" if existed else "create", "path": session.final_path, "size": session.total_size},
+        ],
+        db=db,
+    )
+    thumbnail_service.schedule(session.final_path)
+    return True
+
+
+def get_owned_session(upload_id: str, user: User) -> UploadSession:
+    session = upload_sessions.get(upload_id)
+    if session is None or session.owner.id != user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@upload_session_router.post("/upload-session", response_model=UploadSessionResponse)
+async def create_upload_session(
+    request: CreateUploadSessionRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Start a chunked upload. The target directory is resolved and the data
+    file preallocated once here, so chunk requests only look up the session.
+    """
+    filename = os.path.basename(request.filename.strip())
+    if not filename or filename in (".", ".."):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+
+    user_base = os.path.realpath(
+        os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
+    )
+    base_dir = user_base
+
+    if request.device_id:
+        device = db.query(Device).filter(
+            Device.device_id == request.device_id,
+            Device.user_id == user.id
+        ).first()
+
+        if not device:
+            raise HTTPException(status_code=404, detail="Device not found")
+
+        base_dir = os.path.join(base_dir, device.folder_name)
+
+    folder_path = request.folder_path.strip()
+    if folder_path and folder_path != "root":
+        base_dir = os.path.join(base_dir, folder_path)
+
+    # Security check: ensure target is within user's directory
+    base_dir = os.path.realpath(base_dir)
+    try:
+        if os.path.commonpath([base_dir, user_base]) != user_base:
+            raise HTTPException(status_code=403, detail="Access denied")
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    os.makedirs(base_dir, exist_ok=True)
+
+    session = await run_in_threadpool(
+        upload_sessions.create,
+        user,
+        base_dir,
+        filename,
+        request.total_size,
+        request.chunk_size,
+    )
+    return session_response(session)
+
+
+@upload_session_router.put("/upload-session/{upload_id}/chunks/{chunk_index}")
+async def upload_session_chunk(upload_id: str, chunk_index: int, request: Request):
+    """
+    Upload one chunk as the raw request body.
+    The unguessable upload_id authorises the request, so there is no token
+    decode or database lookup per chunk. Chunks may be sent in parallel.
+    """
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    if chunk_index < 0 or chunk_index >= session.total_chunks:
+        raise HTTPException(status_code=400, detail="Invalid chunk index")
+
+    expected = session.chunk_length(chunk_index)
+    offset = chunk_index * session.chunk_size
+    written = 0
+    buffer = bytearray()
+
+    async for data in request.stream():
+        if written + len(buffer) + len(data) > expected:
+            raise HTTPException(status_code=400, detail="Chunk is larger than expected")
+        buffer += data
+        if len(buffer) >= WRITE_BUFFER_SIZE:
+            await run_in_threadpool(session.assembly.write_at, offset + written, bytes(buffer))
+            written += len(buffer)
+            buffer.clear()
+
+    if buffer:
+        await run_in_threadpool(session.assembly.write_at, offset + written, bytes(buffer))
+        written += len(buffer)
+
+    if written != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk must be {expected} bytes")
+
+    received = session.mark_received(chunk_index)
+    progress_tracker.set_progress(
+        upload_id=upload_id,
+        current=received,
+        total=session.total_chunks,
+        filename=session.filename,
+    )
+
+    return {
+        "success": True,
+        "chunk_index": chunk_index,
+        "received_chunks": received,
+        "total_chunks": session.total_chunks,
+    }
+
+
+@upload_session_router.get("/upload-session/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(upload_id: str, user: User = Depends(get_current_user)):
+    """
+    Get the chunks already received for an upload session.
+    """
+    return session_response(get_owned_session(upload_id, user))
+
+
+@upload_session_router.post("/upload-session/{upload_id}/finalize")
+async def finalize_upload_session(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Move a completely received upload into place.
+    """
+    session = get_owned_session(upload_id, user)
+
+    if not await run_in_threadpool(complete_upload, session, db):
+        received = session.assembly.received_chunks()
+        missing = sorted(set(range(session.total_chunks)) - set(received))
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "upload_incomplete",
+                "message": f"{len(missing)} chunks missing",
+                "missing_chunks": missing[:1000],
+            },
+        )
+
+    return {
+        "success": True,
+        "file_location": session.final_path,
+        "message": "Upload complete",
+    }
+
+
+@upload_session_router.head("/upload-session/{upload_id}")
+async def get_upload_offset(upload_id: str):
+    """
+    Report how many contiguous bytes of the upload are already on disk in
+    the Upload-Offset header (tus-style). Works after a server restart.
+    """
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    return Response(status_code=200, headers=offset_headers(session, session.upload_offset()))
+
+
+@upload_session_router.patch("/upload-session/{upload_id}")
+async def patch_upload_session(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+):
+    """
+    Append the raw request body at Upload-Offset (tus-style).
+    The offset must equal the one reported by HEAD, and only one PATCH may
+    write to an upload at a time (423 otherwise). The upload is moved into
+    place as soon as the last byte arrives.
+    """
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    # No await between the check and the claim, so this is atomic on the event loop
+    if session.patching:
+        raise HTTPException(
+            status_code=423,
+            detail="Another PATCH request is writing to this upload",
+            headers=offset_headers(session, session.upload_offset()),
+        )
+    session.patching = True
+
+    try:
+        current_offset = session.upload_offset()
+        if upload_offset != current_offset:
+            raise HTTPException(
+                status_code=409,
+                detail="Upload-Offset does not match the server offset",
+                headers=offset_headers(session, current_offset),
+            )
+
+        position = upload_offset
+        buffer = bytearray()
+
+        async def flush():
+            nonlocal position
+            await run_in_threadpool(session.assembly.write_at, position, bytes(buffer))
+            session.advance(position, position + len(buffer))
+            position += len(buffer)
+            buffer.clear()
+
+        try:
+            async for data in request.stream():
+                if position + len(buffer) + len(data) > session.total_size:
+                    raise HTTPException(status_code=400, detail="Body exceeds Upload-Length")
+                buffer += data
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    await flush()
+            if buffer:
+                await flush()
+        finally:
+            # Keep whatever landed so the client can resume from there
+            await run_in_threadpool(upload_sessions.save, session)
+    finally:
+        session.patching = False
+
+    progress_tracker.set_progress(
+        upload_id=upload_id,
+        current=session.received_count,
+        total=session.total_chunks,
+        filename=session.filename,
+    )
+
+    if position == session.total_size:
+        await run_in_threadpool(complete_upload, session)
+
+    return Response(status_code=204, headers=offset_headers(session, position))
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.core.config import config
+from app.services.file.range_requests import RangedFileResponse, RangeNotSatisfiable, parse_range_header
+from app.services.file.conditional_requests import file_etag, is_not_modified, not_modified_response
+from app.services.media.derivatives import (
+    FIT_MODES,
+    MAX_DERIVATIVE_DIMENSION,
+    DerivativeError,
+    derivative_cache,
+)
+from app.services.media.imaging import IMAGE_FORMATS, is_raster_image
+from fastapi.responses import FileResponse
+from typing import Optional
 import os
 import logging
 from urllib.parse import quote
@@ -39,8 +49,78 @@ VIEWABLE_TYPES = {
 }
 
 
+async def derivative_response(
+    file_path: str,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    format: Optional[str],
+    request: Optional[Request],
+):
+    """
+    Serve a resized and/or re-encoded copy of an image from the
+    derivative cache, rendering it off the event loop if needed.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in VIEWABLE_TYPES or not is_raster_image(file_path):
+        raise HTTPException(status_code=400, detail="Resizing is only supported for images")
+    for name, value in (("w", width), ("h", height)):
+        if value is not None and not 1 <= value <= MAX_DERIVATIVE_DIMENSION:
+            raise HTTPException(status_code=400, detail=f"{name} must be between 1 and {MAX_DERIVATIVE_DIMENSION}")
+    if fit not in FIT_MODES:
+        raise HTTPException(status_code=400, detail=f"fit must be one of: {', '.join(FIT_MODES)}")
+    if format is not None and format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMAGE_FORMATS)}")
+
+    fmt = format or ("jpeg" if VIEWABLE_TYPES.get(ext) == "image/jpeg" else "webp")
+
+    try:
+        out_path, content_hash = await derivative_cache.get(
+            file_path, width, height, fit, fmt, os.stat(file_path)
+        )
+    except DerivativeError:
+        raise HTTPException(status_code=422, detail="Image could not be decoded")
+
+    etag = f'"{content_hash}-{width or 0}x{height or 0}-{fit}-{fmt}"'
+    stat_info = os.stat(out_path)
+    if is_not_modified(request.headers, etag, stat_info.st_mtime):
+        return not_modified_response(etag, stat_info.st_mtime)
+
+    return FileResponse(
+        out_path,
+        media_type=IMAGE_FORMATS[fmt][1],
+        headers={"ETag": etag, "Content-Disposition": "inline"},
+        stat_result=stat_info,
+    )
+
+
+def is_ranged_media(file_path: str, file_size: int, request: Request) -> bool:
+    """Whether this is a Range request for a video or audio file, as players seek with"""
+    media_type = VIEWABLE_TYPES.get(os.path.splitext(file_path)[1].lower(), "")
+    if not media_type.startswith(("video/", "audio/")) or "range" not in request.headers:
+        return False
+    try:
+        return parse_range_header(request.headers["range"], file_size) is not None
+    except RangeNotSatisfiable:
+        # Answered with 416, which carries no body
+        return True
+
+
 @view_router.get("/view/{path:path}")
-async def view_file(path: str, user: User = Depends(get_current_user)):
+async def view_file(
+    path: str,
+    request: Request,
+    user: User = Depends(get_current_user),
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    fit: str = "contain",
+    format: Optional[str] = None,
+):
+    """
+    View a file inline. For images, w/h/fit/format return a resized or
+    re-encoded copy, which is also how images over the inline size limit
+    can still be shown.
+    """
     try:
         path = path.strip()
         
@@ -66,10 +146,14 @@ async def view_file(path: str, user: User = Depends(get_current_user)):
         if not os.path.isfile(file_path):
             raise HTTPException(status_code=400, detail="Path is not a file")
 
-        # Check file size (30MB limit for inline viewing)
+        if w is not None or h is not None or format is not None:
+            return await derivative_response(file_path, w, h, fit, format, request)
+
+        # Check file size (30MB limit for inline viewing); video and audio
+        # fetched with Range are exempt, each response is only the span asked for
         file_size = os.path.getsize(file_path)
 
-        if file_size > MAX_VIEW_SIZE:
+        if file_size > MAX_VIEW_SIZE and not is_ranged_media(file_path, file_size, request):
             filename = os.path.basename(file_path)
             download_url = f"/api/file/download/{quote(path)}"
             
@@ -129,11 +213,20 @@ async def view_file(path: str, user: User = Depends(get_current_user)):
         # RFC 5987 format: filename*=UTF-8'<language>'{encoded_name} (language tag is optional/empty here)
         content_disposition = f'inline; filename="{ascii_filename}"; filename*=UTF-8\'\'{encoded_filename}'
 
-        # Return file with inline disposition header for browser viewing
-        return FileResponse(
+        # ETag from the content hash once known; unchanged files are answered
+        # with 304 without being read
+        stat_info = os.stat(file_path)
+        etag = await file_etag(file_path, stat_info)
+        if is_not_modified(request.headers, etag, stat_info.st_mtime):
+            return not_modified_response(etag, stat_info.st_mtime)
+
+        # Return file with inline disposition header for browser viewing;
+        # Range and If-Range requests are answered with 206 Partial Content
+        return RangedFileResponse(
             path=file_path,
             media_type=media_type,
-            headers={"Content-Disposition": content_disposition}
+            headers={"Content-Disposition": content_disposition, "ETag": etag},
+            stat_result=stat_info,
         )
     except HTTPException:
         raise
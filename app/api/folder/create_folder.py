@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api.dependencies import get_current_user, get_db
 from app.models.user import User
 from app.core.config import config
 from app.services.folder.createfolder import create_folder as CreateFolder
 from app.services.folder.validations import validFolderName
+from app.services.sync.change_journal import record_change
+import os
 
 
 createroute = APIRouter()
@@ -35,4 +38,10 @@ async def create_folder(
     db.add(user)
     db.commit()
 
+    main_root = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
+    parent_path = main_root if root_path == "root" else os.path.join(main_root, root_path)
+    await run_in_threadpool(
+        record_change, user, "create", os.path.join(parent_path, folder_name), is_dir=True, db=db
+    )
+
     return {"message": "Folder created successfully."}
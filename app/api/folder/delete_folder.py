@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api.dependencies import get_current_user, get_db
 from app.models.user import User
 from app.services.folder.deletefolder import DeleteFolder
+from app.services.sync.change_journal import record_change
+from app.core.config import config
+import os
 
 deleteroute = APIRouter()
 
@@ -33,4 +37,13 @@ async def delete_folder(
 
     db.add(user)
     db.commit()
+
+    await run_in_threadpool(
+        record_change,
+        user,
+        "delete",
+        os.path.join(config.DIR_LOCATION, "data", rootfolder, folder_path),
+        is_dir=True,
+        db=db,
+    )
     return {"message": "Folder deleted successfully."}
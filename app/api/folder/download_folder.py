@@ -1,77 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from app.api.dependencies import get_current_user
 from app.models.user import User
-from app.core.config import config
+from app.services.archive.listing import iter_folder_files, iter_selected_files
+from app.services.archive.zip_stream import ZipStream
+from app.services.archive.tar_stream import TAR_FORMATS, available_tar_formats, create_tar_stream
+from app.services.archive.zip_layout import StoredZipLayout
+from app.services.file.range_requests import RangeNotSatisfiable, parse_range_header
+from app.services.file.conditional_requests import http_date, is_not_modified, not_modified_response
+from app.services.folder.paths import resolve_user_path
+from typing import Literal, Optional
 import os
-import zipfile
-import tempfile
-import shutil
-from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
 download_folder_router = APIRouter()
 
+# Most paths accepted in one selective archive request
+MAX_ARCHIVE_PATHS = 10000
 
-def cleanup_temp_file(file_path: str):
+
+class ArchiveSelectionRequest(BaseModel):
+    paths: list[str] = Field(..., min_length=1, max_length=MAX_ARCHIVE_PATHS)
+    format: Literal["zip", "tar", "tar.gz", "tar.zst"] = "zip"
+    name: Optional[str] = Field(None, max_length=100)
+
+
+def check_archive_format(format: str):
+    if format != "zip" and format not in available_tar_formats():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported archive format, use one of: zip, {', '.join(available_tar_formats())}",
+        )
+
+
+def create_zip_archive(source_dir: str) -> ZipStream:
     """
-    Background task to delete temporary zip file after download completes.
+    Create a streaming zip archive of a directory.
+    The archive is generated while it is being sent, without a temp file.
     """
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Cleaned up temporary file: {file_path}")
-    except Exception as e:
-        logger.error(f"Failed to cleanup temp file {file_path}: {e}")
+    return ZipStream(iter_folder_files(source_dir))
 
 
-def create_zip_archive(source_dir: str, output_path: str) -> int:
+def resumable_zip_response(
+    layout: StoredZipLayout, zip_filename: str, request: Request
+) -> Response:
     """
-    Create a zip archive of a directory.
-    Returns the size of the zip file in bytes.
+    Serve a stored archive layout with Content-Length, ETag and single
+    Range / If-Range support, so interrupted downloads can resume.
     """
-    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Walk through the directory
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                # Calculate relative path for zip archive
-                arcname = os.path.relpath(file_path, source_dir)
-                zipf.write(file_path, arcname)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{zip_filename}"',
+        "Accept-Ranges": "bytes",
+        "ETag": layout.etag,
+        "Last-Modified": http_date(layout.last_modified),
+    }
+    request_headers = request.headers
+
+    if is_not_modified(request_headers, layout.etag, layout.last_modified):
+        return not_modified_response(layout.etag, layout.last_modified)
+
+    ranges = None
+    if_range = request_headers.get("if-range")
+    if "range" in request_headers and (if_range is None or if_range.strip() == layout.etag):
+        try:
+            ranges = parse_range_header(request_headers["range"], layout.total_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{layout.total_size}", "Accept-Ranges": "bytes"},
+            )
+
+    # Multiple ranges are not worth a multipart body here, send everything
+    if ranges and len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{layout.total_size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            layout.iter_range(start, end),
+            status_code=206,
+            media_type="application/zip",
+            headers=headers,
+        )
 
-    return os.path.getsize(output_path)
+    headers["Content-Length"] = str(layout.total_size)
+    return StreamingResponse(layout.iter_range(), media_type="application/zip", headers=headers)
 
 
 @download_folder_router.get("/download/{path:path}")
 async def download_folder(
-    path: str, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)
+    path: str,
+    request: Request,
+    user: User = Depends(get_current_user),
+    resumable: bool = False,
+    format: str = "zip",
 ):
     """
     Download an entire folder as a ZIP archive.
-    The folder will be compressed on-the-fly and sent to the client.
-    The temporary zip file is automatically cleaned up after download.
+    The folder is compressed on-the-fly while it is sent to the client,
+    so the first bytes go out immediately and nothing is written to disk.
+
+    With resumable=true the archive is stored (not compressed) with a
+    deterministic layout instead: it has a Content-Length and an ETag and
+    supports Range requests, so an interrupted download can be resumed.
+
+    format=tar, tar.gz or tar.zst (if zstandard is installed) streams a tar
+    export instead, which can be piped straight into `tar -x`.
     """
+    check_archive_format(format)
+    if resumable and format != "zip":
+        raise HTTPException(status_code=400, detail="Resumable downloads are only available as zip")
+
     path = path.strip()  # Only strip whitespace, preserve case
 
     # Handle root folder
     if not path or path == "root":
         path = ""
 
-    # Construct full folder path
-    base_path = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
-    folder_path = os.path.join(base_path, path) if path else base_path
-
-    # Security check: ensure folder is within user's directory
-    folder_path = os.path.realpath(folder_path)
-    base_path = os.path.realpath(base_path)
-    try:
-        if os.path.commonpath([folder_path, base_path]) != base_path:
-            raise HTTPException(status_code=403, detail="Access denied")
-    except ValueError:
-        # Different drives on Windows or other path issues
-        raise HTTPException(status_code=403, detail="Access denied")
+    folder_path = resolve_user_path(path, user)
 
     # Check if folder exists
     if not os.path.exists(folder_path):
@@ -85,44 +134,69 @@ async def download_folder(
     if not os.listdir(folder_path):
         raise HTTPException(status_code=400, detail="Folder is empty")
 
-    try:
-        # Create temporary file for zip
-        temp_dir = tempfile.gettempdir()
-        folder_name = (
-            os.path.basename(folder_path) if path else f"{user.username}_drive"
-        )
-        zip_filename = f"{folder_name}.zip"
-        temp_zip_path = os.path.join(
-            temp_dir, f"{user.username}_{folder_name}_{os.getpid()}.zip"
+    folder_name = os.path.basename(folder_path) if path else f"{user.username}_drive"
+    zip_filename = f"{folder_name}.zip"
+
+    if format != "zip":
+        logger.info(f"Streaming {format} export of {folder_path}")
+        return StreamingResponse(
+            create_tar_stream(iter_folder_files(folder_path), format),
+            media_type=TAR_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{folder_name}.{format}"'},
         )
 
-        # Create zip archive
-        logger.info(f"Creating zip archive: {temp_zip_path}")
-        zip_size = create_zip_archive(folder_path, temp_zip_path)
-        logger.info(f"Zip archive created: {zip_size} bytes")
+    if resumable:
+        layout = await run_in_threadpool(StoredZipLayout, iter_folder_files(folder_path))
+        return resumable_zip_response(layout, zip_filename, request)
 
-        # Schedule cleanup after response is sent
-        background_tasks.add_task(cleanup_temp_file, temp_zip_path)
+    logger.info(f"Streaming zip archive of {folder_path}")
+    return StreamingResponse(
+        create_zip_archive(folder_path),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_filename}"'},
+    )
 
-        # Return zip file
-        return FileResponse(
-            path=temp_zip_path,
-            media_type="application/zip",
-            filename=zip_filename,
-            headers={
-                "Content-Disposition": f'attachment; filename="{zip_filename}"',
-                "Content-Length": str(zip_size),
-            },
-        )
 
-    except Exception as e:
-        logger.error(f"Failed to create zip archive: {e}")
-        # Clean up if zip was partially created
-        if os.path.exists(temp_zip_path):
-            try:
-                os.remove(temp_zip_path)
-            except:
-                pass
-        raise HTTPException(
-            status_code=500, detail=f"Failed to create archive: {str(e)}"
-        )
+@download_folder_router.post("/archive")
+async def download_selection(
+    request: ArchiveSelectionRequest, user: User = Depends(get_current_user)
+):
+    """
+    Download a selection of files and folders as one streamed archive
+    (zip, tar, tar.gz or tar.zst).
+    Items are named relative to their common parent folder, so files
+    picked from one folder end up at the top of the archive.
+    """
+    check_archive_format(request.format)
+
+    paths = []
+    for path in request.paths:
+        path = path.strip()
+        if not path or path == "root":
+            path = ""
+        full_path = resolve_user_path(path, user)
+        if not os.path.exists(full_path):
+            raise HTTPException(status_code=404, detail=f"Path not found: {path}")
+        paths.append(full_path)
+
+    # Name items relative to their common parent, never above the user root
+    base_path = resolve_user_path("", user)
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        root = paths[0]
+    else:
+        root = os.path.commonpath([p if p == base_path else os.path.dirname(p) for p in paths])
+
+    files = iter_selected_files(paths, root)
+    if request.format == "zip":
+        stream, media_type = ZipStream(files), "application/zip"
+    else:
+        stream, media_type = create_tar_stream(files, request.format), TAR_FORMATS[request.format]
+
+    name = "".join(c for c in (request.name or "") if c not in '"\\/\r\n').strip()
+    archive_name = f"{name or 'selection'}.{request.format}"
+    logger.info(f"Streaming {request.format} archive of {len(paths)} selected paths")
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"'},
+    )
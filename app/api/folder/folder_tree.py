@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from app.api.dependencies import get_current_user
+from app.services.folder.paths import resolve_user_path
+from app.models.user import User
+from app.services.folder.tree import build_tree
+from app.services.sync.tree_state import tree_state
+from app.services.file.conditional_requests import http_date, is_not_modified, not_modified_response
+import os
+
+foldertreeroute = APIRouter()
+
+MAX_TREE_DEPTH = 16
+MAX_TREE_ENTRIES = 10000
+
+
+@foldertreeroute.get("/tree")
+async def get_folder_tree(
+    request: Request,
+    response: Response,
+    path: str = "",
+    depth: int = 1,
+    max_entries: int = 1000,
+    include_files: bool = False,
+    user: User = Depends(get_current_user),
+):
+    """
+    Nested folder tree for folder pickers.
+
+    Folders down to depth levels below path list their children (files
+    too with include_files); every folder has "folders" and "files"
+    counts of its direct entries, so deeper levels can be loaded lazily.
+    At most max_entries nodes are returned, breadth first; "truncated"
+    tells when that cut the tree short.
+    """
+    path = path.strip()
+    if path == "root":
+        path = ""
+    if not 0 <= depth <= MAX_TREE_DEPTH:
+        raise HTTPException(status_code=400, detail=f"depth must be between 0 and {MAX_TREE_DEPTH}")
+    if not 1 <= max_entries <= MAX_TREE_ENTRIES:
+        raise HTTPException(status_code=400, detail=f"max_entries must be between 1 and {MAX_TREE_ENTRIES}")
+
+    full_path = resolve_user_path(path, user)
+    if not os.path.exists(full_path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    if not os.path.isdir(full_path):
+        raise HTTPException(status_code=400, detail="Path is not a folder")
+
+    # Any change below the folder bumps its tree state
+    etag, last_modified = tree_state.validators(full_path)
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+
+    tree, entries, truncated = await run_in_threadpool(build_tree, full_path, depth, max_entries, include_files)
+    if not path:
+        tree["name"] = ""
+    return {"path": path, "depth": depth, "entries": entries, "truncated": truncated, "tree": tree}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.services.folder.getfolder import getallfolders
+from app.services.sync.metadata_index import metadata_index
+from starlette.concurrency import run_in_threadpool
 
 
 getallfoldersroute = APIRouter()
@@ -11,8 +13,12 @@ getallfoldersroute = APIRouter()
 async def get_all_folders(user: User = Depends(get_current_user)):
     """
     Get all folders.
+    Superseded by /tree, which is bounded and includes counts.
     """
 
+    if metadata_index.is_ready(user.id):
+        return await run_in_threadpool(metadata_index.list_top_level, user.id)
+
     print(user.root_foldername)
     folders = getallfolders(user.root_foldername)
     return folders
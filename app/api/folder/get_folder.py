@@ -1,19 +1,98 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.core.config import config
+from app.services.sync.tree_state import tree_state
+from app.services.sync.metadata_index import metadata_index, relative_path
+from starlette.concurrency import run_in_threadpool
+from app.services.file.conditional_requests import http_date, is_not_modified, not_modified_response
+from app.services.folder.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    SORT_FIELDS,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+from typing import Optional
 import os
 from datetime import datetime, timezone
 
 getfolderroute = APIRouter()
 
 
+def scan_folder(full_path: str) -> list[tuple[dict, Optional[float]]]:
+    """
+    List a folder from the disk, for users whose index is not ready.
+    Returns (item, mtime) pairs; mtime is None for folders.
+    """
+    items = []
+    # Use os.scandir() for better performance
+    with os.scandir(full_path) as entries:
+        for entry in entries:
+            # Skip symbolic links for security
+            if entry.is_symlink():
+                continue
+                
+            is_file = entry.is_file(follow_symlinks=False)
+            
+            item_data = {
+                "name": entry.name,
+                "type": "file" if is_file else "folder",
+            }
+            
+            # Add file metadata
+            mtime = None
+            if is_file:
+                stat = entry.stat(follow_symlinks=False)
+                mtime = stat.st_mtime
+                item_data["size"] = stat.st_size  # File size in bytes
+                item_data["modified"] = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat()
+            
+            items.append((item_data, mtime))
+
+    return items
+
+
 @getfolderroute.get("/get_folder")
-async def get_folder(folder_path: str = "", user: User = Depends(get_current_user)):
+async def get_folder(
+    request: Request,
+    response: Response,
+    folder_path: str = "",
+    user: User = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = "asc",
+):
     """
     Get a folder with the given name.
     Returns list of items with metadata (name, type, size, modified).
+    Sends a tree-state ETag; If-None-Match / If-Modified-Since get a 304
+    without listing the folder.
+
+    With limit, cursor or sort the listing is ordered and paginated:
+    folders first by name, then files by sort (name, size or modified,
+    ties broken by name) in the given order. next_cursor continues after
+    the last item and is null on the last page. Keyset pagination keeps
+    pages stable while entries are added or removed.
     """
+    paginated = limit is not None or cursor is not None or sort is not None
+    sort = sort or "name"
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if limit is None and cursor is not None:
+        limit = DEFAULT_PAGE_SIZE
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    try:
+        after = decode_cursor(cursor, sort, order) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     folder_path = folder_path.strip()  # Only strip whitespace, preserve case
     
     if folder_path == "root" or not folder_path:
@@ -38,27 +117,34 @@ async def get_folder(folder_path: str = "", user: User = Depends(get_current_use
     if not os.path.isdir(full_path):
         raise HTTPException(status_code=400, detail="Path is not a folder")
     
-    items = []
-    # Use os.scandir() for better performance
-    with os.scandir(full_path) as entries:
-        for entry in entries:
-            # Skip symbolic links for security
-            if entry.is_symlink():
-                continue
-                
-            is_file = entry.is_file(follow_symlinks=False)
-            
-            item_data = {
-                "name": entry.name,
-                "type": "file" if is_file else "folder",
-            }
-            
-            # Add file metadata
-            if is_file:
-                stat = entry.stat(follow_symlinks=False)
-                item_data["size"] = stat.st_size  # File size in bytes
-                item_data["modified"] = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat()
-            
-            items.append(item_data)
-    
+    etag, last_modified = tree_state.validators(full_path)
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+
+    rel_path = relative_path(base_path, full_path)
+    if paginated:
+        descending = order == "desc"
+        page = None
+        if metadata_index.is_ready(user.id):
+            page = await run_in_threadpool(
+                metadata_index.list_folder_page, user.id, rel_path, sort, descending, after, limit
+            )
+        if page is None:
+            entries = await run_in_threadpool(scan_folder, full_path)
+            page = paginate(entries, sort, descending, after, limit)
+
+        items, next_position = page
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(next_position, sort, order) if next_position else None,
+        }
+
+    items = None
+    if metadata_index.is_ready(user.id):
+        items = await run_in_threadpool(metadata_index.list_folder, user.id, rel_path)
+    if items is None:
+        items = [item for item, _ in scan_folder(full_path)]
+
     return {"items": items}
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.core.config import config
 from app.services.folder.validations import validFolderName
+from app.services.sync.change_journal import record_change
 import os
 
 
@@ -61,4 +63,8 @@ async def rename_folder(
             status_code=500,
             detail=f"Error renaming folder: {str(e)}",
         )
+
+    await run_in_threadpool(
+        record_change, user, "rename", new_folder_path, old_path=old_folder_path, is_dir=True
+    )
     return {"message": "Folder renamed successfully."}
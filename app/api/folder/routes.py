@@ -4,6 +4,7 @@ from app.api.folder.rename_folder import renameroute
 from app.api.folder.delete_folder import deleteroute
 from app.api.folder.get_folder import getfolderroute
 from app.api.folder.get_all_folders import getallfoldersroute
+from app.api.folder.folder_tree import foldertreeroute
 from app.api.folder.upload_folder import uploadroute
 from app.api.folder.download_folder import download_folder_router
 
@@ -15,4 +16,5 @@ folderrouter.include_router(download_folder_router)
 folderrouter.include_router(deleteroute)
 folderrouter.include_router(getfolderroute)
 folderrouter.include_router(getallfoldersroute)
+folderrouter.include_router(foldertreeroute)
 folderrouter.include_router(uploadroute)
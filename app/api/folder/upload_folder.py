@@ -1,4 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
 import aiofiles
@@ -7,6 +8,8 @@ from app.core.config import config
 from app.api.dependencies import get_current_user, get_db
 from app.models.user import User
 from app.services.upload.progress_tracker import progress_tracker  # ✅ Add this
+from app.services.sync.change_journal import record_changes
+from app.services.media.thumbnails import thumbnail_service
 
 uploadroute = APIRouter()
 
@@ -36,11 +39,14 @@ async def upload_folder(
     os.makedirs(base_dir, exist_ok=True)
 
     uploaded_size = 0
+    changes = []
 
     for idx, file in enumerate(files):
         relative_path = file.filename
         save_path = os.path.join(base_dir, relative_path)
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        existed = os.path.exists(save_path)
+        file_size = 0
 
         # ✅ Update progress before processing each file
         progress_tracker.set_progress(
@@ -51,13 +57,26 @@ async def upload_folder(
         async with aiofiles.open(save_path, "wb") as buffer:
             while chunk := await file.read(1024 * 1024):  # 1 MB at a time
                 uploaded_size += len(chunk)
+                file_size += len(chunk)
                 await buffer.write(chunk)
 
+        changes.append(
+            {
+                "action": "modify" if existed else "create",
+                "path": save_path,
+                "size": file_size,
+            }
+        )
+
     # Update user storage usage in DB
     user.storage_used += uploaded_size
     db.add(user)
     db.commit()
 
+    await run_in_threadpool(record_changes, user, changes, db=db)
+    for change in changes:
+        thumbnail_service.schedule(change["path"])
+
     # ✅ Remove progress when complete
     progress_tracker.remove_progress(upload_id)
 
@@ -1,15 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api.dependencies import get_current_user, get_db
 from app.models.user import User
 from app.models.device import Device
+from app.models.sync_change import SyncChange
 from app.schemas.device import SyncCompleteRequest
 from pydantic import BaseModel
 import os
 from app.core.config import config
-from app.services.sync.hash_utils import calculate_file_hash, get_file_metadata
-from typing import List, Optional
+from app.services.sync.hash_utils import calculate_file_hash, get_file_metadata, get_cached_file_hash
+from app.services.sync.hash_cache import hash_cache
+from app.services.sync.hash_pool import run_in_hash_pool
+from app.services.sync.tree_walker import iter_tree
+from app.services.sync.metadata_index import metadata_index
+from app.services.sync.change_journal import record_change, scope_change
+from app.services.sync.merkle import merkle_index
+from app.services.sync.tree_state import tree_state
+from app.services.file.conditional_requests import http_date, is_not_modified, not_modified_response
+from app.services.sync.delta import (
+    DEFAULT_BLOCK_SIZE,
+    MIN_BLOCK_SIZE,
+    MAX_BLOCK_SIZE,
+    compute_signatures,
+    apply_delta,
+)
+from typing import Iterator, List, Literal, Optional
 from datetime import datetime, timezone
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +41,10 @@ syncrouter = APIRouter()
 # 60 seconds allows for minor clock skew between client and server
 CONFLICT_THRESHOLD_SECONDS = 60
 
+# Maximum number of files from one /check request being hashed at once,
+# so a single large batch cannot monopolise the shared hash pool
+MAX_CONCURRENT_CHECKS_PER_REQUEST = 16
+
 
 # Pydantic models
 class FileHashResponse(BaseModel):
@@ -73,6 +97,92 @@ class DeleteFileResponse(BaseModel):
     path: str
 
 
+class ChangeEntry(BaseModel):
+    cursor: int
+    action: str
+    path: str
+    old_path: Optional[str]
+    type: str
+    size: Optional[int]
+    changed_at: Optional[str]
+
+
+class ChangesResponse(BaseModel):
+    changes: List[ChangeEntry]
+    cursor: int
+    has_more: bool
+
+
+class AckChangesRequest(BaseModel):
+    device_id: str
+    cursor: int
+
+
+class BlockSignature(BaseModel):
+    index: int
+    offset: int
+    size: int
+    weak: int
+    strong: str
+
+
+class FileSignatureResponse(BaseModel):
+    file_path: str
+    file_size: int
+    hash: str
+    block_size: int
+    weak_algorithm: str
+    strong_algorithm: str
+    blocks: List[BlockSignature]
+
+
+class DeltaInstruction(BaseModel):
+    op: Literal["copy", "data"]
+    block: Optional[int] = None
+    count: int = 1
+    data: Optional[str] = None  # base64 encoded literal bytes
+
+
+class ApplyDeltaRequest(BaseModel):
+    file_path: str
+    device_id: Optional[str] = None
+    block_size: int
+    base_hash: str
+    target_hash: Optional[str] = None
+    instructions: List[DeltaInstruction]
+
+
+class ApplyDeltaResponse(BaseModel):
+    success: bool
+    file_path: str
+    hash: str
+    size: int
+    copied_bytes: int
+    literal_bytes: int
+
+
+class TreeHashChild(BaseModel):
+    name: str
+    type: str
+    hash: str
+    size: Optional[int]
+
+
+class TreeHashResponse(BaseModel):
+    path: str
+    hash: str
+    children: List[TreeHashChild]
+
+
+class HashCacheStatsResponse(BaseModel):
+    enabled: bool
+    entries: int
+    hits: int
+    misses: int
+    invalidations: int
+    hit_rate: float
+
+
 def validate_path_security(file_path: str, base_path: str) -> str:
     """
     Validate that the file path is within the user's directory.
@@ -169,93 +279,205 @@ async def get_file_hash(
         raise HTTPException(status_code=500, detail="Failed to get file hash")
 
 
+def check_file_sync_status(file_item: FileCheckItem, base_path: str) -> Optional[SyncStatusResult]:
+    """
+    Compare one client file against the server copy.
+    Returns None for paths that should be skipped (directories, invalid paths).
+    Runs on the hash pool, so it must not touch the event loop.
+    """
+    try:
+        file_path = file_item.path.strip()
+        full_path = validate_path_security(file_path, base_path)
+        
+        if not os.path.exists(full_path):
+            # File doesn't exist on server
+            return SyncStatusResult(
+                path=file_path,
+                status="local_only",
+                server_hash=None,
+                server_modified=None
+            )
+        
+        if not os.path.isfile(full_path):
+            # Path is a directory, skip
+            return None
+        
+        # Get server file metadata
+        metadata = get_file_metadata(full_path)
+        server_hash = metadata["hash"]
+        server_modified = metadata["modified_at"]
+        
+        # Parse modification times
+        local_modified_dt = parse_iso_datetime(file_item.local_modified)
+        server_modified_dt = parse_iso_datetime(server_modified)
+        
+        # Determine sync status
+        if server_hash == file_item.local_hash:
+            status = "in_sync"
+        else:
+            # Hashes differ, check modification times
+            time_diff = abs((server_modified_dt - local_modified_dt).total_seconds())
+            
+            if time_diff < CONFLICT_THRESHOLD_SECONDS:
+                status = "conflict"
+            elif server_modified_dt > local_modified_dt:
+                status = "server_newer"
+            else:
+                status = "local_newer"
+        
+        return SyncStatusResult(
+            path=file_path,
+            status=status,
+            server_hash=server_hash,
+            server_modified=server_modified
+        )
+    
+    except HTTPException:
+        # Path validation failed, skip this file
+        return None
+    except Exception as e:
+        logger.error(f"Error checking file {file_item.path}: {e}")
+        return None
+
+
+def start_sync_checks(files: List[FileCheckItem], base_path: str) -> List[asyncio.Task]:
+    """
+    Schedule a status check for every file on the shared hash pool.
+    At most MAX_CONCURRENT_CHECKS_PER_REQUEST run at once for a single request.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHECKS_PER_REQUEST)
+    
+    async def run(file_item: FileCheckItem):
+        async with semaphore:
+            return await run_in_hash_pool(check_file_sync_status, file_item, base_path)
+    
+    return [asyncio.create_task(run(file_item)) for file_item in files]
+
+
+async def stream_sync_results(tasks: List[asyncio.Task]):
+    """
+    Yield NDJSON lines in completion order, cancelling pending checks if the
+    client goes away.
+    """
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result is not None:
+                yield result.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 @syncrouter.post("/check", response_model=BatchSyncCheckResponse)
 async def batch_sync_check(
     request: BatchSyncCheckRequest,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    format: Optional[str] = Query(None, description="Set to 'ndjson' to stream results as they finish"),
 ):
     """
     Check sync status for multiple files at once.
     If device_id is provided in request, files are scoped to device folder.
+    Files are stat'ed and hashed in parallel on the hash pool. With
+    format=ndjson each SyncStatusResult is streamed as soon as it is ready.
     """
     try:
         base_path, device = get_device_base_path(request.device_id, user, db)
-        results = []
-        
-        for file_item in request.files:
-            try:
-                file_path = file_item.path.strip()
-                full_path = validate_path_security(file_path, base_path)
-                
-                if not os.path.exists(full_path):
-                    # File doesn't exist on server
-                    results.append(SyncStatusResult(
-                        path=file_path,
-                        status="local_only",
-                        server_hash=None,
-                        server_modified=None
-                    ))
-                    continue
-                
-                if not os.path.isfile(full_path):
-                    # Path is a directory, skip
-                    continue
-                
-                # Get server file metadata
-                metadata = get_file_metadata(full_path)
-                server_hash = metadata["hash"]
-                server_modified = metadata["modified_at"]
-                
-                # Parse modification times
-                local_modified_dt = parse_iso_datetime(file_item.local_modified)
-                server_modified_dt = parse_iso_datetime(server_modified)
-                
-                # Determine sync status
-                if server_hash == file_item.local_hash:
-                    status = "in_sync"
-                else:
-                    # Hashes differ, check modification times
-                    time_diff = abs((server_modified_dt - local_modified_dt).total_seconds())
-                    
-                    if time_diff < CONFLICT_THRESHOLD_SECONDS:
-                        status = "conflict"
-                    elif server_modified_dt > local_modified_dt:
-                        status = "server_newer"
-                    else:
-                        status = "local_newer"
-                
-                results.append(SyncStatusResult(
-                    path=file_path,
-                    status=status,
-                    server_hash=server_hash,
-                    server_modified=server_modified
-                ))
-            
-            except HTTPException:
-                # Path validation failed, skip this file
-                continue
-            except Exception as e:
-                logger.error(f"Error checking file {file_item.path}: {e}")
-                continue
+        tasks = start_sync_checks(request.files, base_path)
         
+        if format == "ndjson":
+            return StreamingResponse(
+                stream_sync_results(tasks),
+                media_type="application/x-ndjson"
+            )
+        
+        results = [result for result in await asyncio.gather(*tasks) if result is not None]
         return BatchSyncCheckResponse(results=results)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in batch sync check: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to perform batch sync check")
 
 
+def tree_entries(user: User, start_path: str, base_path: str) -> Iterator[dict]:
+    """
+    Lazily list everything below start_path: from the metadata index once
+    it is reconciled for the user, otherwise by walking the disk.
+    """
+    if metadata_index.is_ready(user.id):
+        root = os.path.realpath(os.path.join(config.DIR_LOCATION, "data", user.root_foldername))
+        return metadata_index.iter_tree(user.id, root, os.path.realpath(start_path), os.path.realpath(base_path))
+    return iter_tree(start_path, base_path)
+
+
+def stream_tree_ndjson(entries: Iterator[dict]):
+    """
+    Yield one NDJSON line per entry followed by a summary trailer record.
+    Runs in Starlette's threadpool, so the walk never blocks the event loop.
+    """
+    total_files = 0
+    total_size = 0
+    
+    try:
+        for entry in entries:
+            if entry["type"] == "file":
+                total_files += 1
+                total_size += entry["size"]
+            yield json.dumps(entry) + "\n"
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        logger.error(f"Error streaming file list: {e}", exc_info=True)
+        yield json.dumps({"type": "error", "message": "Failed to list files"}) + "\n"
+        return
+    
+    yield json.dumps({
+        "type": "summary",
+        "total_files": total_files,
+        "total_size": total_size
+    }) + "\n"
+
+
+def collect_tree(entries: Iterator[dict]) -> ListAllFilesResponse:
+    """
+    Build the full ListAllFilesResponse for the classic JSON mode.
+    """
+    files = []
+    total_files = 0
+    total_size = 0
+    
+    for entry in entries:
+        files.append(FileItem(**entry))
+        if entry["type"] == "file":
+            total_files += 1
+            total_size += entry["size"]
+    
+    return ListAllFilesResponse(
+        files=files,
+        total_files=total_files,
+        total_size=total_size
+    )
+
+
 @syncrouter.get("/list-all", response_model=ListAllFilesResponse)
 async def list_all_files(
+    request: Request,
+    response: Response,
     folder_path: Optional[str] = Query("", description="Limit to a specific folder, defaults to root"),
     device_id: Optional[str] = Query(None, description="Device ID for device-scoped sync"),
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    format: Optional[str] = Query(None, description="Set to 'ndjson' to stream entries with a summary trailer"),
 ):
     """
     List all files in the user's storage with their hashes and metadata.
     If device_id is provided, files are scoped to device folder.
+    With format=ndjson entries are streamed one per line as the tree is
+    walked, followed by a {"type": "summary"} record with the totals.
+    A tree-state ETag is sent; If-None-Match / If-Modified-Since get a 304
+    without walking the tree.
     """
     try:
         base_path, device = get_device_base_path(device_id, user, db)
@@ -269,64 +491,22 @@ async def list_all_files(
         
         if not os.path.exists(start_path):
             raise HTTPException(status_code=404, detail="Folder not found")
-        
-        files = []
-        total_files = 0
-        total_size = 0
-        
-        # Walk through directory tree
-        for root, dirs, filenames in os.walk(start_path):
-            # Calculate relative path from base_path
-            rel_root = os.path.relpath(root, base_path)
-            if rel_root == ".":
-                rel_root = ""
-            
-            # Add directories
-            for dirname in dirs:
-                dir_rel_path = os.path.join(rel_root, dirname) if rel_root else dirname
-                dir_full_path = os.path.join(root, dirname)
-                
-                try:
-                    stat_info = os.stat(dir_full_path)
-                    modified_at = datetime.fromtimestamp(stat_info.st_mtime, tz=timezone.utc)
-                    
-                    files.append(FileItem(
-                        path=dir_rel_path,
-                        hash=None,
-                        size=None,
-                        modified_at=modified_at.isoformat(),
-                        type="folder"
-                    ))
-                except Exception as e:
-                    logger.warning(f"Error accessing directory {dir_rel_path}: {e}")
-                    continue
-            
-            # Add files
-            for filename in filenames:
-                file_rel_path = os.path.join(rel_root, filename) if rel_root else filename
-                file_full_path = os.path.join(root, filename)
-                
-                try:
-                    metadata = get_file_metadata(file_full_path)
-                    if metadata:
-                        files.append(FileItem(
-                            path=file_rel_path,
-                            hash=metadata["hash"],
-                            size=metadata["size"],
-                            modified_at=metadata["modified_at"],
-                            type="file"
-                        ))
-                        total_files += 1
-                        total_size += metadata["size"]
-                except Exception as e:
-                    logger.warning(f"Error accessing file {file_rel_path}: {e}")
-                    continue
-        
-        return ListAllFilesResponse(
-            files=files,
-            total_files=total_files,
-            total_size=total_size
-        )
+
+        # Taken before walking, so a concurrent change yields a newer ETag
+        etag, last_modified = tree_state.validators(start_path)
+        if is_not_modified(request.headers, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        validator_headers = {"ETag": etag, "Last-Modified": http_date(last_modified)}
+
+        if format == "ndjson":
+            return StreamingResponse(
+                stream_tree_ndjson(tree_entries(user, start_path, base_path)),
+                media_type="application/x-ndjson",
+                headers=validator_headers,
+            )
+
+        response.headers.update(validator_headers)
+        return await run_in_threadpool(collect_tree, tree_entries(user, start_path, base_path))
     
     except HTTPException:
         raise
@@ -358,6 +538,7 @@ async def delete_file_sync(
             raise HTTPException(status_code=400, detail="Path is not a file")
         
         os.remove(full_path)
+        await run_in_threadpool(record_change, user, "delete", full_path, db=db)
         
         return DeleteFileResponse(
             success=True,
@@ -412,3 +593,244 @@ async def sync_complete(
         db.rollback()
         logger.error(f"Error completing sync: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to complete sync")
+
+
+def build_tree_hash(folder_path: str, full_path: str) -> TreeHashResponse:
+    """
+    Compute a folder's Merkle hash along with its children's hashes.
+    """
+    return TreeHashResponse(
+        path=folder_path,
+        hash=merkle_index.directory_hash(full_path),
+        children=merkle_index.list_children(full_path)
+    )
+
+
+@syncrouter.get("/tree-hash", response_model=TreeHashResponse)
+async def get_tree_hash(
+    folder_path: Optional[str] = Query("", description="Folder to describe, defaults to root"),
+    device_id: Optional[str] = Query(None, description="Device ID for device-scoped sync"),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the Merkle hash of a folder and of each of its direct children.
+    A client compares these with its own tree and only descends into
+    sub-folders whose hash differs.
+    """
+    try:
+        base_path, device = get_device_base_path(device_id, user, db)
+        
+        folder_path = (folder_path or "").strip()
+        full_path = validate_path_security(folder_path, base_path) if folder_path else base_path
+        
+        if not os.path.exists(full_path):
+            raise HTTPException(status_code=404, detail="Folder not found")
+        
+        if not os.path.isdir(full_path):
+            raise HTTPException(status_code=400, detail="Path is not a folder")
+        
+        return await run_in_hash_pool(build_tree_hash, folder_path, full_path)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing tree hash: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute tree hash")
+
+
+@syncrouter.get("/signature", response_model=FileSignatureResponse)
+async def get_file_signature(
+    file_path: str = Query(..., description="Relative path of the file within user's storage"),
+    device_id: Optional[str] = Query(None, description="Device ID for device-scoped sync"),
+    block_size: int = Query(DEFAULT_BLOCK_SIZE, ge=MIN_BLOCK_SIZE, le=MAX_BLOCK_SIZE, description="Block size in bytes"),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get rsync-style block signatures of a server file.
+    The client rolls Adler-32 over its local copy to find blocks the server
+    already has, then sends only the differences to /delta.
+    """
+    try:
+        file_path = file_path.strip()
+        base_path, device = get_device_base_path(device_id, user, db)
+        full_path = validate_path_security(file_path, base_path)
+        
+        if not os.path.exists(full_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        if not os.path.isfile(full_path):
+            raise HTTPException(status_code=400, detail="Path is not a file")
+        
+        file_hash = await run_in_hash_pool(get_cached_file_hash, full_path)
+        blocks = await run_in_hash_pool(compute_signatures, full_path, block_size)
+        
+        return FileSignatureResponse(
+            file_path=file_path,
+            file_size=sum(block["size"] for block in blocks),
+            hash=file_hash,
+            block_size=block_size,
+            weak_algorithm="adler32",
+            strong_algorithm="md5",
+            blocks=blocks
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing file signature: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute file signature")
+
+
+@syncrouter.post("/delta", response_model=ApplyDeltaResponse)
+async def apply_file_delta(
+    request: ApplyDeltaRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Rebuild a server file from its existing blocks plus literal data.
+    The base file must still match base_hash, and the result must match
+    target_hash when given. The new version replaces the file atomically.
+    """
+    if not MIN_BLOCK_SIZE <= request.block_size <= MAX_BLOCK_SIZE:
+        raise HTTPException(status_code=400, detail="Invalid block size")
+    
+    try:
+        file_path = request.file_path.strip()
+        base_path, device = get_device_base_path(request.device_id, user, db)
+        full_path = validate_path_security(file_path, base_path)
+        
+        if not os.path.exists(full_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        if not os.path.isfile(full_path):
+            raise HTTPException(status_code=400, detail="Path is not a file")
+        
+        current_hash = await run_in_hash_pool(get_cached_file_hash, full_path)
+        if current_hash != request.base_hash:
+            raise HTTPException(status_code=409, detail="File changed since signature was taken")
+        
+        instructions = [instruction.model_dump() for instruction in request.instructions]
+        try:
+            result = await run_in_hash_pool(apply_delta, full_path, instructions, request.block_size)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid delta: {e}")
+        
+        if request.target_hash and result["hash"] != request.target_hash:
+            os.remove(result["temp_path"])
+            raise HTTPException(status_code=422, detail="Rebuilt file does not match target hash")
+        
+        os.replace(result["temp_path"], full_path)
+        await run_in_threadpool(record_change, user, "modify", full_path, size=result["size"], db=db)
+        
+        return ApplyDeltaResponse(
+            success=True,
+            file_path=file_path,
+            hash=result["hash"],
+            size=result["size"],
+            copied_bytes=result["copied_bytes"],
+            literal_bytes=result["literal_bytes"]
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying delta: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to apply delta")
+
+
+@syncrouter.get("/changes", response_model=ChangesResponse)
+async def get_changes(
+    cursor: Optional[int] = Query(None, description="Return changes after this cursor, defaults to the device's acknowledged cursor"),
+    device_id: Optional[str] = Query(None, description="Device ID for device-scoped sync"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of journal entries to scan"),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the changes recorded in the journal since a cursor.
+    If device_id is provided, only changes inside the device folder are
+    returned, with paths relative to it. Pass the returned cursor back on
+    the next call and acknowledge it with /changes/ack once applied.
+    """
+    try:
+        base_path, device = get_device_base_path(device_id, user, db)
+        
+        if cursor is None:
+            cursor = (device.last_change_cursor or 0) if device else 0
+        
+        query = db.query(SyncChange).filter(
+            SyncChange.user_id == user.id,
+            SyncChange.id > cursor
+        )
+        
+        prefix = device.folder_name if device else ""
+        if prefix:
+            query = query.filter(
+                SyncChange.path.startswith(prefix + "/", autoescape=True)
+                | SyncChange.old_path.startswith(prefix + "/", autoescape=True)
+            )
+        
+        rows = query.order_by(SyncChange.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        changes = [entry for entry in (scope_change(row, prefix) for row in rows) if entry]
+        
+        return ChangesResponse(
+            changes=changes,
+            cursor=rows[-1].id if rows else cursor,
+            has_more=has_more
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting changes: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to get changes")
+
+
+@syncrouter.post("/changes/ack")
+async def ack_changes(
+    request: AckChangesRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Store the last change cursor a device has applied.
+    """
+    try:
+        device = db.query(Device).filter(
+            Device.device_id == request.device_id,
+            Device.user_id == user.id
+        ).first()
+        
+        if not device:
+            raise HTTPException(status_code=404, detail="Device not found")
+        
+        # Never move the cursor backwards
+        device.last_change_cursor = max(device.last_change_cursor or 0, request.cursor)
+        db.commit()
+        
+        return {
+            "device_id": device.device_id,
+            "cursor": device.last_change_cursor,
+            "message": "Changes acknowledged"
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error acknowledging changes: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to acknowledge changes")
+
+
+@syncrouter.get("/hash-cache/stats", response_model=HashCacheStatsResponse)
+async def get_hash_cache_stats(user: User = Depends(get_current_user)):
+    """
+    Get hit/miss counters of the persistent file hash cache.
+    """
+    return HashCacheStatsResponse(**hash_cache.stats())
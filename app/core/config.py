@@ -17,6 +17,15 @@ class Settings(BaseSettings):
 
     MAX_STORAGE: int = 1 * (1024 * 1024 * 1024)  # 1 GB
 
+    # deflate level (1-9) for compressible files in folder archives, 0 stores everything
+    ARCHIVE_COMPRESSION_LEVEL: int = 6
+
+    # disk budget for resized images served by /file/view?w=&h=, least recently used are evicted
+    DERIVATIVE_CACHE_SIZE: int = 512 * 1024 * 1024  # 512 MB
+
+    # most (term, document) pairs the full-text index may hold, new documents are skipped beyond it
+    CONTENT_INDEX_MAX_POSTINGS: int = 5_000_000
+
     # Database
     DATABASE_URL: str
 
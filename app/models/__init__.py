@@ -2,6 +2,8 @@ from .files import File
 from .folders import Folder
 from .user import User
 from .device import Device
+from .sync_change import SyncChange
+from .content_index import ContentDocument, ContentPosting
 
-__all__ = ["File", "Folder", "User", "Device"]
+__all__ = ["File", "Folder", "User", "Device", "SyncChange", "ContentDocument", "ContentPosting"]
 # __all__ is a convention in Python that defines what symbols will be exported when
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, BigInteger, Boolean, ForeignKey, Index
+from app.core.database import Base
+from sqlalchemy.sql import func
+from sqlalchemy import DateTime
+
+
+class ContentDocument(Base):
+    """
+    A text document in the full-text index, keyed by its content hash.
+    Files with the same contents share one document, and a file whose
+    hash is already indexed is never read again.
+    """
+    __tablename__ = "content_documents"
+
+    hash = Column(String(64), primary_key=True)  # md5 of the contents, as in files.hash
+    size = Column(BigInteger, nullable=False)
+    length = Column(Integer, nullable=False)  # Number of tokens, for ranking
+    terms = Column(Integer, nullable=False)  # Number of postings, for the size budget
+    truncated = Column(Boolean, default=False, nullable=False)  # Only the start was indexed
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class ContentPosting(Base):
+    """How often, and first where, a term occurs in a document"""
+    __tablename__ = "content_postings"
+
+    term = Column(String(64), primary_key=True)
+    hash = Column(String(64), ForeignKey("content_documents.hash", ondelete="CASCADE"), primary_key=True)
+    count = Column(Integer, nullable=False)
+    offset = Column(Integer, nullable=True)  # Byte offset of the first occurrence, for snippets
+
+    __table_args__ = (Index("ix_content_postings_hash", "hash"),)
@@ -24,6 +24,7 @@ class Device(Base):
     last_sync_at = Column(DateTime(timezone=True), nullable=True)
     last_sync_files_count = Column(Integer, default=0)
     last_sync_bytes = Column(BigInteger, default=0)
+    last_change_cursor = Column(BigInteger, default=0)  # Last acknowledged SyncChange id
     
     # Status
     is_active = Column(Boolean, default=True)  # False if device is unlinked but folder kept
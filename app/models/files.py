@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey
+from sqlalchemy import Column, Integer, String, BigInteger, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from sqlalchemy.sql import func
@@ -17,8 +17,23 @@ class File(Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    # Metadata index, kept in sync with disk by the change journal
+    path = Column(String, nullable=False)  # Relative to the user's root folder
+    parent_path = Column(String, nullable=False)  # "" for the root folder
+    mtime = Column(Float, nullable=False)  # Unix timestamp
+    mime_type = Column(String(255), nullable=True)
+    hash = Column(String(64), nullable=True)  # md5, filled in the background
+
     folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", back_populates="files")
     folders = relationship("Folder", back_populates="files")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "path", name="uq_files_user_id_path"),
+        # Keyset pagination of folder listings by each sort field
+        Index("ix_files_listing_name", "user_id", "parent_path", "filename"),
+        Index("ix_files_listing_size", "user_id", "parent_path", "size", "filename"),
+        Index("ix_files_listing_mtime", "user_id", "parent_path", "mtime", "filename"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey
+from sqlalchemy import Column, Integer, String, BigInteger, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from sqlalchemy.sql import func
@@ -9,13 +9,22 @@ class Folder(Base):
     __tablename__ = "folders"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    path = Column(String, nullable=False, unique=True)
-    size = Column(BigInteger, nullable=False)
+    path = Column(String, nullable=False)  # Relative to the user's root folder, "" for the root
+    size = Column(BigInteger, nullable=False)  # Total size of the files below it
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    # Metadata index, kept in sync with disk by the change journal
+    parent_path = Column(String, nullable=True)  # None for the root folder
+    mtime = Column(Float, nullable=True)  # Unix timestamp
+
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     files = relationship("File", back_populates="folders", cascade="all, delete-orphan")
     user = relationship("User", back_populates="folders")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "path", name="uq_folders_user_id_path"),
+        Index("ix_folders_listing_name", "user_id", "parent_path", "name"),
+    )
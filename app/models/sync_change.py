@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, BigInteger, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class SyncChange(Base):
+    """
+    Append-only journal of filesystem changes in a user's storage.
+    The id doubles as the sync cursor handed out to clients.
+    """
+    __tablename__ = "sync_changes"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    action = Column(String(16), nullable=False)  # create, modify, delete, rename
+    path = Column(String, nullable=False)  # Relative to the user's root folder
+    old_path = Column(String, nullable=True)  # Previous path for renames
+    is_dir = Column(Boolean, default=False, nullable=False)
+    size = Column(BigInteger, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    user = relationship("User", back_populates="sync_changes")
+
+    __table_args__ = (Index("ix_sync_changes_user_id_id", "user_id", "id"),)
+
+    def __repr__(self):
+        return f"<SyncChange {self.id} {self.action} {self.path}>"
@@ -29,3 +29,6 @@ class User(Base):
     )
     files = relationship("File", back_populates="user", cascade="all, delete-orphan")
     devices = relationship("Device", back_populates="user", cascade="all, delete-orphan")
+    sync_changes = relationship(
+        "SyncChange", back_populates="user", cascade="all, delete-orphan"
+    )
@@ -28,6 +28,7 @@ class DeviceResponse(BaseModel):
     last_sync_at: Optional[datetime]
     last_sync_files_count: int
     last_sync_bytes: int
+    last_change_cursor: Optional[int] = 0
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime]
@@ -10,6 +10,7 @@ from app.services.cleanup.scheduler import (
     start_cleanup_scheduler,
     stop_cleanup_scheduler,
 )  # ✅ Add
+from app.services.media.imaging import shutdown_media_pool
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +34,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down MudaServer...")
     stop_cleanup_scheduler()
+    shutdown_media_pool()
     logger.info("Cleanup scheduler stopped")
 
 
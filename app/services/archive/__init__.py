@@ -0,0 +1 @@
+# Archive services
@@ -0,0 +1,38 @@
+import os
+from typing import Iterable, Iterator, Tuple
+
+
+def iter_folder_files(source_dir: str, prefix: str = "") -> Iterator[Tuple[str, str]]:
+    """
+    Yield (path, arcname) for every file below source_dir in a stable order,
+    without building the whole listing first. arcnames are relative to
+    source_dir, under prefix if one is given.
+    """
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            arcname = os.path.relpath(file_path, source_dir).replace(os.sep, "/")
+            yield file_path, f"{prefix}/{arcname}" if prefix else arcname
+
+
+def iter_selected_files(paths: Iterable[str], root: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (path, arcname) for a selection of files and folders, named
+    relative to root (usually their common parent). Folders are expanded
+    and anything selected twice, directly or through a parent folder, is
+    only yielded once.
+    """
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            prefix = os.path.relpath(path, root).replace(os.sep, "/")
+            items = iter_folder_files(path, "" if prefix == "." else prefix)
+        else:
+            items = [(path, os.path.relpath(path, root).replace(os.sep, "/"))]
+
+        for file_path, arcname in items:
+            if arcname in seen:
+                continue
+            seen.add(arcname)
+            yield file_path, arcname
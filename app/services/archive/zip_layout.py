@@ -0,0 +1,226 @@
+import hashlib
+import os
+import stat
+import struct
+from typing import Iterable, Iterator, Tuple
+from app.services.archive.zip_stream import (
+    FLAG_UTF8,
+    METHOD_STORED,
+    OUTPUT_BUFFER_SIZE,
+    READ_SIZE,
+    VERSION_DEFAULT,
+    VERSION_MADE_BY,
+    VERSION_ZIP64,
+    ZIP64_LIMIT,
+    dos_datetime,
+    end_of_central_directory,
+)
+from app.services.sync.hash_utils import get_cached_file_hash
+
+LOCAL_HEADER_SIZE = 30
+CENTRAL_HEADER_SIZE = 46
+
+
+class ArchiveChangedError(Exception):
+    """A file changed after the archive layout was computed"""
+
+
+class LayoutEntry:
+    """One file of a stored archive, with its fixed position in the output."""
+
+    def __init__(self, file_path: str, arcname: str, stat_info: os.stat_result, offset: int):
+        self.file_path = file_path
+        self.name = arcname.encode("utf-8")
+        self.stat = stat_info
+        self.size = stat_info.st_size
+        self.mode = stat.S_IMODE(stat_info.st_mode) | stat.S_IFREG
+        self.dos_time, self.dos_date = dos_datetime(stat_info.st_mtime)
+        self.offset = offset
+        self.zip64 = self.size >= ZIP64_LIMIT
+        self.header_size = LOCAL_HEADER_SIZE + len(self.name) + (20 if self.zip64 else 0)
+
+    @property
+    def data_offset(self) -> int:
+        return self.offset + self.header_size
+
+    @property
+    def end(self) -> int:
+        return self.data_offset + self.size
+
+    def crc(self) -> int:
+        """
+        CRC32 of the file from the persistent hash cache, so resuming a
+        download does not reread the files it already sent.
+        """
+        current = os.stat(self.file_path)
+        if (current.st_size, current.st_mtime_ns) != (self.size, self.stat.st_mtime_ns):
+            raise ArchiveChangedError(self.file_path)
+        return int(get_cached_file_hash(self.file_path, "crc32", current), 16)
+
+    def local_header(self, crc: int) -> bytes:
+        extra = b""
+        size_field = self.size
+        if self.zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, self.size, self.size)
+            size_field = ZIP64_LIMIT
+        return (
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                VERSION_ZIP64 if self.zip64 else VERSION_DEFAULT,
+                FLAG_UTF8,
+                METHOD_STORED,
+                self.dos_time,
+                self.dos_date,
+                crc,
+                size_field,
+                size_field,
+                len(self.name),
+                len(extra),
+            )
+            + self.name
+            + extra
+        )
+
+    def central_extra_fields(self) -> list[int]:
+        fields = []
+        if self.size >= ZIP64_LIMIT:
+            fields += [self.size, self.size]
+        if self.offset >= ZIP64_LIMIT:
+            fields.append(self.offset)
+        return fields
+
+    @property
+    def central_size(self) -> int:
+        fields = self.central_extra_fields()
+        return CENTRAL_HEADER_SIZE + len(self.name) + (4 + 8 * len(fields) if fields else 0)
+
+    def central_header(self, crc: int) -> bytes:
+        fields = self.central_extra_fields()
+        extra = b""
+        if fields:
+            extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields)
+        size_field = min(self.size, ZIP64_LIMIT)
+
+        return (
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                VERSION_MADE_BY,
+                VERSION_ZIP64 if fields else VERSION_DEFAULT,
+                FLAG_UTF8,
+                METHOD_STORED,
+                self.dos_time,
+                self.dos_date,
+                crc,
+                size_field,
+                size_field,
+                len(self.name),
+                len(extra),
+                0,
+                0,
+                0,
+                self.mode << 16,
+                min(self.offset, ZIP64_LIMIT),
+            )
+            + self.name
+            + extra
+        )
+
+
+class StoredZipLayout:
+    """
+    Deterministic, uncompressed zip archive of a list of files.
+
+    Every header, offset and the total size follow from the listing alone
+    (names, sizes, modes and mtimes), so the archive has a Content-Length
+    and any byte range can be produced without generating what precedes
+    it. The same files always give the same bytes and the same ETag, which
+    lets clients resume interrupted downloads with Range / If-Range.
+    Local headers carry the CRC, which comes from the hash cache.
+    """
+
+    def __init__(self, files: Iterable[Tuple[str, str]]):
+        self.entries: list[LayoutEntry] = []
+        digest = hashlib.sha256()
+        offset = 0
+        self.last_modified = 0.0
+
+        for file_path, arcname in files:
+            try:
+                stat_info = os.stat(file_path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(stat_info.st_mode):
+                continue
+
+            entry = LayoutEntry(file_path, arcname, stat_info, offset)
+            self.entries.append(entry)
+            offset = entry.end
+            self.last_modified = max(self.last_modified, stat_info.st_mtime)
+            digest.update(
+                f"{arcname}\0{stat_info.st_size}\0{stat_info.st_mtime_ns}\0{entry.mode}\n".encode()
+            )
+
+        self.cd_offset = offset
+        self.cd_size = sum(entry.central_size for entry in self.entries)
+        self.end_records = end_of_central_directory(len(self.entries), self.cd_offset, self.cd_size)
+        self.total_size = self.cd_offset + self.cd_size + len(self.end_records)
+        self.etag = f'"{digest.hexdigest()[:32]}"'
+
+    def _segments(self) -> Iterator[Tuple[int, int, object]]:
+        """
+        Yield (start, end, source) for every region of the archive, where
+        source is a callable producing the region's bytes, or the entry
+        whose file data fills the region.
+        """
+        for entry in self.entries:
+            yield entry.offset, entry.data_offset, lambda entry=entry: entry.local_header(entry.crc())
+            yield entry.data_offset, entry.end, entry
+
+        position = self.cd_offset
+        for entry in self.entries:
+            end = position + entry.central_size
+            yield position, end, lambda entry=entry: entry.central_header(entry.crc())
+            position = end
+
+        yield position, self.total_size, lambda: self.end_records
+
+    def iter_range(self, start: int = 0, end: int = None) -> Iterator[bytes]:
+        """Generate the bytes [start, end) of the archive."""
+        if end is None:
+            end = self.total_size
+        buffer = bytearray()
+
+        for segment_start, segment_end, source in self._segments():
+            if segment_end <= start or segment_start == segment_end:
+                continue
+            if segment_start >= end:
+                break
+
+            lo = max(start, segment_start) - segment_start
+            hi = min(end, segment_end) - segment_start
+
+            if isinstance(source, LayoutEntry):
+                chunks = self._read_file(source, lo, hi)
+            else:
+                chunks = (source()[lo:hi],)
+            for data in chunks:
+                buffer += data
+                if len(buffer) >= OUTPUT_BUFFER_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+
+    def _read_file(self, entry: LayoutEntry, lo: int, hi: int) -> Iterator[bytes]:
+        with open(entry.file_path, "rb") as f:
+            f.seek(lo)
+            position = lo
+            while position < hi:
+                data = f.read(min(READ_SIZE, hi - position))
+                if not data:
+                    raise ArchiveChangedError(entry.file_path)
+                position += len(data)
+                yield data
@@ -0,0 +1,475 @@
+import mimetypes
+import os
+import stat
+import struct
+import time
+import zlib
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, Tuple
+from app.core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Size of each read from a file being archived
+READ_SIZE = 1024 * 1024  # 1 MB
+
+# Emitted output is collected up to this size before being yielded
+OUTPUT_BUFFER_SIZE = 256 * 1024  # 256 KB
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+# General purpose flags: sizes and CRC follow the data, names are UTF-8
+FLAG_DATA_DESCRIPTOR = 0x0008
+FLAG_UTF8 = 0x0800
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+# Upper byte 3 marks the external attributes as Unix permissions
+VERSION_MADE_BY = (3 << 8) | VERSION_ZIP64
+
+# Files are deflated in independent blocks of this size on the compression
+# pool; files up to this size are read and compressed whole, ahead of time
+BLOCK_SIZE = 1024 * 1024  # 1 MB
+
+# zlib releases the GIL while compressing, so threads use every core
+COMPRESSION_WORKERS = os.cpu_count() or 4
+
+# Blocks of one large file and small files queued ahead of the writer
+COMPRESS_WINDOW = COMPRESSION_WORKERS * 2
+PREFETCH_ENTRIES = COMPRESSION_WORKERS * 4
+
+# Deflating files smaller than this gains less than the block overhead
+MIN_COMPRESS_SIZE = 128
+
+# A file whose first block shrinks less than this is stored
+MIN_COMPRESSION_RATIO = 0.95
+
+# Already-compressed formats that are always stored
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif",
+    ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".lz4",
+    ".jar", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub",
+    ".pdf", ".woff", ".woff2",
+}
+
+# Terminates a deflate stream made of sync-flushed blocks
+DEFLATE_END_BLOCK = zlib.compressobj(6, zlib.DEFLATED, -15).flush()
+
+compression_executor = ThreadPoolExecutor(
+    max_workers=COMPRESSION_WORKERS, thread_name_prefix="zip-compress"
+)
+
+
+def dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """Convert a timestamp to the (time, date) fields of a zip header."""
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def choose_method(arcname: str, size: int, compression_level: int) -> int:
+    """Store media, archives and tiny files; deflate everything else."""
+    if compression_level == 0 or size < MIN_COMPRESS_SIZE:
+        return METHOD_STORED
+
+    ext = os.path.splitext(arcname)[1].lower()
+    if ext in STORED_EXTENSIONS:
+        return METHOD_STORED
+
+    mime_type, encoding = mimetypes.guess_type(arcname)
+    if encoding is not None:
+        return METHOD_STORED
+    if mime_type and mime_type.startswith(("video/", "audio/")):
+        return METHOD_STORED
+    if mime_type and mime_type.startswith("image/") and mime_type not in (
+        "image/svg+xml", "image/bmp", "image/tiff", "image/x-ms-bmp",
+    ):
+        return METHOD_STORED
+    return METHOD_DEFLATED
+
+
+def compress_block(data: bytes, level: int, history: bytes) -> bytes:
+    """
+    Deflate one block independently, ending on a byte boundary with a sync
+    flush so blocks can be concatenated into one stream. The previous
+    block's tail is used as the dictionary, like pigz does, so parallel
+    compression loses almost nothing in ratio.
+    """
+    if history:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=history)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def read_small_entry(file_path: str, method: int, level: int):
+    """
+    Read and compress a small file in one go on the compression pool.
+    Returns (stat, method, crc, size, payload), falling back to STORED if
+    deflate does not make the file smaller, or None if it is unreadable.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            stat_info = os.fstat(f.fileno())
+            if not stat.S_ISREG(stat_info.st_mode):
+                return None
+            data = f.read(stat_info.st_size)
+    except OSError as e:
+        logger.warning(f"Skipping {file_path} in archive: {e}")
+        return None
+
+    crc = zlib.crc32(data)
+    payload = data
+    if method == METHOD_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            payload = compressed
+        else:
+            method = METHOD_STORED
+    return stat_info, method, crc, len(data), payload
+
+
+class PreparedEntry:
+    """A file queued for the archive, with its compression possibly under way."""
+
+    def __init__(self, file_path: str, arcname: str, method: int, future: Optional[Future]):
+        self.file_path = file_path
+        self.arcname = arcname
+        self.method = method
+        self.future = future
+
+
+class ZipEntry:
+    """Header fields of one archived file, completed once its data is written."""
+
+    def __init__(self, arcname: str, stat_info: os.stat_result, method: int, offset: int):
+        self.name = arcname.encode("utf-8")
+        self.size = stat_info.st_size
+        self.mode = stat.S_IMODE(stat_info.st_mode) | stat.S_IFREG
+        self.dos_time, self.dos_date = dos_datetime(stat_info.st_mtime)
+        self.method = method
+        self.offset = offset
+        self.crc = 0
+        self.compressed_size = 0
+        # Same rule as the zipfile module: leave room for deflate overhead
+        self.zip64 = stat_info.st_size * 1.05 > ZIP64_LIMIT
+
+    @property
+    def version(self) -> int:
+        return VERSION_ZIP64 if self.zip64 else VERSION_DEFAULT
+
+    def local_header(self) -> bytes:
+        extra = b""
+        size_field = 0
+        if self.zip64:
+            # Actual sizes are in the data descriptor
+            extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+            size_field = ZIP64_LIMIT
+        return (
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                self.version,
+                FLAG_DATA_DESCRIPTOR | FLAG_UTF8,
+                self.method,
+                self.dos_time,
+                self.dos_date,
+                0,
+                size_field,
+                size_field,
+                len(self.name),
+                len(extra),
+            )
+            + self.name
+            + extra
+        )
+
+    def data_descriptor(self) -> bytes:
+        if self.zip64:
+            return struct.pack("<IIQQ", 0x08074B50, self.crc, self.compressed_size, self.size)
+        return struct.pack("<IIII", 0x08074B50, self.crc, self.compressed_size, self.size)
+
+    def central_header(self) -> bytes:
+        fields = []
+        size = self.size
+        compressed_size = self.compressed_size
+        offset = self.offset
+        if size >= ZIP64_LIMIT:
+            fields.append(size)
+            size = ZIP64_LIMIT
+        if compressed_size >= ZIP64_LIMIT:
+            fields.append(compressed_size)
+            compressed_size = ZIP64_LIMIT
+        if offset >= ZIP64_LIMIT:
+            fields.append(offset)
+            offset = ZIP64_LIMIT
+
+        extra = b""
+        if fields:
+            extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields)
+        version = VERSION_ZIP64 if fields or self.zip64 else VERSION_DEFAULT
+
+        return (
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                VERSION_MADE_BY,
+                version,
+                FLAG_DATA_DESCRIPTOR | FLAG_UTF8,
+                self.method,
+                self.dos_time,
+                self.dos_date,
+                self.crc,
+                compressed_size,
+                size,
+                len(self.name),
+                len(extra),
+                0,
+                0,
+                0,
+                self.mode << 16,
+                offset,
+            )
+            + self.name
+            + extra
+        )
+
+
+def end_of_central_directory(entry_count: int, cd_offset: int, cd_size: int) -> bytes:
+    """End records, including the ZIP64 ones when any field overflows."""
+    records = b""
+    if entry_count >= ZIP_MAX_ENTRIES or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+        zip64_eocd_offset = cd_offset + cd_size
+        records += struct.pack(
+            "<IQHHIIQQQQ",
+            0x06064B50,
+            44,
+            VERSION_MADE_BY,
+            VERSION_ZIP64,
+            0,
+            0,
+            entry_count,
+            entry_count,
+            cd_size,
+            cd_offset,
+        )
+        records += struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd_offset, 1)
+
+    records += struct.pack(
+        "<IHHHHIIH",
+        0x06054B50,
+        0,
+        0,
+        min(entry_count, ZIP_MAX_ENTRIES),
+        min(entry_count, ZIP_MAX_ENTRIES),
+        min(cd_size, ZIP64_LIMIT),
+        min(cd_offset, ZIP64_LIMIT),
+        0,
+    )
+    return records
+
+
+class ZipStream:
+    """
+    Generates a zip archive on the fly as an iterator of bytes.
+
+    Each file is written as a local header, its data and a data descriptor
+    carrying the CRC and sizes, so nothing has to be known or buffered in
+    advance; ZIP64 records are used for files and archives past the 4 GB /
+    65535 entry limits.
+
+    The method is picked per file: media, archives and other compressed
+    formats are stored, everything else is deflated at compression_level.
+    Compression runs on a thread pool: upcoming small files are compressed
+    ahead of the writer, and large files are deflated in parallel blocks.
+    Memory use is bounded by the prefetch and block windows plus one
+    central directory record per file.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[Tuple[str, str]],
+        compression_level: Optional[int] = None,
+    ):
+        self.files = files
+        if compression_level is None:
+            compression_level = config.ARCHIVE_COMPRESSION_LEVEL
+        self.compression_level = compression_level
+        self.offset = 0
+        self.entries: list[ZipEntry] = []
+
+    def _prepare(self, file_path: str, arcname: str) -> Optional[PreparedEntry]:
+        """Pick the file's method and start compressing it if it is small."""
+        try:
+            stat_info = os.stat(file_path)
+        except OSError as e:
+            logger.warning(f"Skipping {file_path} in archive: {e}")
+            return None
+        if not stat.S_ISREG(stat_info.st_mode):
+            return None
+
+        method = choose_method(arcname, stat_info.st_size, self.compression_level)
+        future = None
+        if stat_info.st_size <= BLOCK_SIZE:
+            future = compression_executor.submit(
+                read_small_entry, file_path, method, self.compression_level
+            )
+        return PreparedEntry(file_path, arcname, method, future)
+
+    def _small_entry_chunks(self, prepared: PreparedEntry) -> Iterator[bytes]:
+        result = prepared.future.result()
+        if result is None:
+            return
+        stat_info, method, crc, size, payload = result
+
+        entry = ZipEntry(prepared.arcname, stat_info, method, self.offset)
+        entry.size = size
+        entry.crc = crc
+        entry.compressed_size = len(payload)
+        yield entry.local_header()
+        yield payload
+        yield entry.data_descriptor()
+        self.entries.append(entry)
+
+    def _large_entry_chunks(self, prepared: PreparedEntry) -> Iterator[bytes]:
+        try:
+            f = open(prepared.file_path, "rb")
+        except OSError as e:
+            logger.warning(f"Skipping {prepared.file_path} in archive: {e}")
+            return
+
+        with f:
+            stat_info = os.fstat(f.fileno())
+            method = prepared.method
+            first_block = None
+            if method == METHOD_DEFLATED:
+                # Sample the first block to catch incompressible content
+                data = f.read(min(BLOCK_SIZE, stat_info.st_size))
+                compressed = compression_executor.submit(
+                    compress_block, data, self.compression_level, b""
+                ).result()
+                if len(compressed) >= len(data) * MIN_COMPRESSION_RATIO:
+                    method = METHOD_STORED
+                    f.seek(0)
+                else:
+                    first_block = (data, compressed)
+
+            entry = ZipEntry(prepared.arcname, stat_info, method, self.offset)
+            yield entry.local_header()
+            if method == METHOD_DEFLATED:
+                yield from self._deflated_chunks(f, entry, first_block)
+            else:
+                yield from self._stored_chunks(f, entry)
+            yield entry.data_descriptor()
+        self.entries.append(entry)
+
+    def _stored_chunks(self, f, entry: ZipEntry) -> Iterator[bytes]:
+        # Never read past the size seen when the header was written
+        remaining = entry.size
+        while remaining > 0:
+            data = f.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            entry.crc = zlib.crc32(data, entry.crc)
+            entry.compressed_size += len(data)
+            yield data
+        entry.size -= remaining
+
+    def _deflated_chunks(self, f, entry: ZipEntry, first_block: Tuple[bytes, bytes]) -> Iterator[bytes]:
+        """Deflate a large file in blocks compressed in parallel, in order."""
+        data, compressed = first_block
+        entry.crc = zlib.crc32(data)
+        remaining = entry.size - len(data)
+        history = data[-32768:]
+        window = deque()
+
+        try:
+            entry.compressed_size += len(compressed)
+            yield compressed
+
+            while remaining > 0 or window:
+                while remaining > 0 and len(window) < COMPRESS_WINDOW:
+                    data = f.read(min(BLOCK_SIZE, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    entry.crc = zlib.crc32(data, entry.crc)
+                    window.append(
+                        compression_executor.submit(
+                            compress_block, data, self.compression_level, history
+                        )
+                    )
+                    history = data[-32768:]
+                if not window:
+                    break
+                compressed = window.popleft().result()
+                entry.compressed_size += len(compressed)
+                yield compressed
+        finally:
+            for future in window:
+                future.cancel()
+
+        entry.size -= remaining
+        entry.compressed_size += len(DEFLATE_END_BLOCK)
+        yield DEFLATE_END_BLOCK
+
+    def __iter__(self) -> Iterator[bytes]:
+        buffer = bytearray()
+        files = iter(self.files)
+        pending: deque[PreparedEntry] = deque()
+        exhausted = False
+
+        try:
+            while True:
+                # Keep upcoming small files compressing while this one is written
+                while not exhausted and len(pending) < PREFETCH_ENTRIES:
+                    item = next(files, None)
+                    if item is None:
+                        exhausted = True
+                    else:
+                        prepared = self._prepare(*item)
+                        if prepared is not None:
+                            pending.append(prepared)
+                if not pending:
+                    break
+
+                prepared = pending.popleft()
+                if prepared.future is not None:
+                    chunks = self._small_entry_chunks(prepared)
+                else:
+                    chunks = self._large_entry_chunks(prepared)
+                for data in chunks:
+                    self.offset += len(data)
+                    buffer += data
+                    if len(buffer) >= OUTPUT_BUFFER_SIZE:
+                        yield bytes(buffer)
+                        buffer.clear()
+        finally:
+            for prepared in pending:
+                if prepared.future is not None:
+                    prepared.future.cancel()
+
+        cd_offset = self.offset
+        for entry in self.entries:
+            data = entry.central_header()
+            self.offset += len(data)
+            buffer += data
+            if len(buffer) >= OUTPUT_BUFFER_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        cd_size = self.offset - cd_offset
+
+        buffer += end_of_central_directory(len(self.entries), cd_offset, cd_size)
+        yield bytes(buffer)
@@ -4,6 +4,8 @@ import time
 from pathlib import Path
 from app.core.config import config
 from app.services.upload.progress_tracker import progress_tracker
+from app.services.sync.hash_cache import hash_cache
+from app.services.upload.upload_sessions import upload_sessions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,6 +59,21 @@ class CleanupService:
         """
         return progress_tracker.cleanup_old_progress(max_age_seconds=3600)
 
+    @staticmethod
+    def cleanup_expired_upload_sessions():
+        """
+        Forget upload sessions idle for 24 hours, their data is removed
+        together with the other abandoned *_parts directories.
+        """
+        return upload_sessions.cleanup_expired(max_age_seconds=24 * 3600)
+
+    @staticmethod
+    def cleanup_stale_hashes():
+        """
+        Remove hash cache entries for files that were deleted or changed.
+        """
+        return hash_cache.prune()
+
     @staticmethod
     def cleanup_all():
         """
@@ -64,12 +81,20 @@ class CleanupService:
         """
         chunks_cleaned = CleanupService.cleanup_abandoned_chunks(max_age_hours=24)
         progress_cleaned = CleanupService.cleanup_old_progress_entries()
+        sessions_cleaned = CleanupService.cleanup_expired_upload_sessions()
+        hashes_cleaned = CleanupService.cleanup_stale_hashes()
 
         logger.info(
-            f"Cleanup complete: {chunks_cleaned} chunk dirs, {progress_cleaned} progress entries"
+            f"Cleanup complete: {chunks_cleaned} chunk dirs, {progress_cleaned} progress entries, "
+            f"{sessions_cleaned} upload sessions, {hashes_cleaned} stale hashes"
         )
 
-        return {"chunks_cleaned": chunks_cleaned, "progress_cleaned": progress_cleaned}
+        return {
+            "chunks_cleaned": chunks_cleaned,
+            "progress_cleaned": progress_cleaned,
+            "sessions_cleaned": sessions_cleaned,
+            "hashes_cleaned": hashes_cleaned,
+        }
 
 
 cleanup_service = CleanupService()
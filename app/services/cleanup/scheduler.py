@@ -1,5 +1,8 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.cleanup.cleanup_service import cleanup_service
+from app.services.file.content_index import content_index
+from app.services.sync.metadata_index import metadata_index
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +25,27 @@ def start_cleanup_scheduler():
         replace_existing=True,
     )
 
+    # Reconcile the metadata index at startup, then every 6 hours for drift
+    scheduler.add_job(
+        metadata_index.reconcile_all,
+        trigger="interval",
+        hours=6,
+        next_run_time=datetime.now(),
+        id="metadata_reconcile_job",
+        name="Reconcile the file metadata index with disk",
+        replace_existing=True,
+    )
+
+    # Drop indexed contents that no file has any more and log the index size
+    scheduler.add_job(
+        content_index.prune_and_report,
+        trigger="interval",
+        hours=6,
+        id="content_prune_job",
+        name="Prune unreferenced documents from the content index",
+        replace_existing=True,
+    )
+
     scheduler.start()
     logger.info("Cleanup scheduler started - runs every 6 hours")
 
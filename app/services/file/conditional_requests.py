@@ -0,0 +1,94 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from threading import Lock
+from app.services.sync.hash_cache import hash_cache
+from app.services.sync.hash_pool import hash_executor, run_in_hash_pool
+from app.services.sync.hash_utils import get_cached_file_hash
+
+# Files being hashed in the background for their first strong ETag
+_warming: set = set()
+_warming_lock = Lock()
+
+
+def http_date(timestamp: float) -> str:
+    """Format a timestamp as an HTTP date"""
+    return formatdate(timestamp, usegmt=True)
+
+
+async def file_etag(file_path: str, stat_info: Optional[os.stat_result] = None) -> str:
+    """
+    Strong ETag from the file's content hash when the persistent hash cache
+    has it. Otherwise the file is hashed on the hash pool in the background
+    and a weak W/"size-mtime" validator is used meanwhile, so a cold file
+    is never read in full before its first byte is sent.
+    """
+    if stat_info is None:
+        stat_info = os.stat(file_path)
+    file_hash = await run_in_hash_pool(hash_cache.get, stat_info, "md5")
+    if file_hash is not None:
+        return f'"{file_hash}"'
+
+    warm_hash_cache(file_path, stat_info)
+    return f'W/"{stat_info.st_size:x}-{stat_info.st_mtime_ns:x}"'
+
+
+def warm_hash_cache(file_path: str, stat_info: os.stat_result):
+    """Hash a file on the hash pool once, however many requests ask for it."""
+    key = (stat_info.st_dev, stat_info.st_ino, stat_info.st_size, stat_info.st_mtime_ns)
+    with _warming_lock:
+        if key in _warming:
+            return
+        _warming.add(key)
+
+    def warm():
+        try:
+            get_cached_file_hash(file_path, "md5", stat_info)
+        except OSError:
+            pass
+        finally:
+            with _warming_lock:
+                _warming.discard(key)
+
+    hash_executor.submit(warm)
+
+
+def etag_in(header: str, etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match list"""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def is_not_modified(headers: Headers, etag: str, last_modified: float) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when no If-None-Match is
+    sent, for a GET request.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_in(if_none_match, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one second resolution
+        return int(last_modified) <= since
+
+    return False
+
+
+def not_modified_response(etag: str, last_modified: float) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Last-Modified": http_date(last_modified)},
+    )
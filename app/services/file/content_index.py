@@ -0,0 +1,266 @@
+import os
+import re
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from sqlalchemy import case, delete, func, insert, or_, select
+from app.core.config import config
+from app.core.database import SessionLocal
+from app.models.content_index import ContentDocument, ContentPosting
+from app.models.files import File
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+# Files the edit endpoint treats as text, and the only ones indexed
+TEXT_DOCUMENT_EXTENSIONS = (".txt", ".md", ".json", ".csv")
+
+# Only the start of larger files is indexed
+MAX_DOCUMENT_BYTES = 1024 * 1024  # 1 MB
+# Distinct terms kept per document, the most frequent win
+MAX_TERMS_PER_DOCUMENT = 5000
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+
+TOKEN_RE = re.compile(r"\w+")
+
+CONTENT_INDEX_WORKERS = 2
+content_executor = ThreadPoolExecutor(
+    max_workers=CONTENT_INDEX_WORKERS, thread_name_prefix="content-index"
+)
+
+
+def is_text_document(path: str) -> bool:
+    return path.lower().endswith(TEXT_DOCUMENT_EXTENSIONS)
+
+
+def user_text_documents(user_id: int) -> tuple:
+    """Filter on File for the user's files that are indexed as text documents"""
+    return (
+        File.user_id == user_id,
+        or_(*[func.lower(File.filename).endswith(ext) for ext in TEXT_DOCUMENT_EXTENSIONS]),
+    )
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens of indexable length"""
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower())
+        if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def term_offsets(text: str) -> dict[str, int]:
+    """Byte offset, in the UTF-8 encoded text, of each term's first occurrence"""
+    offsets = {}
+    position = consumed = 0
+    for match in TOKEN_RE.finditer(text):
+        term = match.group().lower()
+        if term in offsets or not MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            continue
+        consumed += len(text[position:match.start()].encode("utf-8", errors="replace"))
+        position = match.start()
+        offsets[term] = consumed
+    return offsets
+
+
+def read_document(path: str) -> tuple[str, bool]:
+    """The indexed part of a text file, and whether it was cut short"""
+    with open(path, "rb") as f:
+        data = f.read(MAX_DOCUMENT_BYTES + 1)
+    truncated = len(data) > MAX_DOCUMENT_BYTES
+    return data[:MAX_DOCUMENT_BYTES].decode("utf-8", errors="replace"), truncated
+
+
+class ContentIndex:
+    """
+    Inverted index over the contents of users' text documents.
+
+    Documents are keyed by content hash, so the index only grows when new
+    contents are written: the metadata index hands over every text file
+    once its hash is known, and a hash that is already indexed is skipped
+    without opening the file. Rows for hashes no file refers to any more
+    are removed by prune().
+
+    The total number of postings is capped by CONTENT_INDEX_MAX_POSTINGS.
+    Once it is reached, unreferenced documents are pruned and, if that is
+    not enough, new documents are left out and counted in stats().
+
+    Ranking statistics are computed per user, over the documents of the
+    user's own files, so one user's contents never influence another's
+    results.
+    """
+
+    def __init__(self):
+        self._inflight: set[str] = set()
+        self._lock = Lock()
+        # Serialises the budget check with the insert it guards
+        self._write_lock = Lock()
+        self.skipped = 0
+
+    def schedule(self, file_hash: str, full_path: str):
+        """Index a text file's contents in the background, unless already done."""
+        with self._lock:
+            if file_hash in self._inflight:
+                return
+            self._inflight.add(file_hash)
+        content_executor.submit(self._index_document, file_hash, full_path)
+
+    def schedule_missing(self, user_id: int, root: str):
+        """Queue the user's text files whose contents are not indexed yet."""
+        session = SessionLocal()
+        try:
+            indexed = select(ContentDocument.hash).where(ContentDocument.hash == File.hash)
+            rows = (
+                session.query(File.path, File.hash)
+                .filter(File.user_id == user_id, File.hash.isnot(None), ~indexed.exists())
+                .all()
+            )
+        finally:
+            session.close()
+        for path, file_hash in rows:
+            if is_text_document(path):
+                self.schedule(file_hash, os.path.join(root, *path.split("/")))
+
+    def _index_document(self, file_hash: str, full_path: str):
+        session = SessionLocal()
+        try:
+            if session.get(ContentDocument, file_hash) is not None:
+                return
+
+            stat_info = os.stat(full_path)
+            # The file may have been rewritten since it was hashed
+            if get_cached_file_hash(full_path, "md5", stat_info) != file_hash:
+                return
+            text, truncated = read_document(full_path)
+            after = os.stat(full_path)
+            if (after.st_size, after.st_mtime) != (stat_info.st_size, stat_info.st_mtime):
+                return
+
+            tokens = tokenize(text)
+            counts = Counter(tokens).most_common(MAX_TERMS_PER_DOCUMENT)
+            offsets = term_offsets(text)
+            with self._write_lock:
+                if not self._make_room(session, len(counts)):
+                    self.skipped += 1
+                    logger.warning(f"Content index is full, not indexing {full_path}")
+                    return
+                session.add(
+                    ContentDocument(
+                        hash=file_hash,
+                        size=stat_info.st_size,
+                        length=len(tokens),
+                        terms=len(counts),
+                        truncated=truncated,
+                    )
+                )
+                session.flush()
+                if counts:
+                    session.execute(
+                        insert(ContentPosting),
+                        [
+                            {"term": term, "hash": file_hash, "count": count, "offset": offsets.get(term)}
+                            for term, count in counts
+                        ],
+                    )
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Could not index contents of {full_path}: {e}")
+        finally:
+            session.close()
+            with self._lock:
+                self._inflight.discard(file_hash)
+
+    def _make_room(self, session, postings: int) -> bool:
+        budget = config.CONTENT_INDEX_MAX_POSTINGS
+        if self._postings(session) + postings <= budget:
+            return True
+        self.prune(session)
+        return self._postings(session) + postings <= budget
+
+    @staticmethod
+    def _postings(session) -> int:
+        return session.query(func.coalesce(func.sum(ContentDocument.terms), 0)).scalar()
+
+    def prune(self, session=None) -> int:
+        """Remove documents no file has as its hash. Returns how many."""
+        own_session = session is None
+        session = session or SessionLocal()
+        try:
+            referenced = select(File.hash).where(File.hash == ContentDocument.hash)
+            orphans = [h for (h,) in session.query(ContentDocument.hash).filter(~referenced.exists())]
+            if orphans:
+                session.execute(delete(ContentPosting).where(ContentPosting.hash.in_(orphans)))
+                session.execute(delete(ContentDocument).where(ContentDocument.hash.in_(orphans)))
+            session.commit()
+            return len(orphans)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            if own_session:
+                session.close()
+
+    def prune_and_report(self) -> dict:
+        """Prune, then log the size of the index, for the scheduler."""
+        session = SessionLocal()
+        try:
+            pruned = self.prune(session)
+            stats = self.stats(session)
+        finally:
+            session.close()
+        logger.info(
+            f"Content index: pruned {pruned} documents, {stats['documents']} documents and "
+            f"{stats['postings']}/{stats['max_postings']} postings left, {stats['skipped']} skipped"
+        )
+        return stats
+
+    def stats(self, session) -> dict:
+        """Current size of the whole index against its budget, for operators"""
+        documents, postings = session.query(
+            func.count(ContentDocument.hash), func.coalesce(func.sum(ContentDocument.terms), 0)
+        ).one()
+        with self._lock:
+            pending = len(self._inflight)
+        return {
+            "documents": documents,
+            "postings": postings,
+            "max_postings": config.CONTENT_INDEX_MAX_POSTINGS,
+            "skipped": self.skipped,
+            "pending": pending,
+        }
+
+    def user_stats(self, session, user_id: int) -> dict:
+        """How many of the user's text files are searchable and how many are not yet"""
+        indexed = select(ContentDocument.hash).where(ContentDocument.hash == File.hash).exists()
+        files, searchable = session.query(
+            func.count(File.id), func.count(case((indexed, 1)))
+        ).filter(*user_text_documents(user_id)).one()
+        return {"indexed": searchable, "pending": files - searchable}
+
+    def corpus(self, session, user_id: int) -> tuple[int, float]:
+        """Number of the user's documents and their average length, for ranking"""
+        documents, average = session.query(
+            func.count(ContentDocument.hash), func.avg(ContentDocument.length)
+        ).filter(ContentDocument.hash.in_(self._user_hashes(user_id))).one()
+        return documents, float(average or 0)
+
+    def document_frequencies(self, session, user_id: int, terms: list[str]) -> dict[str, int]:
+        """How many of the user's documents contain each term"""
+        rows = (
+            session.query(ContentPosting.term, func.count(ContentPosting.hash))
+            .filter(ContentPosting.term.in_(terms), ContentPosting.hash.in_(self._user_hashes(user_id)))
+            .group_by(ContentPosting.term)
+        )
+        return {term: count for term, count in rows}
+
+    @staticmethod
+    def _user_hashes(user_id: int):
+        return select(File.hash).where(*user_text_documents(user_id)).distinct()
+
+
+# Global instance
+content_index = ContentIndex()
@@ -2,6 +2,7 @@ from fastapi import HTTPException
 from app.models.user import User
 import os
 from app.core.config import config
+from app.services.sync.change_journal import record_change
 
 
 def DeleteFile(file_path: str, user: User):
@@ -30,3 +31,5 @@ def DeleteFile(file_path: str, user: User):
         raise PermissionError(f"Permission denied: {file_path}")
 
     os.remove(path_to_delete)
+
+    record_change(user, "delete", path_to_delete)
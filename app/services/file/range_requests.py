@@ -0,0 +1,202 @@
+import os
+import re
+import stat
+from secrets import token_hex
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+# More ranges than this in one request are ignored and the whole file is sent
+MAX_RANGES = 32
+
+RANGE_SPEC_PATTERN = re.compile(r"^(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlap the file"""
+
+
+def parse_range_header(value: str, file_size: int) -> Optional[list[tuple[int, int]]]:
+    """
+    Parse a Range header into sorted, merged (start, end exclusive) pairs.
+
+    Returns None if the header should be ignored (malformed, not bytes, or
+    too many ranges), in which case the whole file is sent with 200.
+    Raises RangeNotSatisfiable if no range overlaps the file.
+    """
+    try:
+        units, specs = value.split("=", 1)
+    except ValueError:
+        return None
+    if units.strip().lower() != "bytes":
+        return None
+
+    specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_SPEC_PATTERN.match(spec)
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(0, file_size - length), file_size
+        else:
+            start = int(first)
+            end = file_size if last == "" else int(last) + 1
+            if last != "" and end <= start:
+                return None
+            end = min(end, file_size)
+
+        if start < file_size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangedFileResponse(FileResponse):
+    """
+    FileResponse with complete byte-range support:
+    - single, open-ended and suffix ranges answered with 206
+    - multiple ranges answered with a multipart/byteranges body
+    - If-Range validated against the ETag or Last-Modified header
+    - 416 with 'Content-Range: bytes */size' when nothing is satisfiable
+    Malformed Range headers are ignored and the whole file is sent.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        send_header_only = scope["method"].upper() == "HEAD"
+
+        if self.stat_result is None:
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+                self.set_stat_headers(stat_result)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+        else:
+            stat_result = self.stat_result
+
+        file_size = stat_result.st_size
+        request_headers = Headers(scope=scope)
+        http_range = request_headers.get("range")
+        ranges = None
+
+        if http_range is not None and self.if_range_matches(request_headers.get("if-range")):
+            try:
+                ranges = parse_range_header(http_range, file_size)
+            except RangeNotSatisfiable:
+                await self.send_not_satisfiable(send, file_size)
+                return
+
+        if not ranges:
+            await self.send_ranges(send, 200, None, send_header_only)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+            self.headers["content-length"] = str(end - start)
+            await self.send_ranges(send, 206, ranges, send_header_only)
+        else:
+            await self.send_multipart(send, ranges, file_size, send_header_only)
+
+        if self.background is not None:
+            await self.background()
+
+    def if_range_matches(self, if_range: Optional[str]) -> bool:
+        """
+        A range is only honoured if If-Range is absent or still matches.
+        Weak entity tags never match.
+        """
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith("W/"):
+            return False
+        return if_range in (self.headers.get("etag"), self.headers.get("last-modified"))
+
+    async def send_not_satisfiable(self, send: Send, file_size: int):
+        headers = [
+            (b"content-range", f"bytes */{file_size}".encode("latin-1")),
+            (b"content-length", b"0"),
+            (b"accept-ranges", b"bytes"),
+        ]
+        await send({"type": "http.response.start", "status": 416, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send_ranges(
+        self,
+        send: Send,
+        status_code: int,
+        ranges: Optional[list[tuple[int, int]]],
+        send_header_only: bool,
+        parts: Optional[list[bytes]] = None,
+        trailer: bytes = b"",
+    ):
+        """
+        Send the response start and the given file ranges (the whole file
+        if ranges is None), each optionally preceded by a multipart header.
+        """
+        await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for index, (start, end) in enumerate(ranges or [(0, None)]):
+                if parts is not None:
+                    await send({"type": "http.response.body", "body": parts[index], "more_body": True})
+                await file.seek(start)
+                while end is None or start < end:
+                    size = self.chunk_size if end is None else min(self.chunk_size, end - start)
+                    chunk = await file.read(size)
+                    if not chunk:
+                        break
+                    start += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": trailer, "more_body": False})
+
+    async def send_multipart(
+        self, send: Send, ranges: list[tuple[int, int]], file_size: int, send_header_only: bool
+    ):
+        boundary = token_hex(13)
+        content_type = self.headers.get("content-type", "application/octet-stream")
+        parts = [
+            (
+                ("\r\n" if index else "")
+                + f"--{boundary}\r\n"
+                + f"Content-Type: {content_type}\r\n"
+                + f"Content-Range: bytes {start}-{end - 1}/{file_size}\r\n\r\n"
+            ).encode("latin-1")
+            for index, (start, end) in enumerate(ranges)
+        ]
+        trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(
+            sum(len(part) for part in parts)
+            + sum(end - start for start, end in ranges)
+            + len(trailer)
+        )
+        await self.send_ranges(send, 206, ranges, send_header_only, parts=parts, trailer=trailer)
@@ -1,5 +1,6 @@
 import os
 from app.core.config import config
+from app.services.sync.change_journal import record_change
 
 
 def RenameMyFile(old_file_path: str, new_file_name: str, user) -> str:
@@ -23,4 +24,6 @@ def RenameMyFile(old_file_path: str, new_file_name: str, user) -> str:
     # Rename the file
     os.rename(old_file_full_path, new_file_full_path)
 
+    record_change(user, "rename", new_file_full_path, old_path=old_file_full_path)
+
     return new_file_full_path
@@ -0,0 +1,200 @@
+import math
+import os
+import re
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.orm import Session
+from app.models.content_index import ContentDocument, ContentPosting
+from app.models.files import File
+from app.services.file.content_index import content_index, tokenize, user_text_documents
+from app.services.sync.metadata_index import below, iso_mtime
+
+# Query terms beyond this are ignored
+MAX_QUERY_TERMS = 16
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Characters of context shown around the first match
+SNIPPET_BEFORE = 60
+SNIPPET_AFTER = 140
+# Bytes read around the indexed offset of the first match. Documents
+# indexed without offsets are searched within their first SNIPPET_SCAN_BYTES.
+SNIPPET_WINDOW_BYTES = 4096
+SNIPPET_SCAN_BYTES = 64 * 1024
+
+
+def search_files(
+    session: Session,
+    user_id: int,
+    query: str,
+    extensions: Optional[list[str]] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None,
+    folder: str = "",
+    limit: int = 50,
+    offset: int = 0,
+) -> tuple[list[dict], bool]:
+    """
+    Search the user's files by name in the metadata index.
+
+    Every whitespace-separated term must occur in the filename (or in the
+    path, for terms containing "/"), case-insensitively. Exact and prefix
+    matches of the first term rank first, then shorter names. Returns the
+    page of results and whether more follow.
+    """
+    terms = query.lower().split()
+    name = func.lower(File.filename)
+    path = func.lower(File.path)
+
+    q = session.query(File.path, File.filename, File.size, File.mtime, File.mime_type).filter(
+        File.user_id == user_id
+    )
+    for term in terms:
+        q = q.filter((path if "/" in term else name).contains(term, autoescape=True))
+
+    if extensions:
+        q = q.filter(or_(*[name.endswith("." + ext.lower().lstrip("."), autoescape=True) for ext in extensions]))
+    if min_size is not None:
+        q = q.filter(File.size >= min_size)
+    if max_size is not None:
+        q = q.filter(File.size <= max_size)
+    if modified_after is not None:
+        q = q.filter(File.mtime >= modified_after.timestamp())
+    if modified_before is not None:
+        q = q.filter(File.mtime <= modified_before.timestamp())
+    if folder:
+        q = q.filter(below(File.path, folder))
+
+    order = []
+    if terms and "/" not in terms[0]:
+        order.append(
+            case(
+                (name == terms[0], 0),
+                (name.startswith(terms[0], autoescape=True), 1),
+                else_=2,
+            )
+        )
+    order += [func.length(File.filename), File.filename, File.path]
+
+    rows = q.order_by(*order).offset(offset).limit(limit + 1).all()
+    results = [
+        {
+            "path": row.path,
+            "name": row.filename,
+            "size": row.size,
+            "modified": iso_mtime(row.mtime),
+            "mime_type": row.mime_type,
+        }
+        for row in rows[:limit]
+    ]
+    return results, len(rows) > limit
+
+
+def search_content(
+    session: Session,
+    user_id: int,
+    root: str,
+    query: str,
+    folder: str = "",
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[list[dict], bool]:
+    """
+    Search the contents of the user's text documents in the content index.
+
+    Documents matching more of the query terms rank first, then by BM25
+    score. Each hit carries a snippet around the first matching term, read
+    from the file as it is now. Returns the page of results and whether
+    more follow.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+
+    documents, average_length = content_index.corpus(session, user_id)
+    frequencies = content_index.document_frequencies(session, user_id, terms)
+    terms = [term for term in terms if term in frequencies]
+    if not terms:
+        return [], False
+
+    # Per-term weight times the saturated, length-normalised term count
+    idf = case(
+        *[
+            (ContentPosting.term == term, literal(math.log(1 + (documents - df + 0.5) / (df + 0.5))))
+            for term, df in frequencies.items()
+        ],
+        else_=literal(0.0),
+    )
+    length_norm = literal(1 - BM25_B) + literal(BM25_B / max(average_length, 1.0)) * ContentDocument.length
+    weight = ContentPosting.count * literal(BM25_K1 + 1) / (ContentPosting.count + literal(BM25_K1) * length_norm)
+    score = func.sum(idf * weight).label("score")
+    matched = func.count(ContentPosting.term).label("matched")
+    offset_of_first = func.min(ContentPosting.offset).label("offset")
+
+    q = (
+        session.query(File.path, File.filename, File.size, File.mtime, matched, score, offset_of_first)
+        .join(ContentPosting, ContentPosting.hash == File.hash)
+        .join(ContentDocument, ContentDocument.hash == File.hash)
+        .filter(ContentPosting.term.in_(terms), *user_text_documents(user_id))
+    )
+    if folder:
+        q = q.filter(below(File.path, folder))
+
+    rows = (
+        q.group_by(File.id, File.path, File.filename, File.size, File.mtime)
+        .order_by(matched.desc(), score.desc(), File.path)
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    pattern = re.compile("|".join(rf"\b{re.escape(term)}\b" for term in terms), re.IGNORECASE)
+    results = [
+        {
+            "path": row.path,
+            "name": row.filename,
+            "size": row.size,
+            "modified": iso_mtime(row.mtime),
+            "score": round(row.score, 4),
+            "matched_terms": row.matched,
+            "snippet": make_snippet(os.path.join(root, *row.path.split("/")), pattern, row.offset),
+        }
+        for row in rows[:limit]
+    ]
+    return results, len(rows) > limit
+
+
+def make_snippet(full_path: str, pattern: re.Pattern, offset: Optional[int] = None) -> Optional[str]:
+    """
+    Text around the first match of pattern in the file, None if unreadable.
+    Only a window around the byte offset the match was indexed at is read.
+    """
+    if offset is None:
+        start, length = 0, SNIPPET_SCAN_BYTES
+    else:
+        start = max(offset - SNIPPET_WINDOW_BYTES // 2, 0)
+        length = SNIPPET_WINDOW_BYTES
+    try:
+        with open(full_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            data = f.read(length)
+    except OSError:
+        return None
+
+    # The window may start or end inside a multi-byte character
+    text = data.decode("utf-8", errors="replace").strip("\ufffd")
+    match = pattern.search(text)
+    start_of_match, end_of_match = (match.start(), match.end()) if match else (0, 0)
+    begin = max(start_of_match - SNIPPET_BEFORE, 0)
+    finish = min(end_of_match + SNIPPET_AFTER, len(text))
+    snippet = " ".join(text[begin:finish].split())
+    if begin > 0 or start > 0:
+        snippet = "…" + snippet
+    if finish < len(text) or start + len(data) < size:
+        snippet += "…"
+    return snippet
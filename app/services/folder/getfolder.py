@@ -31,6 +31,8 @@ def getallfolders(root_folder: str):
 
     items = {}
     for folder in os.listdir(folder_path):
+        if not os.path.isdir(os.path.join(folder_path, folder)):
+            continue
         all_items = os.listdir(os.path.join(folder_path, folder))
         items[folder] = all_items
 
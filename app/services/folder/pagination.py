@@ -0,0 +1,92 @@
+import base64
+import json
+from typing import Iterable, Optional, Tuple
+
+# Fields a folder listing can be sorted by
+SORT_FIELDS = ("name", "size", "modified")
+
+# Page size when a cursor is sent without a limit, and the largest allowed
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+FOLDER_GROUP = 0
+FILE_GROUP = 1
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for another sort order"""
+
+
+def entry_position(item: dict, mtime: Optional[float], sort: str) -> list:
+    """
+    Keyset position of a listing entry: [group, sort value, name].
+    Folders come before files and are always ordered by name.
+    """
+    if item["type"] == "folder":
+        return [FOLDER_GROUP, item["name"], item["name"]]
+    value = {"name": item["name"], "size": item["size"], "modified": mtime}[sort]
+    return [FILE_GROUP, value, item["name"]]
+
+
+def is_sort_value(value, field: str) -> bool:
+    """Whether a cursor value has the type of the field it is compared with"""
+    if field == "name":
+        return isinstance(value, str)
+    if field == "size":
+        return isinstance(value, int) and not isinstance(value, bool)
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def encode_cursor(position: list, sort: str, order: str) -> str:
+    data = json.dumps({"p": position, "s": sort, "o": order}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> list:
+    """Return the position encoded in cursor, checking it matches the sort."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        position = data["p"]
+        if data["s"] != sort or data["o"] != order:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        if not (isinstance(position, list) and len(position) == 3 and position[0] in (FOLDER_GROUP, FILE_GROUP)):
+            raise InvalidCursor("Invalid cursor")
+        if not (isinstance(position[2], str) and is_sort_value(position[1], "name" if position[0] == FOLDER_GROUP else sort)):
+            raise InvalidCursor("Invalid cursor")
+        return position
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def is_after(position: list, after: list, descending: bool) -> bool:
+    """Whether position comes after the cursor position in listing order."""
+    if position[0] != after[0]:
+        return position[0] > after[0]
+    if descending:
+        return position[1:] < after[1:]
+    return position[1:] > after[1:]
+
+
+def paginate(
+    entries: Iterable[Tuple[dict, Optional[float]]],
+    sort: str,
+    descending: bool,
+    after: Optional[list],
+    limit: Optional[int],
+) -> Tuple[list, Optional[list]]:
+    """
+    Sort (item, mtime) pairs from a disk scan and cut one page out of them.
+    Returns the page and the position to continue from, or None at the end.
+    """
+    positioned = [(entry_position(item, mtime, sort), item) for item, mtime in entries]
+    folders = sorted((p for p in positioned if p[0][0] == FOLDER_GROUP), key=lambda p: p[0][1:], reverse=descending)
+    files = sorted((p for p in positioned if p[0][0] == FILE_GROUP), key=lambda p: p[0][1:], reverse=descending)
+
+    ordered = folders + files
+    if after is not None:
+        ordered = [p for p in ordered if is_after(p[0], after, descending)]
+    if limit is None or len(ordered) <= limit:
+        return [item for _, item in ordered], None
+    return [item for _, item in ordered[:limit]], ordered[limit - 1][0]
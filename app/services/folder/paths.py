@@ -0,0 +1,26 @@
+from fastapi import HTTPException
+from app.core.config import config
+from app.models.user import User
+import os
+
+
+def resolve_user_path(path: str, user: User) -> str:
+    """
+    Resolve a path relative to the user's root folder ("" for the root),
+    rejecting anything that escapes it.
+    """
+    # Construct full path
+    base_path = os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
+    full_path = os.path.join(base_path, path) if path else base_path
+
+    # Security check: ensure path is within user's directory
+    full_path = os.path.realpath(full_path)
+    base_path = os.path.realpath(base_path)
+    try:
+        if os.path.commonpath([full_path, base_path]) != base_path:
+            raise HTTPException(status_code=403, detail="Access denied")
+    except ValueError:
+        # Different drives on Windows or other path issues
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return full_path
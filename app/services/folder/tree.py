@@ -0,0 +1,78 @@
+import os
+import logging
+from collections import deque
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def scan_dir(path: str) -> Tuple[list, list]:
+    """Return the (folders, files) DirEntries of a directory, by name, without symlinks."""
+    folders, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry)
+                    else:
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.warning(f"Error scanning directory {path}: {e}")
+    folders.sort(key=lambda entry: entry.name)
+    files.sort(key=lambda entry: entry.name)
+    return folders, files
+
+
+def build_tree(root_path: str, depth: int, max_entries: int, include_files: bool) -> Tuple[dict, int, bool]:
+    """
+    Breadth-first folder tree below root_path.
+
+    Every folder node carries the number of folders and files directly in
+    it. Folders up to depth levels down list their children; deeper ones
+    only have counts, so a client can expand them with another request.
+    At most max_entries child nodes are returned in total, nearest levels
+    first. Returns (tree, entries returned, whether it was truncated).
+    """
+    tree = {"name": os.path.basename(root_path), "type": "folder"}
+    queue = deque([(tree, root_path, 0)])
+    emitted = 0
+    truncated = False
+
+    while queue:
+        node, path, level = queue.popleft()
+        folders, files = scan_dir(path)
+        node["folders"] = len(folders)
+        node["files"] = len(files)
+        if level >= depth:
+            continue
+
+        children = []
+        for entry in folders:
+            if emitted >= max_entries:
+                truncated = True
+                break
+            child = {"name": entry.name, "type": "folder"}
+            children.append(child)
+            queue.append((child, entry.path, level + 1))
+            emitted += 1
+
+        if include_files:
+            for entry in files:
+                if emitted >= max_entries:
+                    truncated = True
+                    break
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                children.append({"name": entry.name, "type": "file", "size": size})
+                emitted += 1
+
+        node["children"] = children
+
+    return tree, emitted, truncated
@@ -0,0 +1 @@
+# Media services
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import config
+from app.services.media.imaging import render_derivative, submit_media_task
+from app.services.sync.hash_pool import run_in_hash_pool
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+# Largest width or height a derivative can be requested at
+MAX_DERIVATIVE_DIMENSION = 4096
+
+FIT_MODES = ("contain", "cover")
+
+
+class DerivativeError(Exception):
+    """The source image could not be decoded"""
+
+
+def default_derivative_dir() -> str:
+    """Location of resized images inside the storage directory."""
+    return os.path.join(config.DIR_LOCATION, "cache", "derivatives")
+
+
+class DerivativeCache:
+    """
+    Disk cache of resized and re-encoded images with a size budget.
+
+    Entries are keyed by the source's content hash and the requested
+    rendering, rendered in the media process pool and evicted least
+    recently used first once the cache grows past its budget. Recency is
+    kept in file mtimes, so the order survives restarts; the in-memory
+    index is rebuilt from them on first use. All index and disk work runs
+    in worker threads, never on the event loop.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._entries: Optional[OrderedDict[str, int]] = None
+        self._total = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = Lock()
+        # Guards the LRU index, held during disk work so kept apart from _lock
+        self._index_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir or default_derivative_dir()
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else config.DERIVATIVE_CACHE_SIZE
+
+    def derivative_path(self, content_hash: str, width, height, fit: str, fmt: str) -> str:
+        key = hashlib.sha1(f"{content_hash}:{width}:{height}:{fit}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{fmt}")
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files on disk, oldest first."""
+        if self._entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for entry_dir in os.scandir(self.cache_dir):
+                if not entry_dir.is_dir():
+                    continue
+                for entry in os.scandir(entry_dir.path):
+                    if entry.name.endswith(".tmp"):
+                        continue
+                    stat_info = entry.stat()
+                    found.append((stat_info.st_mtime_ns, entry.path, stat_info.st_size))
+        found.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in found)
+        self._total = sum(self._entries.values())
+
+    def _touch(self, path: str) -> bool:
+        """Mark a cached file as most recently used, False if it is gone."""
+        with self._index_lock:
+            self._load_index()
+            try:
+                os.utime(path)
+            except OSError:
+                self._total -= self._entries.pop(path, 0)
+                return False
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            else:
+                size = os.path.getsize(path)
+                self._entries[path] = size
+                self._total += size
+            return True
+
+    def _add(self, path: str):
+        """Index a newly rendered file and evict until back under budget."""
+        with self._index_lock:
+            self._load_index()
+            size = os.path.getsize(path)
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, size = next(iter(self._entries.items()))
+            if path == keep:
+                self._entries.move_to_end(path)
+                continue
+            del self._entries[path]
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _render(self, file_path: str, out_path: str, *args) -> Future:
+        """Start rendering out_path, or join the render already running."""
+        with self._lock:
+            future = self._inflight.get(out_path)
+            if future is None:
+                future = submit_media_task(render_derivative, file_path, out_path, *args)
+                self._inflight[out_path] = future
+                future.add_done_callback(lambda done: self._inflight.pop(out_path, None))
+            return future
+
+    async def get(
+        self,
+        file_path: str,
+        width: Optional[int],
+        height: Optional[int],
+        fit: str,
+        fmt: str,
+        stat_info: Optional[os.stat_result] = None,
+    ) -> Tuple[str, str]:
+        """
+        Return (derivative path, source content hash), rendering the
+        derivative if it is not cached.
+        Raises DerivativeError if the image cannot be decoded.
+        """
+        content_hash = await run_in_hash_pool(get_cached_file_hash, file_path, "md5", stat_info)
+        out_path = self.derivative_path(content_hash, width, height, fit, fmt)
+
+        if await run_in_threadpool(self._touch, out_path):
+            self.hits += 1
+            return out_path, content_hash
+
+        self.misses += 1
+        try:
+            await asyncio.wrap_future(self._render(file_path, out_path, width, height, fit, fmt))
+        except Exception as e:
+            raise DerivativeError(file_path) from e
+        await run_in_threadpool(self._add, out_path)
+        return out_path, content_hash
+
+    def stats(self) -> dict:
+        with self._index_lock:
+            self._load_index()
+            return {
+                "entries": len(self._entries),
+                "size": self._total,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Global instance
+derivative_cache = DerivativeCache()
@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import Lock
+from typing import Iterable, Optional, Tuple
+from PIL import Image, ImageOps
+
+# Decoding and resizing are CPU bound and Pillow holds the GIL for much of
+# it, so images are rendered in worker processes. Workers are spawned
+# rather than forked since the server process runs threads, and this
+# module only imports Pillow so they start quickly.
+MEDIA_WORKERS = os.cpu_count() or 4
+
+# Encoder settings per output format: (Pillow format, media type, save options)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Source images Pillow can decode that are worth rendering derivatives of
+RASTER_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+
+
+class ImageDecodeError(Exception):
+    """The source is not an image Pillow can decode"""
+
+
+def is_raster_image(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS
+
+
+def submit_media_task(func, *args) -> Future:
+    """Run func(*args) on the media process pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=get_context("spawn"))
+        try:
+            return _executor.submit(func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed while decoding a huge image), start over
+            _executor = ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=get_context("spawn"))
+            return _executor.submit(func, *args)
+
+
+def shutdown_media_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def open_image(source_path: str, max_size: Tuple[int, int]) -> Image.Image:
+    """
+    Decode an image upright, letting JPEG decode straight at a reduced
+    scale when the result only needs to fit in max_size.
+    """
+    try:
+        image_file = Image.open(source_path)
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # Raised with a plain message so it pickles back from the workers
+        raise ImageDecodeError(str(e)) from None
+    with image_file as image:
+        image.draft("RGB", max_size)
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    return image
+
+
+def save_image(image: Image.Image, out_path: str, fmt: str):
+    """Encode image to out_path atomically, so readers never see a partial file."""
+    pil_format, _, options = IMAGE_FORMATS[fmt]
+    if pil_format == "JPEG" and image.mode == "RGBA":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        image.save(temp_path, pil_format, **options)
+        os.replace(temp_path, out_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def render_thumbnails(source_path: str, outputs: Iterable[Tuple[int, str, str]]):
+    """
+    Render every (size, format, out_path) thumbnail of one image, decoding
+    it once. Sizes are rendered largest first, each from the previous one.
+    """
+    outputs = sorted(outputs, key=lambda output: output[0], reverse=True)
+    largest = outputs[0][0]
+    image = open_image(source_path, (largest, largest))
+
+    for size, fmt, out_path in outputs:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        save_image(image, out_path, fmt)
+
+
+def render_derivative(
+    source_path: str,
+    out_path: str,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    fmt: str,
+):
+    """
+    Render a resized copy of an image. "contain" fits the image inside
+    width x height, "cover" fills the box and crops the overflow around
+    the centre. Images are never enlarged; a missing dimension is
+    unconstrained.
+    """
+    with Image.open(source_path) as probe:
+        source_size = probe.size
+    width = min(width or source_size[0], source_size[0])
+    height = min(height or source_size[1], source_size[1])
+
+    image = open_image(source_path, (width, height))
+    if fit == "cover":
+        image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    save_image(image, out_path, fmt)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from app.core.config import config
+from app.services.media.imaging import IMAGE_FORMATS, ImageDecodeError, is_raster_image, render_thumbnails, submit_media_task
+from app.services.sync.hash_pool import hash_executor, run_in_hash_pool
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+# Bounding box edge, in pixels, of every thumbnail rendered for an image
+THUMBNAIL_SIZES = (128, 256, 512)
+
+# Content hashes of undecodable images remembered so they are not retried
+MAX_FAILED_HASHES = 4096
+
+
+class ThumbnailError(Exception):
+    """The source image could not be decoded"""
+
+
+def default_thumbnail_dir() -> str:
+    """Location of rendered thumbnails inside the storage directory."""
+    return os.path.join(config.DIR_LOCATION, "cache", "thumbnails")
+
+
+class ThumbnailService:
+    """
+    Renders and caches image thumbnails.
+
+    Thumbnails are keyed by the source's content hash, so renames and moves
+    keep them and an edited image gets new ones. All sizes and formats of
+    an image are rendered together in the media process pool from a single
+    decode. Concurrent requests for an image that is being rendered wait
+    on the same job instead of starting another one.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self._cache_dir = cache_dir
+        self._inflight: Dict[str, Future] = {}
+        self._failed: OrderedDict[str, None] = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir or default_thumbnail_dir()
+
+    def thumbnail_path(self, content_hash: str, size: int, fmt: str) -> str:
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}-{size}.{fmt}")
+
+    def ensure(self, file_path: str, content_hash: str) -> Future:
+        """
+        Render any missing thumbnails of the image with the given content
+        hash, returning a future that completes once they all exist.
+        """
+        with self._lock:
+            future = self._inflight.get(content_hash)
+            if future is not None:
+                return future
+
+            if content_hash in self._failed:
+                self._failed.move_to_end(content_hash)
+                future = Future()
+                future.set_exception(ThumbnailError(file_path))
+                return future
+
+            missing = [
+                (size, fmt, self.thumbnail_path(content_hash, size, fmt))
+                for size in THUMBNAIL_SIZES
+                for fmt in IMAGE_FORMATS
+            ]
+            missing = [output for output in missing if not os.path.exists(output[2])]
+            if not missing:
+                future = Future()
+                future.set_result(None)
+                return future
+
+            future = submit_media_task(render_thumbnails, file_path, missing)
+            self._inflight[content_hash] = future
+
+        future.add_done_callback(lambda done: self._finish(content_hash, done))
+        return future
+
+    def _finish(self, content_hash: str, future: Future):
+        with self._lock:
+            self._inflight.pop(content_hash, None)
+            error = None if future.cancelled() else future.exception()
+            if error is None:
+                return
+            logger.warning(f"Thumbnail rendering failed for {content_hash}: {error}")
+            if isinstance(error, ImageDecodeError):
+                # Remember undecodable content so it is not retried on every
+                # request; anything else (a dead worker, a file read while it
+                # was being written) is retried next time
+                self._failed[content_hash] = None
+                if len(self._failed) > MAX_FAILED_HASHES:
+                    self._failed.popitem(last=False)
+
+    async def get_thumbnail(
+        self, file_path: str, size: int, fmt: str, stat_info: Optional[os.stat_result] = None
+    ) -> Tuple[str, str]:
+        """
+        Return (thumbnail path, source content hash), rendering the
+        thumbnails first if they do not exist yet.
+        Raises ThumbnailError if the image cannot be decoded.
+        """
+        content_hash = await run_in_hash_pool(get_cached_file_hash, file_path, "md5", stat_info)
+        thumb_path = self.thumbnail_path(content_hash, size, fmt)
+        if not os.path.exists(thumb_path):
+            try:
+                await asyncio.wrap_future(self.ensure(file_path, content_hash))
+            except ThumbnailError:
+                raise
+            except Exception as e:
+                raise ThumbnailError(file_path) from e
+        return thumb_path, content_hash
+
+    def schedule(self, file_path: str):
+        """Render thumbnails of a new or changed image in the background."""
+        if is_raster_image(file_path):
+            hash_executor.submit(self._render_in_background, file_path)
+
+    def _render_in_background(self, file_path: str):
+        try:
+            self.ensure(file_path, get_cached_file_hash(file_path, "md5"))
+        except Exception as e:
+            logger.warning(f"Could not schedule thumbnails for {file_path}: {e}")
+
+
+# Global instance
+thumbnail_service = ThumbnailService()
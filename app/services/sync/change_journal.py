@@ -0,0 +1,171 @@
+import os
+import logging
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.core.config import config
+from app.core.database import SessionLocal
+from app.models.sync_change import SyncChange
+from app.services.sync.merkle import merkle_index
+from app.services.sync.tree_state import tree_state
+from app.services.sync.metadata_index import is_temp_artifact, metadata_index, relative_path
+
+logger = logging.getLogger(__name__)
+
+CHANGE_ACTIONS = ("create", "modify", "delete", "rename")
+
+
+def user_root(user) -> str:
+    return os.path.realpath(
+        os.path.join(config.DIR_LOCATION, "data", user.root_foldername)
+    )
+
+
+def to_user_relative(user, full_path: str) -> str:
+    """
+    Convert an absolute path inside the user's storage to a '/'-separated
+    path relative to the user's root folder.
+    """
+    return relative_path(user_root(user), full_path)
+
+
+def record_changes(user, changes: list[dict], db: Optional[Session] = None):
+    """
+    Append entries to the user's change journal.
+
+    Each change is a dict with "action", "path" and optionally "old_path",
+    "is_dir" and "size", where paths are absolute filesystem paths.
+    Journal failures are logged and never fail the write that caused them.
+    Cached Merkle hashes and listing validators of the affected directories
+    are invalidated too, and the metadata index is updated in the same
+    transaction as the journal. An index update that fails is rolled back
+    on its own and the user's listings fall back to the disk until the
+    next reconcile. Changes to temp artifacts (see is_temp_artifact) only
+    update the index, clients never see them.
+
+    This blocks on the user's index lock, which a reconcile step may hold
+    for a while, so async handlers call it through run_in_threadpool.
+    """
+    if not changes:
+        return
+
+    for change in changes:
+        is_dir = change.get("is_dir", False)
+        for path in (change["path"], change.get("old_path")):
+            if path:
+                merkle_index.invalidate(path, is_dir=is_dir)
+                tree_state.invalidate(path, is_dir=is_dir)
+
+    session = db or SessionLocal()
+    try:
+        for change in changes:
+            if change["action"] not in CHANGE_ACTIONS:
+                raise ValueError(f"Unknown change action: {change['action']}")
+
+            path = to_user_relative(user, change["path"])
+            old_path = to_user_relative(user, change["old_path"]) if change.get("old_path") else None
+            if is_temp_artifact(path):
+                continue
+            action = change["action"]
+            if old_path is not None and is_temp_artifact(old_path):
+                action, old_path = "create", None
+
+            session.add(
+                SyncChange(
+                    user_id=user.id,
+                    action=action,
+                    path=path,
+                    old_path=old_path,
+                    is_dir=change.get("is_dir", False),
+                    size=change.get("size"),
+                )
+            )
+
+        pending_hashes = []
+        # Held until commit so a reconcile step never sees half a write
+        with metadata_index.user_lock(user.id):
+            try:
+                with session.begin_nested():
+                    pending_hashes = metadata_index.apply_changes(session, user.id, user_root(user), changes)
+            except Exception as e:
+                metadata_index.mark_stale(user.id)
+                logger.error(f"Failed to update metadata index: {e}", exc_info=True)
+
+            session.commit()
+        metadata_index.schedule_hashes(user.id, pending_hashes)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Failed to record sync changes: {e}", exc_info=True)
+    finally:
+        if db is None:
+            session.close()
+
+
+def record_change(
+    user,
+    action: str,
+    path: str,
+    old_path: Optional[str] = None,
+    is_dir: bool = False,
+    size: Optional[int] = None,
+    db: Optional[Session] = None,
+):
+    """
+    Append a single entry to the user's change journal.
+    See record_changes for details.
+    """
+    record_changes(
+        user,
+        [
+            {
+                "action": action,
+                "path": path,
+                "old_path": old_path,
+                "is_dir": is_dir,
+                "size": size,
+            }
+        ],
+        db=db,
+    )
+
+
+def scope_change(change: SyncChange, prefix: str) -> Optional[dict]:
+    """
+    Translate a journal entry into the view of a device folder.
+
+    prefix is the device folder name ("" for the whole user root). Entries
+    outside the folder are dropped, and renames crossing its boundary become
+    a create or delete so the client never sees paths it does not own.
+    """
+
+    def strip(path: Optional[str]) -> Optional[str]:
+        if path is None:
+            return None
+        if not prefix:
+            return path
+        if path.startswith(prefix + "/"):
+            return path[len(prefix) + 1 :]
+        return None
+
+    path = strip(change.path)
+    old_path = strip(change.old_path)
+    action = change.action
+
+    if change.action == "rename":
+        if path is None and old_path is None:
+            return None
+        if path is None:
+            action, path, old_path = "delete", old_path, None
+        elif old_path is None:
+            action = "create"
+    elif path is None:
+        return None
+
+    return {
+        "cursor": change.id,
+        "action": action,
+        "path": path,
+        "old_path": old_path,
+        "type": "folder" if change.is_dir else "file",
+        "size": change.size,
+        "changed_at": change.created_at.isoformat() if change.created_at else None,
+    }
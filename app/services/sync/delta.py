@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import os
+import shutil
+import uuid
+import zlib
+from typing import Iterable
+
+# Default block size for signatures. Small enough that a local edit only
+# costs one block of literal data, large enough to keep signatures compact.
+DEFAULT_BLOCK_SIZE = 64 * 1024
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Adler-32 modulus, used by roll_adler32
+ADLER_MOD = 65521
+
+
+def roll_adler32(checksum: int, out_byte: int, in_byte: int, block_len: int) -> int:
+    """
+    Slide an Adler-32 window by one byte.
+
+    Given the checksum of data[i:i+block_len], return the checksum of
+    data[i+1:i+1+block_len] in constant time. This is the recurrence clients
+    use to find matching blocks at every byte offset of their local file.
+    """
+    a = checksum & 0xFFFF
+    b = (checksum >> 16) & 0xFFFF
+    a = (a - out_byte + in_byte) % ADLER_MOD
+    b = (b - block_len * out_byte + a - 1) % ADLER_MOD
+    return (b << 16) | a
+
+
+def compute_signatures(file_path: str, block_size: int, algorithm: str = "md5") -> list[dict]:
+    """
+    Split a file into fixed-size blocks and return a weak rolling checksum
+    (Adler-32) and a strong hash for each block. The last block may be short.
+    """
+    signatures = []
+    with open(file_path, "rb") as f:
+        index = 0
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            strong = hashlib.md5(block) if algorithm == "md5" else hashlib.sha256(block)
+            signatures.append(
+                {
+                    "index": index,
+                    "offset": index * block_size,
+                    "size": len(block),
+                    "weak": zlib.adler32(block),
+                    "strong": strong.hexdigest(),
+                }
+            )
+            index += 1
+    return signatures
+
+
+def apply_delta(
+    base_file: str, instructions: Iterable[dict], block_size: int, algorithm: str = "md5"
+) -> dict:
+    """
+    Rebuild a file from blocks of its current version plus literal data.
+
+    Each instruction is either {"op": "copy", "block": i, "count": n} to
+    reuse n blocks of the base file starting at block i, or
+    {"op": "data", "data": <base64>} for new bytes. The result is written to
+    a temporary file next to the base file; the caller decides whether to
+    move it into place. Raises ValueError for out-of-range instructions.
+
+    Returns a dict with the temp path, hash, size and copied/literal byte counts.
+    """
+    base_size = os.path.getsize(base_file)
+    total_blocks = (base_size + block_size - 1) // block_size
+
+    directory, name = os.path.split(base_file)
+    temp_path = os.path.join(directory, f".{name}.delta-{uuid.uuid4().hex}")
+    hash_func = hashlib.md5() if algorithm == "md5" else hashlib.sha256()
+    copied_bytes = 0
+    literal_bytes = 0
+
+    try:
+        with open(base_file, "rb") as src, open(temp_path, "wb") as dst:
+            for instruction in instructions:
+                if instruction["op"] == "copy":
+                    start = instruction["block"]
+                    count = instruction.get("count", 1)
+                    if start is None or start < 0 or count < 1 or start + count > total_blocks:
+                        raise ValueError(
+                            f"Block range {start}+{count} is outside the base file ({total_blocks} blocks)"
+                        )
+                    src.seek(start * block_size)
+                    remaining = min(count * block_size, base_size - start * block_size)
+                    while remaining > 0:
+                        chunk = src.read(min(remaining, 1024 * 1024))
+                        dst.write(chunk)
+                        hash_func.update(chunk)
+                        remaining -= len(chunk)
+                        copied_bytes += len(chunk)
+                elif instruction["op"] == "data":
+                    chunk = base64.b64decode(instruction.get("data") or "", validate=True)
+                    dst.write(chunk)
+                    hash_func.update(chunk)
+                    literal_bytes += len(chunk)
+                else:
+                    raise ValueError(f"Unknown delta operation: {instruction['op']}")
+
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copymode(base_file, temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        "temp_path": temp_path,
+        "hash": hash_func.hexdigest(),
+        "size": copied_bytes + literal_bytes,
+        "copied_bytes": copied_bytes,
+        "literal_bytes": literal_bytes,
+    }
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import logging
+from threading import Lock
+from typing import Optional
+from app.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path() -> str:
+    """Location of the hash cache database inside the storage directory."""
+    return os.path.join(config.DIR_LOCATION, "cache", "hash_cache.sqlite3")
+
+
+class FileHashCache:
+    """
+    Persistent cache of file content hashes backed by SQLite.
+
+    Entries are keyed by (st_dev, st_ino, algorithm) and store the size and
+    mtime_ns the hash was computed for. A lookup only hits when size and
+    mtime_ns still match the file on disk, so any write to the file makes its
+    entry stale and it is replaced on the next hash.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use, disabling the cache if that fails."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+
+        db_path = self._db_path or default_cache_path()
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    dev INTEGER NOT NULL,
+                    ino INTEGER NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (dev, ino, algorithm)
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        except Exception as e:
+            logger.warning(f"Hash cache disabled, could not open {db_path}: {e}")
+            self._disabled = True
+        return self._conn
+
+    def get(self, stat_info: os.stat_result, algorithm: str) -> Optional[str]:
+        """Return the cached hash if the entry still matches size and mtime_ns."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                self.misses += 1
+                return None
+
+            row = conn.execute(
+                "SELECT size, mtime_ns, hash FROM file_hashes "
+                "WHERE dev = ? AND ino = ? AND algorithm = ?",
+                (stat_info.st_dev, stat_info.st_ino, algorithm),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            size, mtime_ns, file_hash = row
+            if size != stat_info.st_size or mtime_ns != stat_info.st_mtime_ns:
+                # File changed since it was hashed, drop the stale entry
+                conn.execute(
+                    "DELETE FROM file_hashes WHERE dev = ? AND ino = ? AND algorithm = ?",
+                    (stat_info.st_dev, stat_info.st_ino, algorithm),
+                )
+                conn.commit()
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return file_hash
+
+    def set(self, stat_info: os.stat_result, algorithm: str, file_hash: str, path: str):
+        """Store the hash computed for the file described by stat_info."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes "
+                "(dev, ino, algorithm, size, mtime_ns, hash, path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    stat_info.st_dev,
+                    stat_info.st_ino,
+                    algorithm,
+                    stat_info.st_size,
+                    stat_info.st_mtime_ns,
+                    file_hash,
+                    path,
+                ),
+            )
+            conn.commit()
+
+    def prune(self) -> int:
+        """
+        Remove entries whose file no longer exists or has changed on disk.
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            rows = conn.execute(
+                "SELECT dev, ino, algorithm, size, mtime_ns, path FROM file_hashes"
+            ).fetchall()
+
+        stale = []
+        for dev, ino, algorithm, size, mtime_ns, path in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append((dev, ino, algorithm))
+                continue
+            if (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) != (dev, ino, size, mtime_ns):
+                stale.append((dev, ino, algorithm))
+
+        if stale:
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM file_hashes WHERE dev = ? AND ino = ? AND algorithm = ?",
+                    stale,
+                )
+                self._conn.commit()
+                self.invalidations += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            conn = self._connect()
+            entries = 0
+            if conn is not None:
+                entries = conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "enabled": conn is not None,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Global instance
+hash_cache = FileHashCache()
@@ -0,0 +1,21 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Hashing is disk bound and hashlib releases the GIL while digesting, so a
+# thread pool gives real parallelism here and shares the in-process hash
+# cache, which a process pool could not.
+HASH_WORKERS = os.cpu_count() or 4
+
+hash_executor = ThreadPoolExecutor(
+    max_workers=HASH_WORKERS, thread_name_prefix="sync-hash"
+)
+
+
+async def run_in_hash_pool(func, *args):
+    """
+    Run a blocking stat/hash function on the shared hash pool without
+    blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, func, *args)
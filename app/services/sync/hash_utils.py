@@ -1,11 +1,17 @@
 import hashlib
 import os
+import zlib
 from datetime import datetime, timezone
+from typing import Optional
+from app.services.sync.hash_cache import hash_cache
 
 # Chunk size for reading files during hash calculation
 # 8KB is a good balance between memory usage and I/O performance
 CHUNK_SIZE = 8192
 
+# CRC32 is cheap per byte, so larger reads cut syscall overhead
+CRC_CHUNK_SIZE = 1024 * 1024
+
 
 def calculate_file_hash(file_path: str, algorithm: str = "md5") -> str:
     """
@@ -13,11 +19,18 @@ def calculate_file_hash(file_path: str, algorithm: str = "md5") -> str:
     
     Args:
         file_path: Path to the file
-        algorithm: Hash algorithm to use ("md5" or "sha256")
+        algorithm: Hash algorithm to use ("md5", "sha256" or "crc32")
     
     Returns:
         Hexadecimal hash string
     """
+    if algorithm == "crc32":
+        crc = 0
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(CRC_CHUNK_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+        return f"{crc:08x}"
+
     hash_func = hashlib.md5() if algorithm == "md5" else hashlib.sha256()
     
     with open(file_path, "rb") as f:
@@ -27,6 +40,38 @@ def calculate_file_hash(file_path: str, algorithm: str = "md5") -> str:
     return hash_func.hexdigest()
 
 
+def get_cached_file_hash(
+    file_path: str, algorithm: str = "md5", stat_info: Optional[os.stat_result] = None
+) -> str:
+    """
+    Return the hash of a file, reusing the persistent hash cache when the
+    file's inode, size and mtime are unchanged since it was last hashed.
+    
+    Args:
+        file_path: Path to the file
+        algorithm: Hash algorithm to use ("md5", "sha256" or "crc32")
+        stat_info: Result of os.stat for the file, if the caller already has it
+    
+    Returns:
+        Hexadecimal hash string
+    """
+    if stat_info is None:
+        stat_info = os.stat(file_path)
+
+    file_hash = hash_cache.get(stat_info, algorithm)
+    if file_hash is not None:
+        return file_hash
+
+    file_hash = calculate_file_hash(file_path, algorithm)
+
+    # Only cache the result if the file was not modified while hashing
+    after = os.stat(file_path)
+    if (after.st_size, after.st_mtime_ns) == (stat_info.st_size, stat_info.st_mtime_ns):
+        hash_cache.set(stat_info, algorithm, file_hash, file_path)
+
+    return file_hash
+
+
 def get_file_metadata(file_path: str) -> dict:
     """
     Get file metadata including hash, size, and modification time.
@@ -37,11 +82,12 @@ def get_file_metadata(file_path: str) -> dict:
     Returns:
         Dictionary with file metadata
     """
-    if not os.path.exists(file_path):
+    try:
+        stat_info = os.stat(file_path)
+    except FileNotFoundError:
         return None
     
-    stat_info = os.stat(file_path)
-    file_hash = calculate_file_hash(file_path)
+    file_hash = get_cached_file_hash(file_path, stat_info=stat_info)
     
     modified_at = datetime.fromtimestamp(stat_info.st_mtime, tz=timezone.utc)
     
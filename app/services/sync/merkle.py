@@ -0,0 +1,109 @@
+import hashlib
+import os
+import logging
+from threading import Lock
+from typing import Dict
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+
+class MerkleIndex:
+    """
+    In-memory Merkle hashes for directories in the storage tree.
+
+    A directory's hash covers the sorted names, types and hashes of its
+    children, so two trees with the same hash are identical. Entries are
+    reused while the directory's own mtime is unchanged (catches direct
+    children being added or removed) and are invalidated for a path and all
+    of its ancestors by the write paths through the change journal (catches
+    edits deeper in the tree). File hashes come from the persistent hash
+    cache, so rebuilding after a restart does not reread file contents.
+    """
+
+    def __init__(self):
+        self._hashes: Dict[str, dict] = {}
+        self._lock = Lock()
+        # Bumped by every invalidation, so a hash computed across one is not stored
+        self._generation = 0
+
+    def directory_hash(self, dir_path: str) -> str:
+        """Return the Merkle hash of a directory, computing it if needed."""
+        dir_path = os.path.realpath(dir_path)
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+
+        with self._lock:
+            cached = self._hashes.get(dir_path)
+            generation = self._generation
+        if cached is not None and cached["mtime_ns"] == mtime_ns:
+            return cached["hash"]
+
+        digest = hashlib.sha256()
+        for child in self.list_children(dir_path):
+            digest.update(f"{child['type']}\0{child['name']}\0{child['hash']}\n".encode())
+        dir_hash = digest.hexdigest()
+
+        with self._lock:
+            # A nested change may have been missed while computing
+            if self._generation == generation:
+                self._hashes[dir_path] = {"hash": dir_hash, "mtime_ns": mtime_ns}
+        return dir_hash
+
+    def list_children(self, dir_path: str) -> list[dict]:
+        """
+        Return name, type, hash and size of every direct child, sorted by name.
+        Symlinked directories are listed with an empty hash and not followed.
+        """
+        children = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        child_hash = "" if entry.is_symlink() else self.directory_hash(entry.path)
+                        children.append(
+                            {"name": entry.name, "type": "folder", "hash": child_hash, "size": None}
+                        )
+                    else:
+                        stat_info = entry.stat()
+                        children.append(
+                            {
+                                "name": entry.name,
+                                "type": "file",
+                                "hash": get_cached_file_hash(entry.path, stat_info=stat_info),
+                                "size": stat_info.st_size,
+                            }
+                        )
+                except OSError as e:
+                    logger.warning(f"Error accessing {entry.path}: {e}")
+                    continue
+
+        children.sort(key=lambda child: child["name"])
+        return children
+
+    def invalidate(self, path: str, is_dir: bool = False):
+        """
+        Drop cached hashes for all ancestors of a changed path, and for a
+        directory also the path itself and everything below it.
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            self._generation += 1
+            if is_dir:
+                prefix = path + os.sep
+                for cached_path in [p for p in self._hashes if p == path or p.startswith(prefix)]:
+                    del self._hashes[cached_path]
+
+            parent = os.path.dirname(path)
+            while parent and parent != path:
+                self._hashes.pop(parent, None)
+                path, parent = parent, os.path.dirname(parent)
+
+    def clear(self):
+        """Drop every cached directory hash"""
+        with self._lock:
+            self._generation += 1
+            self._hashes.clear()
+
+
+# Global instance
+merkle_index = MerkleIndex()
@@ -0,0 +1,649 @@
+import os
+import re
+import mimetypes
+import logging
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from app.core.config import config
+from app.core.database import SessionLocal
+from app.models.files import File
+from app.models.folders import Folder
+from app.services.file.content_index import content_index, is_text_document
+from app.services.folder.pagination import FILE_GROUP, FOLDER_GROUP
+from app.services.sync.hash_cache import hash_cache
+from app.services.sync.hash_pool import hash_executor
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE_PREFIXES = ("image/", "video/", "audio/")
+
+# Names of the in-progress files writes leave in the user's tree: chunked
+# and tus uploads' "{id}_parts" directories, raw uploads' ".{name}.part",
+# ".{name}.part.total" and ".{name}.upload-{hex}", and delta syncs'
+# ".{name}.delta-{hex}". They are never indexed.
+TEMP_ARTIFACT_PATTERN = re.compile(
+    r"^(?:.+_parts|\..+\.(?:part|part\.total|upload-[0-9a-f]{32}|delta-[0-9a-f]{32}))$"
+)
+
+
+def user_root(user) -> str:
+    """Absolute path of the user's root folder"""
+    return os.path.realpath(os.path.join(config.DIR_LOCATION, "data", user.root_foldername))
+
+
+def relative_path(root: str, full_path: str) -> str:
+    """'/'-separated path of full_path relative to root, "" for root itself"""
+    rel_path = os.path.relpath(os.path.realpath(full_path), root)
+    if rel_path == ".":
+        return ""
+    return rel_path.replace(os.sep, "/")
+
+
+def is_temp_artifact(rel_path: str) -> bool:
+    """Whether rel_path is, or is inside, an unfinished write's temp file"""
+    return any(TEMP_ARTIFACT_PATTERN.match(name) for name in rel_path.split("/") if name)
+
+
+def parent_of(rel_path: str) -> str:
+    return rel_path.rpartition("/")[0]
+
+
+def ancestors_of(rel_dir: str) -> list[str]:
+    """rel_dir and every folder above it, up to and including the root ("")"""
+    paths = [""]
+    parts = rel_dir.split("/") if rel_dir else []
+    for i in range(len(parts)):
+        paths.append("/".join(parts[: i + 1]))
+    return paths
+
+
+def below(column, rel_dir: str):
+    """SQL condition for paths strictly inside rel_dir"""
+    return column.startswith(rel_dir + "/", autoescape=True)
+
+
+def iso_mtime(mtime: float) -> str:
+    return datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat()
+
+
+def file_kind(mime_type: Optional[str]) -> str:
+    return "media" if mime_type and mime_type.startswith(MEDIA_TYPE_PREFIXES) else "file"
+
+
+class MetadataIndex:
+    """
+    Database index of every file and folder in users' storage.
+
+    The files and folders tables mirror the disk: path, parent, size,
+    mtime, MIME type and content hash. The change journal applies every
+    write to them in the same transaction as its journal entry, and folder
+    sizes are kept as running totals so they never need a walk. Hashes are
+    filled in on the hash pool after the write commits.
+
+    Writes made outside the API (or lost to a failed update) are fixed by
+    reconcile(), which diffs a user's tree against the index. Listings are
+    only served from the index for users reconciled by this process, so a
+    fresh start or a failed update falls back to scanning the disk.
+    """
+
+    def __init__(self):
+        self._ready: set[int] = set()
+        self._lock = Lock()
+        self._user_locks: dict[int, Lock] = {}
+
+    def is_ready(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._ready
+
+    def mark_stale(self, user_id: int):
+        """Stop serving listings from the index until the next reconcile."""
+        with self._lock:
+            self._ready.discard(user_id)
+
+    def _mark_ready(self, user_id: int):
+        with self._lock:
+            self._ready.add(user_id)
+
+    def user_lock(self, user_id: int) -> Lock:
+        """Serialises index writes with reconcile steps for one user."""
+        with self._lock:
+            return self._user_locks.setdefault(user_id, Lock())
+
+    # ---- Write paths -------------------------------------------------
+
+    def apply_changes(self, session: Session, user_id: int, root: str, changes: list[dict]) -> list:
+        """
+        Apply change journal entries to the index inside the caller's
+        transaction. Returns (rel_path, full_path) of files whose hash is
+        still unknown, to pass to schedule_hashes once committed.
+
+        Temp artifacts are never indexed: deleting one clears rows an older
+        index may have, and renaming one into place indexes the destination
+        as a new file.
+        """
+        pending = []
+        for change in changes:
+            action = change["action"]
+            full_path = change["path"]
+            rel = relative_path(root, full_path)
+            is_dir = change.get("is_dir", False)
+            old_rel = relative_path(root, change["old_path"]) if change.get("old_path") else None
+
+            if action == "rename" and old_rel is not None and is_temp_artifact(old_rel):
+                # Moved into place from a temp file, the destination is new
+                self._remove(session, user_id, old_rel, is_dir)
+                action, old_rel = "create", None
+
+            if action == "delete":
+                self._remove(session, user_id, rel, is_dir)
+            elif is_temp_artifact(rel):
+                if old_rel is not None:
+                    self._remove(session, user_id, old_rel, is_dir)
+            elif action == "rename" and old_rel is not None:
+                self._move(session, user_id, root, old_rel, rel, is_dir, pending)
+            elif is_dir:
+                self._ensure_folders(session, user_id, root, rel)
+            else:
+                self._upsert_file(session, user_id, root, rel, pending)
+        return pending
+
+    def _ensure_folders(self, session: Session, user_id: int, root: str, rel_dir: str) -> Folder:
+        """Return the folder row of rel_dir, indexing it and missing ancestors."""
+        paths = ancestors_of(rel_dir)
+        existing = {
+            folder.path: folder
+            for folder in session.query(Folder).filter(Folder.user_id == user_id, Folder.path.in_(paths))
+        }
+        created = False
+        for path in paths:
+            if path in existing:
+                continue
+            full_path = os.path.join(root, *path.split("/")) if path else root
+            try:
+                mtime = os.stat(full_path).st_mtime
+            except OSError:
+                mtime = None
+            folder = Folder(
+                user_id=user_id,
+                name=path.rpartition("/")[2],
+                path=path,
+                parent_path=parent_of(path) if path else None,
+                size=0,
+                mtime=mtime,
+            )
+            session.add(folder)
+            existing[path] = folder
+            created = True
+        if created:
+            session.flush()
+        return existing[rel_dir]
+
+    def _add_size(self, session: Session, user_id: int, rel_dir: str, delta: int):
+        """Add delta to the size of rel_dir and every folder above it."""
+        if not delta:
+            return
+        session.execute(
+            update(Folder)
+            .where(Folder.user_id == user_id, Folder.path.in_(ancestors_of(rel_dir)))
+            .values(size=Folder.size + delta)
+            .execution_options(synchronize_session="fetch")
+        )
+
+    def _upsert_file(self, session: Session, user_id: int, root: str, rel: str, pending: list):
+        full_path = os.path.join(root, *rel.split("/"))
+        try:
+            stat_info = os.stat(full_path)
+        except OSError:
+            # Gone again already, the index follows the disk
+            self._remove(session, user_id, rel, False)
+            return
+
+        parent = self._ensure_folders(session, user_id, root, parent_of(rel))
+        row = session.query(File).filter(File.user_id == user_id, File.path == rel).one_or_none()
+        old_size = 0
+        if row is None:
+            row = File(user_id=user_id, path=rel)
+            session.add(row)
+        else:
+            old_size = row.size
+
+        mime_type = mimetypes.guess_type(rel)[0]
+        row.filename = rel.rpartition("/")[2]
+        row.parent_path = parent.path
+        row.folder_id = parent.id
+        row.size = stat_info.st_size
+        row.mtime = stat_info.st_mtime
+        row.mime_type = mime_type
+        row.type = file_kind(mime_type)
+        row.hash = hash_cache.get(stat_info, "md5")
+        # Text documents go through the pool either way to index their contents
+        if row.hash is None or is_text_document(rel):
+            pending.append((rel, full_path))
+
+        session.flush()
+        self._add_size(session, user_id, parent.path, stat_info.st_size - old_size)
+
+    def _remove(self, session: Session, user_id: int, rel: str, is_dir: bool):
+        row = session.query(File).filter(File.user_id == user_id, File.path == rel).one_or_none()
+        if row is not None:
+            self._add_size(session, user_id, row.parent_path, -row.size)
+            session.delete(row)
+            session.flush()
+            return
+
+        folder = session.query(Folder).filter(Folder.user_id == user_id, Folder.path == rel).one_or_none()
+        if folder is None or not rel:
+            return
+        size = folder.size
+        session.flush()
+        session.query(File).filter(File.user_id == user_id, below(File.path, rel)).delete(
+            synchronize_session="fetch"
+        )
+        session.query(Folder).filter(
+            Folder.user_id == user_id, or_(Folder.path == rel, below(Folder.path, rel))
+        ).delete(synchronize_session="fetch")
+        self._add_size(session, user_id, parent_of(rel), -size)
+
+    def _move(
+        self, session: Session, user_id: int, root: str, old_rel: str, rel: str, is_dir: bool, pending: list
+    ):
+        row = session.query(File).filter(File.user_id == user_id, File.path == old_rel).one_or_none()
+        folder = None
+        if row is None:
+            folder = session.query(Folder).filter(Folder.user_id == user_id, Folder.path == old_rel).one_or_none()
+
+        if row is None and folder is None:
+            # Source was never indexed, index the destination from disk
+            if is_dir:
+                self._index_subtree(session, user_id, root, rel, pending)
+            else:
+                self._upsert_file(session, user_id, root, rel, pending)
+            return
+
+        # Make room in case the destination replaced something
+        self._remove(session, user_id, rel, is_dir)
+        size = row.size if row is not None else folder.size
+        self._add_size(session, user_id, parent_of(old_rel), -size)
+        parent = self._ensure_folders(session, user_id, root, parent_of(rel))
+
+        if row is not None:
+            row.path = rel
+            row.filename = rel.rpartition("/")[2]
+            row.parent_path = parent.path
+            row.folder_id = parent.id
+        else:
+            folder.path = rel
+            folder.name = rel.rpartition("/")[2]
+            folder.parent_path = parent.path
+            for child in session.query(Folder).filter(Folder.user_id == user_id, below(Folder.path, old_rel)):
+                child.path = rel + child.path[len(old_rel):]
+                child.parent_path = rel + child.parent_path[len(old_rel):]
+            for child in session.query(File).filter(File.user_id == user_id, below(File.path, old_rel)):
+                child.path = rel + child.path[len(old_rel):]
+                child.parent_path = rel + child.parent_path[len(old_rel):]
+        session.flush()
+        self._add_size(session, user_id, parent.path, size)
+
+    def _index_subtree(self, session: Session, user_id: int, root: str, rel_dir: str, pending: list):
+        """Index a directory that appeared with content already in it."""
+        self._ensure_folders(session, user_id, root, rel_dir)
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            try:
+                scanner = os.scandir(os.path.join(root, *current.split("/")))
+            except OSError:
+                continue
+            with scanner:
+                for entry in scanner:
+                    if entry.is_symlink() or is_temp_artifact(entry.name):
+                        continue
+                    rel = f"{current}/{entry.name}" if current else entry.name
+                    if entry.is_dir():
+                        self._ensure_folders(session, user_id, root, rel)
+                        stack.append(rel)
+                    else:
+                        self._upsert_file(session, user_id, root, rel, pending)
+
+    # ---- Hashes ------------------------------------------------------
+
+    def schedule_hashes(self, user_id: int, pending: list):
+        """
+        Hash newly written files on the hash pool and store the results,
+        then hand text documents to the content index.
+        """
+        for rel, full_path in pending:
+            hash_executor.submit(self._fill_hash, user_id, rel, full_path)
+
+    def _fill_hash(self, user_id: int, rel: str, full_path: str):
+        session = SessionLocal()
+        try:
+            stat_info = os.stat(full_path)
+            file_hash = get_cached_file_hash(full_path, "md5", stat_info)
+            # Only if the row still describes the file that was hashed
+            result = session.execute(
+                update(File)
+                .where(
+                    File.user_id == user_id,
+                    File.path == rel,
+                    File.size == stat_info.st_size,
+                    File.mtime == stat_info.st_mtime,
+                )
+                .values(hash=file_hash)
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Could not index hash of {full_path}: {e}")
+            return
+        finally:
+            session.close()
+
+        if result.rowcount and is_text_document(rel):
+            content_index.schedule(file_hash, full_path)
+
+    # ---- Reconciliation ----------------------------------------------
+
+    def reconcile(self, user, session: Optional[Session] = None) -> dict:
+        """
+        Bring a user's index in line with the disk and start serving their
+        listings from it. Returns the number of added, updated and removed
+        rows.
+
+        The tree is compared one folder at a time, each in its own short
+        transaction under the user's lock, so writes journaled during the
+        pass are neither duplicated nor overwritten, and only one folder's
+        rows are held in memory. Folder totals are adjusted by the size
+        changes found, the same way the write paths do it.
+        """
+        own_session = session is None
+        session = session or SessionLocal()
+        root = user_root(user)
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        pending = []
+
+        try:
+            if not os.path.isdir(root):
+                raise FileNotFoundError(root)
+            stack = [""]
+            while stack:
+                current = stack.pop()
+                with self.user_lock(user.id):
+                    try:
+                        stack.extend(self._reconcile_folder(session, user.id, root, current, counts, pending))
+                        session.commit()
+                    except Exception:
+                        session.rollback()
+                        raise
+        except Exception:
+            self.mark_stale(user.id)
+            raise
+        finally:
+            if own_session:
+                session.close()
+
+        self._mark_ready(user.id)
+        self.schedule_hashes(user.id, pending)
+        try:
+            content_index.schedule_missing(user.id, root)
+        except Exception as e:
+            logger.warning(f"Could not queue content indexing for user {user.id}: {e}")
+        return counts
+
+    def _reconcile_folder(
+        self, session: Session, user_id: int, root: str, rel_dir: str, counts: dict, pending: list
+    ) -> list[str]:
+        """Diff one folder's direct children against the disk. Returns its subfolders."""
+        full_dir = os.path.join(root, *rel_dir.split("/")) if rel_dir else root
+        try:
+            mtime = os.stat(full_dir).st_mtime
+            with os.scandir(full_dir) as scanner:
+                entries = list(scanner)
+        except OSError as e:
+            # Keep what is indexed below an unreadable folder
+            logger.warning(f"Reconcile could not scan {rel_dir!r}: {e}")
+            return []
+
+        folder = session.query(Folder).filter(Folder.user_id == user_id, Folder.path == rel_dir).one_or_none()
+        if folder is None:
+            folder = self._ensure_folders(session, user_id, root, rel_dir)
+            counts["added"] += 1
+        elif folder.mtime != mtime:
+            folder.mtime = mtime
+            counts["updated"] += 1
+
+        files = {f.filename: f for f in session.query(File).filter(File.user_id == user_id, File.parent_path == rel_dir)}
+        folders = {f.name: f for f in session.query(Folder).filter(Folder.user_id == user_id, Folder.parent_path == rel_dir)}
+        subfolders = []
+        seen_files, seen_folders = set(), set()
+        delta = 0
+
+        for entry in entries:
+            if entry.is_symlink() or is_temp_artifact(entry.name):
+                continue
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                stat_info = entry.stat()
+            except OSError:
+                continue
+            if entry.is_dir():
+                seen_folders.add(entry.name)
+                subfolders.append(rel)
+                continue
+
+            seen_files.add(entry.name)
+            row = files.get(entry.name)
+            if row is None:
+                row = File(user_id=user_id, path=rel, filename=entry.name, parent_path=rel_dir)
+                mime_type = mimetypes.guess_type(entry.name)[0]
+                row.mime_type, row.type = mime_type, file_kind(mime_type)
+                session.add(row)
+                counts["added"] += 1
+                delta += stat_info.st_size
+            elif (row.size, row.mtime) == (stat_info.st_size, stat_info.st_mtime):
+                if row.hash is None:
+                    pending.append((rel, entry.path))
+                continue
+            else:
+                counts["updated"] += 1
+                delta += stat_info.st_size - row.size
+            row.folder_id = folder.id
+            row.size = stat_info.st_size
+            row.mtime = stat_info.st_mtime
+            row.hash = hash_cache.get(stat_info, "md5")
+            if row.hash is None:
+                pending.append((rel, entry.path))
+
+        for name, row in files.items():
+            if name not in seen_files:
+                delta -= row.size
+                session.delete(row)
+                counts["removed"] += 1
+        session.flush()
+        self._add_size(session, user_id, rel_dir, delta)
+
+        for name, child in folders.items():
+            if name not in seen_folders:
+                counts["removed"] += 1 + sum(
+                    session.query(model).filter(model.user_id == user_id, below(model.path, child.path)).count()
+                    for model in (File, Folder)
+                )
+                self._remove(session, user_id, child.path, True)
+        for rel in subfolders:
+            if rel.rpartition("/")[2] not in folders:
+                self._ensure_folders(session, user_id, root, rel)
+                counts["added"] += 1
+        return subfolders
+
+    def reconcile_all(self) -> dict:
+        """Reconcile every user, for the scheduler. Returns counts per user."""
+        from app.models.user import User
+
+        session = SessionLocal()
+        results = {}
+        try:
+            for user in session.query(User).all():
+                if not user.root_foldername:
+                    continue
+                try:
+                    results[user.id] = self.reconcile(user, session)
+                except Exception as e:
+                    logger.error(f"Metadata index reconcile failed for user {user.id}: {e}", exc_info=True)
+        finally:
+            session.close()
+        return results
+
+    # ---- Queries -----------------------------------------------------
+
+    def list_folder(self, user_id: int, rel_dir: str) -> Optional[list[dict]]:
+        """
+        Entries of one folder in get_folder's format, or None if the folder
+        is not indexed.
+        """
+        session = SessionLocal()
+        try:
+            exists = session.query(Folder.id).filter(Folder.user_id == user_id, Folder.path == rel_dir).first()
+            if exists is None:
+                return None
+
+            items = [
+                {"name": name, "type": "folder"}
+                for (name,) in session.query(Folder.name)
+                .filter(Folder.user_id == user_id, Folder.parent_path == rel_dir)
+                .order_by(Folder.name)
+            ]
+            items += [
+                {"name": name, "type": "file", "size": size, "modified": iso_mtime(mtime)}
+                for name, size, mtime in session.query(File.filename, File.size, File.mtime)
+                .filter(File.user_id == user_id, File.parent_path == rel_dir)
+                .order_by(File.filename)
+            ]
+            return items
+        finally:
+            session.close()
+
+    def list_folder_page(
+        self,
+        user_id: int,
+        rel_dir: str,
+        sort: str,
+        descending: bool,
+        after: Optional[list],
+        limit: Optional[int],
+    ) -> Optional[Tuple[list, Optional[list]]]:
+        """
+        One keyset-paginated page of a folder, ordered like paginate():
+        folders by name, then files by the sort field with the name as tie
+        breaker. Returns (items, next position) or None if the folder is
+        not indexed. Only the rows of the page are read.
+        """
+        session = SessionLocal()
+        try:
+            exists = session.query(Folder.id).filter(Folder.user_id == user_id, Folder.path == rel_dir).first()
+            if exists is None:
+                return None
+
+            wanted = None if limit is None else limit + 1
+            rows = []
+
+            if after is None or after[0] == FOLDER_GROUP:
+                query = session.query(Folder.name).filter(Folder.user_id == user_id, Folder.parent_path == rel_dir)
+                if after is not None:
+                    query = query.filter(Folder.name < after[2] if descending else Folder.name > after[2])
+                query = query.order_by(Folder.name.desc() if descending else Folder.name)
+                for (name,) in query.limit(wanted):
+                    rows.append(({"name": name, "type": "folder"}, [FOLDER_GROUP, name, name]))
+
+            if wanted is None or len(rows) < wanted:
+                column = {"name": File.filename, "size": File.size, "modified": File.mtime}[sort]
+                query = session.query(File.filename, File.size, File.mtime).filter(
+                    File.user_id == user_id, File.parent_path == rel_dir
+                )
+                if after is not None and after[0] == FILE_GROUP:
+                    value, name = after[1], after[2]
+                    if descending:
+                        query = query.filter(or_(column < value, and_(column == value, File.filename < name)))
+                    else:
+                        query = query.filter(or_(column > value, and_(column == value, File.filename > name)))
+                if descending:
+                    query = query.order_by(column.desc(), File.filename.desc())
+                else:
+                    query = query.order_by(column, File.filename)
+                for name, size, mtime in query.limit(None if wanted is None else wanted - len(rows)):
+                    item = {"name": name, "type": "file", "size": size, "modified": iso_mtime(mtime)}
+                    rows.append((item, [FILE_GROUP, {"name": name, "size": size, "modified": mtime}[sort], name]))
+
+            if limit is None or len(rows) <= limit:
+                return [item for item, _ in rows], None
+            return [item for item, _ in rows[:limit]], rows[limit - 1][1]
+        finally:
+            session.close()
+
+    def list_top_level(self, user_id: int) -> dict:
+        """Top-level folders mapped to the names of their entries"""
+        session = SessionLocal()
+        try:
+            listing = {
+                name: []
+                for (name,) in session.query(Folder.name).filter(Folder.user_id == user_id, Folder.parent_path == "")
+            }
+            for model, name_column in ((Folder, Folder.name), (File, File.filename)):
+                for parent, name in session.query(model.parent_path, name_column).filter(
+                    model.user_id == user_id, model.parent_path.in_(list(listing))
+                ):
+                    listing[parent].append(name)
+            return listing
+        finally:
+            session.close()
+
+    def iter_tree(self, user_id: int, root: str, start_path: str, base_path: str) -> Iterator[dict]:
+        """
+        Yield the entries below start_path in iter_tree's format (paths
+        relative to base_path), from the index instead of a disk walk.
+        Missing hashes come from the hash cache.
+        """
+        start_rel = relative_path(root, start_path)
+        base_rel = relative_path(root, base_path)
+        strip = len(base_rel) + 1 if base_rel else 0
+
+        session = SessionLocal()
+        try:
+            folder_query = session.query(Folder.path, Folder.mtime).filter(Folder.user_id == user_id)
+            file_query = session.query(File.path, File.hash, File.size, File.mtime).filter(File.user_id == user_id)
+            if start_rel:
+                folder_query = folder_query.filter(below(Folder.path, start_rel))
+                file_query = file_query.filter(below(File.path, start_rel))
+            else:
+                folder_query = folder_query.filter(Folder.path != "")
+
+            for path, mtime in folder_query.order_by(Folder.path).yield_per(1000):
+                yield {
+                    "path": path[strip:].replace("/", os.sep),
+                    "hash": None,
+                    "size": None,
+                    "modified_at": iso_mtime(mtime or 0),
+                    "type": "folder",
+                }
+            for path, file_hash, size, mtime in file_query.order_by(File.path).yield_per(1000):
+                if file_hash is None:
+                    try:
+                        file_hash = get_cached_file_hash(os.path.join(root, *path.split("/")))
+                    except OSError:
+                        continue
+                yield {
+                    "path": path[strip:].replace("/", os.sep),
+                    "hash": file_hash,
+                    "size": size,
+                    "modified_at": iso_mtime(mtime),
+                    "type": "file",
+                }
+        finally:
+            session.close()
+
+
+# Global instance
+metadata_index = MetadataIndex()
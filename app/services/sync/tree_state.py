@@ -0,0 +1,65 @@
+import hashlib
+import os
+import secrets
+import time
+from threading import Lock
+from typing import Dict, Tuple
+
+# Changes on every start, so validators issued before a restart never match
+BOOT_ID = secrets.token_hex(8)
+# Writes before a restart are unknown, so listings count as changed at boot
+BOOT_TIME = time.time()
+
+
+class TreeStateIndex:
+    """
+    Cheap validators for directory listings.
+
+    Every write that goes through the change journal bumps a generation
+    counter for the changed path's ancestors (and, for directories, the
+    path itself and everything below it). A listing's validator combines
+    the directory's own mtime with that counter, so checking it costs a
+    single stat instead of re-listing or re-walking the tree.
+    """
+
+    def __init__(self):
+        self._state: Dict[str, Tuple[int, float]] = {}
+        self._lock = Lock()
+
+    def _bump(self, path: str, now: float):
+        generation, _ = self._state.get(path, (0, BOOT_TIME))
+        self._state[path] = (generation + 1, now)
+
+    def invalidate(self, path: str, is_dir: bool = False):
+        """Record a change at path for every listing that includes it."""
+        path = os.path.realpath(path)
+        now = time.time()
+        with self._lock:
+            if is_dir:
+                prefix = path + os.sep
+                for cached_path in [p for p in self._state if p.startswith(prefix)]:
+                    self._bump(cached_path, now)
+                self._bump(path, now)
+
+            parent = os.path.dirname(path)
+            while parent and parent != path:
+                self._bump(parent, now)
+                path, parent = parent, os.path.dirname(parent)
+
+    def validators(self, dir_path: str) -> Tuple[str, float]:
+        """
+        Return (etag, last_modified) for a listing of dir_path.
+        The ETag is weak since listings are not byte-for-byte stable.
+        """
+        dir_path = os.path.realpath(dir_path)
+        stat_info = os.stat(dir_path)
+        with self._lock:
+            generation, changed_at = self._state.get(dir_path, (0, BOOT_TIME))
+
+        token = f"{BOOT_ID}:{dir_path}:{stat_info.st_mtime_ns}:{generation}"
+        etag = f'W/"{hashlib.sha1(token.encode()).hexdigest()}"'
+        return etag, max(stat_info.st_mtime, changed_at)
+
+
+# Global instance
+tree_state = TreeStateIndex()
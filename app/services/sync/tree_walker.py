@@ -0,0 +1,62 @@
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Iterator
+from app.services.sync.hash_utils import get_cached_file_hash
+
+logger = logging.getLogger(__name__)
+
+
+def iter_tree(start_path: str, base_path: str) -> Iterator[dict]:
+    """
+    Lazily yield one entry per folder and file below start_path.
+
+    Uses an explicit stack over os.scandir so only the directories still to
+    visit are held in memory, never the listing itself. Paths are relative
+    to base_path. Like os.walk, symlinked directories are listed but not
+    descended into.
+    """
+    stack = [start_path]
+
+    while stack:
+        current = stack.pop()
+        rel_root = os.path.relpath(current, base_path)
+        prefix = "" if rel_root == "." else rel_root + os.sep
+
+        try:
+            scanner = os.scandir(current)
+        except OSError as e:
+            logger.warning(f"Error scanning directory {current}: {e}")
+            continue
+
+        with scanner:
+            for entry in scanner:
+                rel_path = prefix + entry.name
+                try:
+                    if entry.is_dir():
+                        stat_info = entry.stat()
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                        yield {
+                            "path": rel_path,
+                            "hash": None,
+                            "size": None,
+                            "modified_at": datetime.fromtimestamp(
+                                stat_info.st_mtime, tz=timezone.utc
+                            ).isoformat(),
+                            "type": "folder",
+                        }
+                    else:
+                        stat_info = entry.stat()
+                        yield {
+                            "path": rel_path,
+                            "hash": get_cached_file_hash(entry.path, stat_info=stat_info),
+                            "size": stat_info.st_size,
+                            "modified_at": datetime.fromtimestamp(
+                                stat_info.st_mtime, tz=timezone.utc
+                            ).isoformat(),
+                            "type": "file",
+                        }
+                except OSError as e:
+                    logger.warning(f"Error accessing {rel_path}: {e}")
+                    continue
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+from typing import BinaryIO, Optional
+
+# Size of each read from the uploaded chunk before it is written to disk
+WRITE_BUFFER_SIZE = 1024 * 1024  # 1 MB
+
+
+class ChunkedFile:
+    """
+    Assembles a chunked upload directly into its final-size file.
+
+    Everything lives in the upload's `{file_id}_parts` directory:
+    - data: the target file, preallocated when the total size is known;
+      chunk N is written at N * chunk_size with os.pwrite
+    - bitmap: one bit per chunk, set once the chunk is on disk
+    - meta.json: chunk size, chunk count and total size of the upload
+    Once every bit is set the data file is renamed into place, so no merge
+    pass is needed.
+    """
+
+    DATA_NAME = "data"
+    BITMAP_NAME = "bitmap"
+    META_NAME = "meta.json"
+
+    def __init__(self, temp_dir: str):
+        self.temp_dir = temp_dir
+        self.data_path = os.path.join(temp_dir, self.DATA_NAME)
+        self.bitmap_path = os.path.join(temp_dir, self.BITMAP_NAME)
+        self.meta_path = os.path.join(temp_dir, self.META_NAME)
+        self.meta: Optional[dict] = None
+
+    def load(self) -> Optional[dict]:
+        """Load the upload metadata if the upload was already started."""
+        if self.meta is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        return self.meta
+
+    def prepare(self, total_chunks: int, chunk_size: int, total_size: Optional[int] = None):
+        """
+        Create the data file, bitmap and metadata for a new upload.
+        Does nothing if the upload already exists.
+        """
+        if self.load() is not None:
+            return
+
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+        fd = os.open(self.data_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if total_size:
+                if hasattr(os, "posix_fallocate"):
+                    try:
+                        os.posix_fallocate(fd, 0, total_size)
+                    except OSError:
+                        # Filesystem does not support fallocate, fall back to a sparse file
+                        os.ftruncate(fd, total_size)
+                else:
+                    os.ftruncate(fd, total_size)
+        finally:
+            os.close(fd)
+
+        with open(self.bitmap_path, "wb") as f:
+            f.write(bytes((total_chunks + 7) // 8))
+
+        self.meta = {
+            "total_chunks": total_chunks,
+            "chunk_size": chunk_size,
+            "total_size": total_size,
+        }
+        # Write metadata last, its presence marks the upload as prepared
+        temp_meta = self.meta_path + ".tmp"
+        with open(temp_meta, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(temp_meta, self.meta_path)
+
+    def write_chunk(self, chunk_index: int, source: BinaryIO) -> int:
+        """
+        Copy a chunk from source into the data file at its offset.
+        Returns the number of bytes written.
+        """
+        offset = chunk_index * self.meta["chunk_size"]
+        written = 0
+
+        fd = os.open(self.data_path, os.O_WRONLY)
+        try:
+            while True:
+                buffer = source.read(WRITE_BUFFER_SIZE)
+                if not buffer:
+                    break
+                view = memoryview(buffer)
+                while view:
+                    count = os.pwrite(fd, view, offset + written)
+                    written += count
+                    view = view[count:]
+        finally:
+            os.close(fd)
+
+        return written
+
+    def write_at(self, offset: int, data: bytes):
+        """Write a buffer into the data file at an absolute offset."""
+        fd = os.open(self.data_path, os.O_WRONLY)
+        try:
+            view = memoryview(data)
+            while view:
+                count = os.pwrite(fd, view, offset)
+                offset += count
+                view = view[count:]
+        finally:
+            os.close(fd)
+
+    def mark_received(self, chunk_index: int) -> int:
+        """
+        Set the chunk's bit in the bitmap.
+        Returns the number of chunks received so far.
+        """
+        with open(self.bitmap_path, "r+b") as f:
+            bitmap = bytearray(f.read())
+            bitmap[chunk_index // 8] |= 1 << (chunk_index % 8)
+            f.seek(chunk_index // 8)
+            f.write(bytes((bitmap[chunk_index // 8],)))
+
+        return sum(bin(byte).count("1") for byte in bitmap)
+
+    def received_chunks(self) -> list[int]:
+        """Return the indexes of all chunks already on disk."""
+        with open(self.bitmap_path, "rb") as f:
+            bitmap = f.read()
+        return [
+            index
+            for index in range(self.meta["total_chunks"])
+            if bitmap[index // 8] & (1 << (index % 8))
+        ]
+
+    def finalize(self, final_path: str):
+        """Atomically move the assembled file into place and remove the temp directory."""
+        os.replace(self.data_path, final_path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
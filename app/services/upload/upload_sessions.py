@@ -0,0 +1,265 @@
+import json
+import os
+import re
+import secrets
+import time
+from threading import Lock
+from types import SimpleNamespace
+from typing import Dict, Optional
+from app.core.config import config
+from app.services.upload.chunk_assembler import ChunkedFile
+
+# Upload ids are generated with secrets.token_urlsafe
+UPLOAD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def default_sessions_dir() -> str:
+    """Directory holding the persisted metadata of active upload sessions."""
+    return os.path.join(config.DIR_LOCATION, "uploads", "sessions")
+
+
+class UploadSession:
+    """
+    State of one chunked upload, resolved once when the session is created.
+
+    Holds the target directory and owner so chunk requests need no JWT
+    decode or database query, and a lock that serialises bitmap updates and
+    finalisation while chunk data is written concurrently at distinct
+    offsets. Session metadata is persisted under DIR_LOCATION/uploads and
+    chunk progress in the upload's bitmap, so uploads can be resumed after
+    a server restart.
+    """
+
+    def __init__(
+        self,
+        upload_id: str,
+        owner,
+        target_dir: str,
+        filename: str,
+        total_size: int,
+        chunk_size: int,
+        patch_offset: int = 0,
+    ):
+        self.upload_id = upload_id
+        # Plain snapshot so the session never touches a closed DB session
+        self.owner = SimpleNamespace(id=owner.id, root_foldername=owner.root_foldername)
+        self.target_dir = target_dir
+        self.filename = filename
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.total_chunks = max(1, (total_size + chunk_size - 1) // chunk_size)
+        self.assembly = ChunkedFile(os.path.join(target_dir, f"{upload_id}_parts"))
+        self.lock = Lock()
+        self.received_count = 0
+        # End of the contiguous range written by offset-based PATCH requests,
+        # which may stop in the middle of a chunk
+        self.patch_offset = patch_offset
+        # Set while a PATCH request streams into the upload, tus allows one writer
+        self.patching = False
+        self.finalized = False
+        self.updated_at = time.time()
+
+    @property
+    def final_path(self) -> str:
+        return os.path.join(self.target_dir, self.filename)
+
+    def chunk_length(self, chunk_index: int) -> int:
+        """Expected length of a chunk, the last one may be short."""
+        if chunk_index == self.total_chunks - 1:
+            return self.total_size - chunk_index * self.chunk_size
+        return self.chunk_size
+
+    def mark_received(self, chunk_index: int) -> int:
+        """Record a chunk as written. Returns the number of chunks received."""
+        with self.lock:
+            self.received_count = self.assembly.mark_received(chunk_index)
+            self.updated_at = time.time()
+            return self.received_count
+
+    def is_complete(self) -> bool:
+        return self.received_count == self.total_chunks
+
+    def upload_offset(self) -> int:
+        """
+        Number of contiguous bytes from the start of the file already on
+        disk: all leading complete chunks, or further if a PATCH got there.
+        """
+        received = set(self.assembly.received_chunks())
+        prefix = 0
+        while prefix < self.total_chunks and prefix in received:
+            prefix += 1
+        if prefix == self.total_chunks:
+            return self.total_size
+        return max(prefix * self.chunk_size, self.patch_offset)
+
+    def advance(self, start: int, end: int):
+        """
+        Record that bytes [start, end) were written contiguously from the
+        current upload offset, marking every chunk they complete.
+        """
+        with self.lock:
+            first = start // self.chunk_size
+            for index in range(first, self.total_chunks):
+                chunk_end = min((index + 1) * self.chunk_size, self.total_size)
+                if chunk_end > end:
+                    break
+                self.received_count = self.assembly.mark_received(index)
+            self.patch_offset = max(self.patch_offset, end)
+            self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "owner_id": self.owner.id,
+            "owner_root_foldername": self.owner.root_foldername,
+            "target_dir": self.target_dir,
+            "filename": self.filename,
+            "total_size": self.total_size,
+            "chunk_size": self.chunk_size,
+            "patch_offset": self.patch_offset,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UploadSession":
+        owner = SimpleNamespace(id=data["owner_id"], root_foldername=data["owner_root_foldername"])
+        session = cls(
+            data["upload_id"],
+            owner,
+            data["target_dir"],
+            data["filename"],
+            data["total_size"],
+            data["chunk_size"],
+            patch_offset=data.get("patch_offset", 0),
+        )
+        session.assembly.load()
+        session.received_count = len(session.assembly.received_chunks())
+        return session
+
+
+class UploadSessionRegistry:
+    """
+    Registry of active upload sessions, cached in memory and persisted as
+    small JSON files so they survive restarts.
+    Upload ids are unguessable tokens and act as the capability for sending
+    chunks to a session.
+    """
+
+    def __init__(self, sessions_dir: Optional[str] = None):
+        self._sessions_dir = sessions_dir
+        self._sessions: Dict[str, UploadSession] = {}
+        self._path_locks: Dict[str, Lock] = {}
+        # Last use of each path lock, so abandoned uploads' locks can be dropped
+        self._path_lock_used: Dict[str, float] = {}
+        self._lock = Lock()
+
+    @property
+    def sessions_dir(self) -> str:
+        return self._sessions_dir or default_sessions_dir()
+
+    def _session_file(self, upload_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{upload_id}.json")
+
+    def save(self, session: UploadSession):
+        """Persist the session metadata atomically."""
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        path = self._session_file(session.upload_id)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(session.to_dict(), f)
+        os.replace(temp_path, path)
+
+    def create(
+        self, owner, target_dir: str, filename: str, total_size: int, chunk_size: int
+    ) -> UploadSession:
+        """Create a session and prepare its preallocated data file."""
+        upload_id = secrets.token_urlsafe(24)
+        session = UploadSession(upload_id, owner, target_dir, filename, total_size, chunk_size)
+        session.assembly.prepare(session.total_chunks, chunk_size, total_size)
+        self.save(session)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id: str) -> Optional[UploadSession]:
+        """Return a session, reloading it from disk after a restart."""
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None:
+                return session
+
+            if not UPLOAD_ID_PATTERN.match(upload_id):
+                return None
+            try:
+                with open(self._session_file(upload_id)) as f:
+                    session = UploadSession.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                return None
+            if session.assembly.meta is None:
+                # Chunk data is gone, the session cannot be resumed
+                return None
+
+            self._sessions[upload_id] = session
+            return session
+
+    def remove(self, upload_id: str):
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+            try:
+                os.remove(self._session_file(upload_id))
+            except OSError:
+                pass
+
+    def path_lock(self, key: str) -> Lock:
+        """Lock shared by all requests of one legacy /upload-chunk upload"""
+        with self._lock:
+            self._path_lock_used[key] = time.time()
+            return self._path_locks.setdefault(key, Lock())
+
+    def release_path_lock(self, key: str):
+        with self._lock:
+            self._path_locks.pop(key, None)
+            self._path_lock_used.pop(key, None)
+
+    def cleanup_expired(self, max_age_seconds: int = 24 * 3600) -> int:
+        """Forget sessions without activity for max_age_seconds"""
+        current_time = time.time()
+        with self._lock:
+            expired = [
+                upload_id
+                for upload_id, session in self._sessions.items()
+                if current_time - session.updated_at > max_age_seconds
+            ]
+            for upload_id in expired:
+                self._sessions.pop(upload_id, None)
+
+            # Locks of /upload-chunk uploads that never completed
+            for key, used in list(self._path_lock_used.items()):
+                if current_time - used > max_age_seconds and not self._path_locks[key].locked():
+                    del self._path_locks[key]
+                    del self._path_lock_used[key]
+
+            # Persisted sessions that were never resumed after a restart
+            if os.path.isdir(self.sessions_dir):
+                for name in os.listdir(self.sessions_dir):
+                    path = os.path.join(self.sessions_dir, name)
+                    upload_id = name.split(".")[0]
+                    if upload_id in self._sessions:
+                        continue
+                    try:
+                        if current_time - os.path.getmtime(path) > max_age_seconds:
+                            os.remove(path)
+                            if upload_id not in expired:
+                                expired.append(upload_id)
+                    except OSError:
+                        continue
+
+            for upload_id in expired:
+                try:
+                    os.remove(self._session_file(upload_id))
+                except OSError:
+                    pass
+        return len(expired)
+
+
+# Global instance
+upload_sessions = UploadSessionRegistry()
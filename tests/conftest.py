@@ -14,3 +14,40 @@ def setup_test_env():
     os.environ["DATABASE_URL"] = "sqlite:///:memory:"
     os.environ["HTTP_AUTH_USERNAME"] = "testuser"
     os.environ["HTTP_AUTH_PASSWORD"] = "testpass"
+
+
+class InlineExecutor:
+    """Runs submitted work immediately, so background jobs are deterministic"""
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+def run_async(coro):
+    """Helper to run async functions in tests"""
+    import asyncio
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def mock_user():
+    """Create a mock user"""
+    from unittest.mock import Mock
+
+    user = Mock()
+    user.id = 1
+    user.username = "test"
+    user.root_foldername = "test_user"
+    return user
+
+
+@pytest.fixture
+def test_dir(tmp_path, mock_config):
+    """
+    Create a temporary test directory structure. Each module provides
+    mock_config, patching the config of the code it tests.
+    """
+    data_dir = tmp_path / "data" / "test_user"
+    data_dir.mkdir(parents=True)
+    mock_config.DIR_LOCATION = str(tmp_path)
+    return tmp_path, data_dir
@@ -0,0 +1,138 @@
+"""
+Tests for selective multi-path archive downloads
+"""
+import io
+import os
+import tarfile
+import zipfile
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a user directory with photos and documents"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "photos" / "2024").mkdir(parents=True)
+    (data_dir / "docs").mkdir()
+    for index in range(5):
+        (data_dir / "photos" / "2024" / f"img{index}.jpg").write_bytes(os.urandom(1000 + index))
+    (data_dir / "docs" / "cv.txt").write_text("curriculum vitae")
+    (data_dir / "docs" / "letter.txt").write_text("dear")
+    return data_dir
+
+
+@pytest.fixture
+def client(data_dir, mock_user):
+    """Create a test client for the archive route"""
+    from app.api.folder.download_folder import download_folder_router
+    from app.api.dependencies import get_current_user
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(data_dir.parent.parent)
+
+    app = FastAPI()
+    app.include_router(download_folder_router, prefix="/api/folder")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with patch('app.services.folder.paths.config', mock_settings):
+        with TestClient(app) as client:
+            yield client
+
+
+def test_selected_files_zip(data_dir, client):
+    """Test zipping files picked from one folder"""
+    paths = [f"photos/2024/img{index}.jpg" for index in (0, 2, 4)]
+    response = client.post("/api/folder/archive", json={"paths": paths, "name": "picks"})
+
+    assert response.status_code == 200
+    assert 'filename="picks.zip"' in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert sorted(zf.namelist()) == ["img0.jpg", "img2.jpg", "img4.jpg"]
+        assert zf.read("img2.jpg") == (data_dir / "photos" / "2024" / "img2.jpg").read_bytes()
+
+
+def test_mixed_selection_tar(data_dir, client):
+    """Test a tar of a folder plus files elsewhere, without duplicates"""
+    response = client.post("/api/folder/archive", json={
+        "paths": ["docs", "docs/cv.txt", "photos/2024/img1.jpg"],
+        "format": "tar",
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-tar"
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r|") as tf:
+        contents = {member.name: tf.extractfile(member).read() for member in tf}
+
+    assert contents == {
+        "docs/cv.txt": b"curriculum vitae",
+        "docs/letter.txt": b"dear",
+        "photos/2024/img1.jpg": (data_dir / "photos" / "2024" / "img1.jpg").read_bytes(),
+    }
+
+
+def test_selection_validation(data_dir, client):
+    """Test traversal, missing paths and empty selections are rejected"""
+    response = client.post("/api/folder/archive", json={"paths": ["../../etc/passwd"]})
+    assert response.status_code == 403
+
+    response = client.post("/api/folder/archive", json={"paths": ["docs/missing.txt"]})
+    assert response.status_code == 404
+
+    response = client.post("/api/folder/archive", json={"paths": []})
+    assert response.status_code == 422
+
+    response = client.post("/api/folder/archive", json={"paths": ["docs"], "format": "rar"})
+    assert response.status_code == 422
+
+
+def test_tar_stream_long_and_unicode_names(tmp_path):
+    """Test pax headers for long and non-ASCII names"""
+    from app.services.archive.listing import iter_folder_files
+    from app.services.archive.tar_stream import TarStream
+
+    deep = tmp_path / ("d" * 90) / ("e" * 90)
+    deep.mkdir(parents=True)
+    (deep / "résumé.txt").write_text("ok")
+
+    data = b"".join(TarStream(iter_folder_files(str(tmp_path))))
+    assert len(data) % 512 == 0
+    with tarfile.open(fileobj=io.BytesIO(data)) as tf:
+        name = f"{'d' * 90}/{'e' * 90}/résumé.txt"
+        assert tf.extractfile(name).read() == b"ok"
+
+
+@pytest.mark.parametrize("format,mode", [("tar", "r|"), ("tar.gz", "r|gz")])
+def test_folder_tar_export(data_dir, client, format, mode):
+    """Test streaming tar and tar.gz exports of a folder"""
+    response = client.get(f"/api/folder/download/docs?format={format}")
+    assert response.status_code == 200
+    assert f'filename="docs.{format}"' in response.headers["content-disposition"]
+
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode=mode) as tf:
+        contents = {member.name: tf.extractfile(member).read() for member in tf}
+    assert contents == {"cv.txt": b"curriculum vitae", "letter.txt": b"dear"}
+
+
+def test_folder_tar_zst_export(data_dir, client):
+    """Test tar.zst exports when zstandard is installed"""
+    zstandard = pytest.importorskip("zstandard")
+
+    response = client.get("/api/folder/download/photos?format=tar.zst")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zstd"
+
+    data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(response.content)).read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tf:
+        assert len(tf.getnames()) == 5
+
+
+def test_folder_export_format_validation(data_dir, client):
+    """Test unknown formats and resumable tar exports are rejected"""
+    assert client.get("/api/folder/download/docs?format=rar").status_code == 400
+    assert client.get("/api/folder/download/docs?format=tar&resumable=true").status_code == 400
+
+    with patch("app.services.archive.tar_stream.zstandard", None):
+        assert client.get("/api/folder/download/docs?format=tar.zst").status_code == 400
@@ -0,0 +1,155 @@
+"""
+Tests for the sync change journal and the /changes endpoint
+"""
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from tests.conftest import run_async
+
+
+@pytest.fixture
+def test_dir(tmp_path):
+    """Create a temporary user directory and point config at it"""
+    data_dir = tmp_path / "data" / "test_user"
+    data_dir.mkdir(parents=True)
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+
+    with patch('app.services.sync.change_journal.config', mock_settings):
+        with patch('app.api.sync.sync_routes.config', mock_settings):
+            with patch('app.services.file.deleteFile.config', mock_settings):
+                yield tmp_path, data_dir
+
+
+@pytest.fixture
+def db():
+    """Create an in-memory database with all tables"""
+    from app.core.database import Base
+    import app.models  # noqa: F401
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    with patch('app.services.sync.change_journal.SessionLocal', TestSession):
+        session = TestSession()
+        yield session
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    """Create a user with one registered device"""
+    from app.models.user import User
+    from app.models.device import Device
+
+    user = User(
+        email="test@example.com",
+        username="test",
+        hashed_password="x",
+        root_foldername="test_user",
+    )
+    db.add(user)
+    db.commit()
+    db.add(Device(user_id=user.id, device_id="dev-1", device_name="Laptop", folder_name="Laptop"))
+    db.commit()
+    return user
+
+
+def get_changes(user, db, **kwargs):
+    from app.api.sync.sync_routes import get_changes as route
+
+    params = {"cursor": None, "device_id": None, "limit": 1000}
+    params.update(kwargs)
+    return run_async(route(user=user, db=db, **params))
+
+
+def test_changes_since_cursor(test_dir, db, user):
+    """Test that only entries after the cursor are returned"""
+    from app.services.sync.change_journal import record_change
+
+    tmp_path, data_dir = test_dir
+
+    record_change(user, "create", str(data_dir / "a.txt"), size=3, db=db)
+    record_change(user, "modify", str(data_dir / "docs" / "b.txt"), size=5, db=db)
+
+    first = get_changes(user, db)
+    assert [c.path for c in first.changes] == ["a.txt", "docs/b.txt"]
+    assert [c.action for c in first.changes] == ["create", "modify"]
+    assert first.has_more is False
+
+    record_change(user, "delete", str(data_dir / "a.txt"), db=db)
+
+    second = get_changes(user, db, cursor=first.cursor)
+    assert [(c.action, c.path) for c in second.changes] == [("delete", "a.txt")]
+
+    empty = get_changes(user, db, cursor=second.cursor)
+    assert empty.changes == []
+    assert empty.cursor == second.cursor
+
+
+def test_changes_pagination(test_dir, db, user):
+    """Test that has_more is set when the limit is reached"""
+    from app.services.sync.change_journal import record_changes
+
+    tmp_path, data_dir = test_dir
+
+    record_changes(
+        user,
+        [{"action": "create", "path": str(data_dir / f"{i}.txt")} for i in range(5)],
+        db=db,
+    )
+
+    page = get_changes(user, db, limit=3)
+    assert len(page.changes) == 3
+    assert page.has_more is True
+
+    rest = get_changes(user, db, cursor=page.cursor, limit=3)
+    assert [c.path for c in rest.changes] == ["3.txt", "4.txt"]
+    assert rest.has_more is False
+
+
+def test_device_scoped_changes_and_ack(test_dir, db, user):
+    """Test device scoping, boundary-crossing renames and cursor acknowledgement"""
+    from app.api.sync.sync_routes import ack_changes, AckChangesRequest
+    from app.services.sync.change_journal import record_change
+    from app.models.device import Device
+
+    tmp_path, data_dir = test_dir
+    device_dir = data_dir / "Laptop"
+
+    record_change(user, "create", str(data_dir / "outside.txt"), db=db)
+    record_change(user, "create", str(device_dir / "inside.txt"), db=db)
+    record_change(user, "rename", str(data_dir / "moved_out.txt"), old_path=str(device_dir / "inside.txt"), db=db)
+
+    page = get_changes(user, db, device_id="dev-1")
+    assert [(c.action, c.path) for c in page.changes] == [
+        ("create", "inside.txt"),
+        ("delete", "inside.txt"),
+    ]
+
+    run_async(ack_changes(AckChangesRequest(device_id="dev-1", cursor=page.cursor), user=user, db=db))
+    device = db.query(Device).filter(Device.device_id == "dev-1").first()
+    assert device.last_change_cursor == page.cursor
+
+    # Without an explicit cursor the acknowledged one is used
+    assert get_changes(user, db, device_id="dev-1").changes == []
+
+
+def test_delete_file_records_change(test_dir, db, user):
+    """Test that deleting through the file service feeds the journal"""
+    from app.services.file.deleteFile import DeleteFile
+
+    tmp_path, data_dir = test_dir
+    (data_dir / "old.txt").write_text("bye")
+
+    DeleteFile("old.txt", user)
+
+    page = get_changes(user, db)
+    assert [(c.action, c.path, c.type) for c in page.changes] == [("delete", "old.txt", "file")]
@@ -0,0 +1,168 @@
+"""
+Tests for ETag / Last-Modified validators and 304 responses
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a user directory and point every route at it"""
+    from app.services.sync.hash_utils import get_cached_file_hash
+
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "photos").mkdir(parents=True)
+    (data_dir / "photos" / "cat.png").write_bytes(os.urandom(2048))
+    (data_dir / "notes.txt").write_text("hello")
+    # Hashed already, as the hash pool does after a file's first request
+    for path in (data_dir / "photos" / "cat.png", data_dir / "notes.txt"):
+        get_cached_file_hash(str(path))
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.api.file.view_file.config', mock_settings), \
+         patch('app.api.file.download_file.config', mock_settings), \
+         patch('app.api.folder.get_folder.config', mock_settings), \
+         patch('app.api.sync.sync_routes.config', mock_settings):
+        yield data_dir
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from app.api.file.view_file import view_router
+    from app.api.file.download_file import download_file_router
+    from app.api.folder.get_folder import getfolderroute
+    from app.api.sync.sync_routes import syncrouter
+    from app.api.dependencies import get_current_user, get_db
+
+    app = FastAPI()
+    app.include_router(view_router, prefix="/api/file")
+    app.include_router(download_file_router, prefix="/api/file")
+    app.include_router(getfolderroute, prefix="/api/folder")
+    app.include_router(syncrouter, prefix="/api/sync")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    app.dependency_overrides[get_db] = lambda: None
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("url", ["/api/file/view/photos/cat.png", "/api/file/download/photos/cat.png"])
+def test_file_etag_is_content_hash(data_dir, client, url):
+    """Test that files get a strong ETag and 304 on If-None-Match"""
+    from app.services.sync.hash_utils import calculate_file_hash
+
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == f'"{calculate_file_hash(str(data_dir / "photos" / "cat.png"))}"'
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get(url, headers={"If-None-Match": '"other", W/' + etag})
+    assert response.status_code == 304
+
+    response = client.get(url, headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_file_if_modified_since(data_dir, client):
+    """Test If-Modified-Since against the file's Last-Modified"""
+    url = "/api/file/download/notes.txt"
+    last_modified = client.get(url).headers["last-modified"]
+
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(
+        url, headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+    ).status_code == 200
+
+
+def test_file_etag_changes_with_content(data_dir, client):
+    """Test that rewriting a file invalidates its ETag"""
+    url = "/api/file/view/notes.txt"
+    etag = client.get(url).headers["etag"]
+
+    path = data_dir / "notes.txt"
+    path.write_text("changed content")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_cold_file_gets_weak_etag_until_hashed(data_dir, client):
+    """Test that an unhashed file is served without hashing it first"""
+    from app.services.sync.hash_utils import calculate_file_hash
+
+    path = data_dir / "big.bin"
+    path.write_bytes(os.urandom(4096))
+    stat_info = os.stat(path)
+    url = "/api/file/download/big.bin"
+
+    executor = Mock()
+    with patch('app.services.file.conditional_requests.hash_executor', executor):
+        response = client.get(url)
+        assert response.status_code == 200
+        weak = response.headers["etag"]
+        assert weak == f'W/"{stat_info.st_size:x}-{stat_info.st_mtime_ns:x}"'
+        assert client.get(url, headers={"If-None-Match": weak}).status_code == 304
+        # One background hash, however many requests came in
+        executor.submit.assert_called_once()
+
+    # Run the queued hash, after which the strong ETag is served
+    executor.submit.call_args.args[0]()
+    assert client.get(url).headers["etag"] == f'"{calculate_file_hash(str(path))}"'
+
+
+def test_if_range_with_content_etag(data_dir, client):
+    """Test that If-Range accepts the content-hash ETag"""
+    url = "/api/file/download/photos/cat.png"
+    etag = client.get(url).headers["etag"]
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+
+
+def test_folder_listing_validators(data_dir, client):
+    """Test that folder listings 304 until a journaled write changes them"""
+    from app.services.sync.tree_state import tree_state
+
+    url = "/api/folder/get_folder?folder_path=photos"
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(
+        url, headers={"If-Modified-Since": response.headers["last-modified"]}
+    ).status_code == 304
+
+    # An in-place write reported through the change journal
+    tree_state.invalidate(str(data_dir / "photos" / "cat.png"))
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["items"][0]["name"] == "cat.png"
+
+
+def test_list_all_validators(data_dir, client):
+    """Test that list-all 304s until anything in the tree changes"""
+    from app.services.sync.tree_state import tree_state
+
+    for url in ["/api/sync/list-all", "/api/sync/list-all?format=ndjson"]:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        # A change deep in the tree invalidates the root listing
+        tree_state.invalidate(str(data_dir / "photos" / "cat.png"))
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,315 @@
+"""
+Tests for the full-text content index and search
+"""
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from tests.conftest import InlineExecutor
+
+
+DOCUMENTS = {
+    "notes/garden.md": "# Garden\nPlant the tomatoes in May. Tomatoes need sun, water and more tomatoes.",
+    "notes/shopping.txt": "milk, eggs, tomatoes, bread",
+    "recipes/soup.txt": "Tomato soup: roast the tomatoes, then blend with basil and garlic.",
+    "data/plants.csv": "name,water\nbasil,daily\nfern,weekly\n",
+    "copy/garden.md": "# Garden\nPlant the tomatoes in May. Tomatoes need sun, water and more tomatoes.",
+    "script.py": "tomatoes = 1",
+}
+
+
+@pytest.fixture
+def settings(tmp_path):
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    mock_settings.CONTENT_INDEX_MAX_POSTINGS = 100_000
+    return mock_settings
+
+
+@pytest.fixture
+def data_dir(tmp_path, settings):
+    """Create text documents and point every module at them"""
+    data_dir = tmp_path / "data" / "test_user"
+    for rel, text in DOCUMENTS.items():
+        path = data_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    from app.services.file.content_index import content_index
+
+    with patch('app.services.sync.change_journal.config', settings), \
+         patch('app.services.sync.metadata_index.config', settings), \
+         patch('app.services.file.content_index.config', settings), \
+         patch('app.services.sync.metadata_index.hash_executor', InlineExecutor()), \
+         patch('app.services.file.content_index.content_executor', InlineExecutor()), \
+         patch.object(content_index, 'skipped', 0):
+        yield data_dir
+
+
+@pytest.fixture
+def db(data_dir):
+    """Create an in-memory database with all tables"""
+    from app.core.database import Base
+    import app.models  # noqa: F401
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    with patch('app.services.sync.change_journal.SessionLocal', TestSession), \
+         patch('app.services.sync.metadata_index.SessionLocal', TestSession), \
+         patch('app.services.file.content_index.SessionLocal', TestSession):
+        session = TestSession()
+        yield session
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    from app.models.user import User
+    from app.services.sync.metadata_index import metadata_index
+
+    user = User(email="test@example.com", username="test", hashed_password="x", root_foldername="test_user")
+    db.add(user)
+    db.commit()
+    metadata_index.reconcile(user)
+    yield user
+    metadata_index.mark_stale(user.id)
+
+
+@pytest.fixture
+def client(db, user):
+    from app.api.file.search_file import search_router
+    from app.api.dependencies import get_current_user, get_db
+
+    app = FastAPI()
+    app.include_router(search_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_db] = lambda: db
+
+    with TestClient(app) as client:
+        yield client
+
+
+def search(client, **params):
+    response = client.get("/api/file/search/content", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def document_count(db):
+    from app.models.content_index import ContentDocument
+
+    db.expire_all()
+    return db.query(ContentDocument).count()
+
+
+def test_tokenize():
+    """Test that tokens are lowercased words of indexable length"""
+    from app.services.file.content_index import tokenize
+
+    assert tokenize("Hello, WORLD! a b2 naïve " + "x" * 65) == ["hello", "world", "b2", "naïve"]
+
+
+def test_reconcile_indexes_text_documents_once_per_hash(db, user):
+    """Test that only text documents are indexed and identical contents share a document"""
+    from app.models.content_index import ContentPosting
+
+    # garden.md is stored twice, script.py is not a text document
+    assert document_count(db) == 4
+    assert db.query(ContentPosting).filter(ContentPosting.term == "tomatoes").count() == 3
+
+
+def test_search_ranks_by_matched_terms_then_score(client):
+    """Test ranking and snippets"""
+    body = search(client, q="tomatoes basil")
+    paths = [r["path"] for r in body["results"]]
+
+    # soup.txt is the only document with both terms
+    assert paths[0] == "recipes/soup.txt"
+    assert body["results"][0]["matched_terms"] == 2
+    # Repeated "tomatoes" outranks a single mention
+    assert paths.index("notes/garden.md") < paths.index("notes/shopping.txt")
+    assert "script.py" not in paths
+    assert set(paths) == {"recipes/soup.txt", "notes/garden.md", "copy/garden.md", "notes/shopping.txt", "data/plants.csv"}
+
+    snippet = body["results"][0]["snippet"]
+    assert "tomatoes" in snippet.lower() or "basil" in snippet.lower()
+    assert body["has_more"] is False
+
+
+def test_search_snippet_is_cut_around_match(client, user, data_dir):
+    """Test that long documents get a short snippet around the match"""
+    from app.services.sync.change_journal import record_change
+
+    path = data_dir / "long.txt"
+    path.write_text("filler " * 200 + "needle " + "filler " * 200)
+    record_change(user, "create", str(path))
+
+    result = search(client, q="needle")["results"][0]
+    assert result["path"] == "long.txt"
+    assert "needle" in result["snippet"]
+    assert result["snippet"].startswith("…") and result["snippet"].endswith("…")
+    assert len(result["snippet"]) < 250
+
+
+def test_snippet_reads_only_a_window_around_the_match(client, db, user, data_dir):
+    """Test that snippets of large documents come from the indexed offset"""
+    from app.models.content_index import ContentPosting
+    from app.services.sync.change_journal import record_change
+
+    path = data_dir / "large.txt"
+    prefix = "éé filler " * 50_000
+    path.write_text(prefix + "needle " + "filler " * 100)
+    record_change(user, "create", str(path))
+
+    posting = db.query(ContentPosting).filter(ContentPosting.term == "needle").one()
+    assert posting.offset == len(prefix.encode("utf-8"))
+
+    # Scanning from the start of the file would not reach the match
+    with patch('app.services.file.search.SNIPPET_SCAN_BYTES', 16):
+        result = search(client, q="needle")["results"][0]
+    assert "needle" in result["snippet"]
+    assert result["snippet"].startswith("…") and result["snippet"].endswith("…")
+    assert len(result["snippet"]) < 250
+
+
+def test_search_filters_and_pages(client):
+    """Test folder filter and paging"""
+    assert [r["path"] for r in search(client, q="tomatoes", folder="notes")["results"]] == [
+        "notes/garden.md", "notes/shopping.txt",
+    ]
+    first = search(client, q="tomatoes", limit=2)
+    assert len(first["results"]) == 2 and first["has_more"] is True
+    assert search(client, q="nonexistentword")["results"] == []
+
+
+def test_search_reports_index_size(client, db):
+    """Test that searches report the user's files and the stats route the whole index"""
+    # script.py is not a text document
+    assert search(client, q="basil")["index"] == {"indexed": 5, "pending": 0}
+
+    response = client.get("/api/file/search/content/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["documents"] == 4
+    assert stats["postings"] > 0
+    assert stats["max_postings"] == 100_000
+    assert stats["skipped"] == 0
+
+
+def test_scheduled_prune_reports_index_size(db, user, data_dir, caplog):
+    """Test that the scheduled job prunes and logs the size of the index"""
+    import logging
+    from app.services.file.content_index import content_index
+    from app.services.sync.change_journal import record_change
+
+    path = data_dir / "notes" / "shopping.txt"
+    path.unlink()
+    record_change(user, "delete", str(path))
+
+    with caplog.at_level(logging.INFO, logger="app.services.file.content_index"):
+        stats = content_index.prune_and_report()
+    assert stats["documents"] == 3
+    assert "pruned 1 documents, 3 documents" in caplog.text
+
+
+def test_other_users_do_not_affect_ranking_or_stats(client, db, data_dir):
+    """Test that scores and stats only depend on the user's own documents"""
+    from app.models.user import User
+    from app.services.sync.metadata_index import metadata_index
+
+    before = search(client, q="tomatoes basil")
+
+    other_dir = data_dir.parent / "other_user"
+    other_dir.mkdir()
+    for i in range(5):
+        (other_dir / f"note{i}.txt").write_text(f"basil basil tomatoes number{i}")
+    other = User(email="other@example.com", username="other", hashed_password="x", root_foldername="other_user")
+    db.add(other)
+    db.commit()
+    metadata_index.reconcile(other)
+
+    after = search(client, q="tomatoes basil")
+    assert after["results"] == before["results"]
+    assert after["index"] == before["index"]
+    metadata_index.mark_stale(other.id)
+
+
+def test_unchanged_files_are_not_reread(db, user):
+    """Test that indexing is keyed by hash"""
+    from app.services.sync.metadata_index import metadata_index
+
+    with patch('app.services.file.content_index.read_document') as read:
+        metadata_index.reconcile(user)
+    read.assert_not_called()
+
+
+def test_modified_file_is_reindexed_and_old_contents_pruned(client, db, user, data_dir):
+    """Test that a write indexes the new contents and prune drops the old"""
+    from app.services.file.content_index import content_index
+    from app.services.sync.change_journal import record_change
+
+    path = data_dir / "notes" / "shopping.txt"
+    path.write_text("apples and pears")
+    record_change(user, "modify", str(path))
+
+    assert [r["path"] for r in search(client, q="pears")["results"]] == ["notes/shopping.txt"]
+    assert "notes/shopping.txt" not in [r["path"] for r in search(client, q="milk")["results"]]
+
+    assert document_count(db) == 5
+    assert content_index.prune() == 1
+    assert document_count(db) == 4
+
+
+def test_budget_skips_new_documents(client, db, user, data_dir, settings):
+    """Test that the index does not grow past its budget"""
+    from app.services.file.content_index import content_index
+    from app.services.sync.change_journal import record_change
+
+    settings.CONTENT_INDEX_MAX_POSTINGS = content_index.stats(db)["postings"]
+
+    path = data_dir / "new.txt"
+    path.write_text("overflowing words here")
+    record_change(user, "create", str(path))
+
+    body = search(client, q="overflowing")
+    assert body["results"] == []
+    assert body["index"]["pending"] == 1
+    stats = content_index.stats(db)
+    assert stats["skipped"] == 1
+    assert stats["postings"] <= settings.CONTENT_INDEX_MAX_POSTINGS
+
+
+def test_budget_prunes_before_skipping(client, db, user, data_dir, settings):
+    """Test that unreferenced documents make room for new ones"""
+    from app.services.file.content_index import content_index
+    from app.services.sync.change_journal import record_change
+
+    settings.CONTENT_INDEX_MAX_POSTINGS = content_index.stats(db)["postings"]
+
+    # Deleting shopping.txt leaves its document unreferenced
+    path = data_dir / "notes" / "shopping.txt"
+    path.unlink()
+    record_change(user, "delete", str(path))
+
+    path = data_dir / "new.txt"
+    path.write_text("fresh words")
+    record_change(user, "create", str(path))
+
+    body = search(client, q="fresh")
+    assert [r["path"] for r in body["results"]] == ["new.txt"]
+    assert body["index"]["pending"] == 0
+    assert content_index.stats(db)["skipped"] == 0
+
+
+@pytest.mark.parametrize("q", ["", "  "])
+def test_empty_query_rejected(client, q):
+    assert client.get("/api/file/search/content", params={"q": q}).status_code in (400, 422)
+
+
+def test_query_without_words_finds_nothing(client):
+    assert search(client, q="!!")["results"] == []
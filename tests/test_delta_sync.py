@@ -0,0 +1,131 @@
+"""
+Tests for rsync-style signature and delta endpoints
+"""
+import base64
+import os
+import zlib
+from unittest.mock import Mock, patch
+import pytest
+from tests.conftest import run_async
+
+
+@pytest.fixture(autouse=True)
+def mock_config():
+    """Mock the config settings before any imports"""
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = "/tmp/test"
+
+    with patch('app.api.sync.sync_routes.config', mock_settings):
+        with patch('app.api.sync.sync_routes.record_change'):
+            yield mock_settings
+
+
+def test_roll_adler32_matches_full_checksum():
+    """Test that rolling the weak checksum equals recomputing it"""
+    from app.services.sync.delta import roll_adler32
+
+    data = os.urandom(4096)
+    block_len = 512
+    checksum = zlib.adler32(data[:block_len])
+
+    for i in range(1, 200):
+        checksum = roll_adler32(checksum, data[i - 1], data[i + block_len - 1], block_len)
+        assert checksum == zlib.adler32(data[i:i + block_len])
+
+
+def test_signature_blocks(test_dir, mock_user):
+    """Test block signatures of a server file"""
+    from app.api.sync.sync_routes import get_file_signature
+
+    tmp_path, data_dir = test_dir
+    content = os.urandom(2500)
+    (data_dir / "image.bin").write_bytes(content)
+
+    response = run_async(get_file_signature(
+        "image.bin", device_id=None, block_size=1024, user=mock_user, db=None
+    ))
+
+    assert response.file_size == 2500
+    assert [b.size for b in response.blocks] == [1024, 1024, 452]
+    assert response.blocks[1].weak == zlib.adler32(content[1024:2048])
+
+
+def test_apply_delta_rebuilds_file(test_dir, mock_user):
+    """Test rebuilding a file from copied blocks and literal data"""
+    from app.api.sync.sync_routes import (
+        apply_file_delta, ApplyDeltaRequest, DeltaInstruction
+    )
+    from app.services.sync.hash_utils import calculate_file_hash
+    import hashlib
+
+    tmp_path, data_dir = test_dir
+    original = os.urandom(4096)
+    target = original[:2048] + b"EDITED" + original[3072:]
+    test_file = data_dir / "disk.img"
+    test_file.write_bytes(original)
+
+    request = ApplyDeltaRequest(
+        file_path="disk.img",
+        block_size=1024,
+        base_hash=calculate_file_hash(str(test_file)),
+        target_hash=hashlib.md5(target).hexdigest(),
+        instructions=[
+            DeltaInstruction(op="copy", block=0, count=2),
+            DeltaInstruction(op="data", data=base64.b64encode(b"EDITED").decode()),
+            DeltaInstruction(op="copy", block=3),
+        ],
+    )
+
+    response = run_async(apply_file_delta(request, user=mock_user, db=None))
+
+    assert test_file.read_bytes() == target
+    assert response.copied_bytes == 3072
+    assert response.literal_bytes == 6
+    # No temporary files left behind
+    assert os.listdir(data_dir) == ["disk.img"]
+
+
+def test_apply_delta_rejects_stale_base(test_dir, mock_user):
+    """Test that a delta against an outdated base is refused"""
+    from app.api.sync.sync_routes import apply_file_delta, ApplyDeltaRequest, DeltaInstruction
+    from fastapi import HTTPException
+
+    tmp_path, data_dir = test_dir
+    (data_dir / "doc.txt").write_bytes(b"current")
+
+    request = ApplyDeltaRequest(
+        file_path="doc.txt",
+        block_size=1024,
+        base_hash="outdated",
+        instructions=[DeltaInstruction(op="copy", block=0)],
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        run_async(apply_file_delta(request, user=mock_user, db=None))
+
+    assert exc_info.value.status_code == 409
+    assert (data_dir / "doc.txt").read_bytes() == b"current"
+
+
+def test_apply_delta_rejects_out_of_range_block(test_dir, mock_user):
+    """Test that copying a block past the end of the base fails cleanly"""
+    from app.api.sync.sync_routes import apply_file_delta, ApplyDeltaRequest, DeltaInstruction
+    from app.services.sync.hash_utils import calculate_file_hash
+    from fastapi import HTTPException
+
+    tmp_path, data_dir = test_dir
+    test_file = data_dir / "doc.txt"
+    test_file.write_bytes(b"x" * 100)
+
+    request = ApplyDeltaRequest(
+        file_path="doc.txt",
+        block_size=1024,
+        base_hash=calculate_file_hash(str(test_file)),
+        instructions=[DeltaInstruction(op="copy", block=5)],
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        run_async(apply_file_delta(request, user=mock_user, db=None))
+
+    assert exc_info.value.status_code == 400
+    assert os.listdir(data_dir) == ["doc.txt"]
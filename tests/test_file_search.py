@@ -0,0 +1,152 @@
+"""
+Tests for filename search over the metadata index
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# path: (size, mtime)
+FILES = {
+    "Report.pdf": (1000, 1_700_000_000),
+    "reports/2024 Q1 report.docx": (5000, 1_710_000_000),
+    "reports/budget.xlsx": (2000, 1_720_000_000),
+    "photos/beach_report.JPG": (300_000, 1_730_000_000),
+    "photos/100%_done.png": (10, 1_730_000_000),
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create files with known sizes and mtimes"""
+    data_dir = tmp_path / "data" / "test_user"
+    for rel, (size, mtime) in FILES.items():
+        path = data_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (mtime, mtime))
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.services.sync.metadata_index.config', mock_settings), \
+         patch('app.services.sync.metadata_index.hash_executor', Mock()):
+        yield data_dir
+
+
+@pytest.fixture
+def client(data_dir, mock_user):
+    """Index the files and create a test client on the same database"""
+    from app.core.database import Base
+    from app.api.file.search_file import search_router
+    from app.api.dependencies import get_current_user, get_db
+    from app.services.sync.metadata_index import metadata_index
+    import app.models  # noqa: F401
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    with patch('app.services.sync.metadata_index.SessionLocal', TestSession):
+        metadata_index.reconcile(mock_user)
+
+        app = FastAPI()
+        app.include_router(search_router, prefix="/api/file")
+        app.dependency_overrides[get_current_user] = lambda: mock_user
+        def override_get_db():
+            db = TestSession()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+
+        with TestClient(app) as client:
+            yield client
+        metadata_index.mark_stale(mock_user.id)
+
+
+def search(client, **params):
+    response = client.get("/api/file/search", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_substring_search_ranks_prefix_matches_first(client):
+    """Test that matches are case-insensitive and prefix matches lead"""
+    body = search(client, q="report")
+    assert [r["path"] for r in body["results"]] == [
+        "Report.pdf",
+        "photos/beach_report.JPG",
+        "reports/2024 Q1 report.docx",
+    ]
+    assert body["complete"] is True
+    assert body["has_more"] is False
+
+    result = body["results"][0]
+    assert (result["name"], result["size"], result["mime_type"]) == ("Report.pdf", 1000, "application/pdf")
+
+
+def test_all_terms_must_match(client):
+    """Test that every term has to occur, and path terms match folders"""
+    assert [r["path"] for r in search(client, q="q1 report")["results"]] == ["reports/2024 Q1 report.docx"]
+    assert [r["path"] for r in search(client, q="reports/ b")["results"]] == ["reports/budget.xlsx"]
+
+
+def test_like_wildcards_are_literal(client):
+    """Test that % and _ in the query are not SQL wildcards"""
+    assert [r["name"] for r in search(client, q="100%")["results"]] == ["100%_done.png"]
+    assert search(client, q="beach%report")["results"] == []
+
+
+def test_filters(client):
+    """Test extension, size, date and folder filters"""
+    paths = lambda body: sorted(r["path"] for r in body["results"])  # noqa: E731
+
+    assert paths(search(client, q="r", ext="jpg,pdf")) == ["Report.pdf", "photos/beach_report.JPG"]
+    assert paths(search(client, q="e", min_size=1500, max_size=10000)) == [
+        "reports/2024 Q1 report.docx", "reports/budget.xlsx",
+    ]
+    assert paths(search(client, q="e", modified_after="2024-03-01", modified_before="2024-08-01")) == [
+        "reports/2024 Q1 report.docx", "reports/budget.xlsx",
+    ]
+    assert paths(search(client, q="report", folder="photos")) == ["photos/beach_report.JPG"]
+
+
+def test_pagination(client):
+    """Test limit, offset and has_more"""
+    first = search(client, q="e", limit=2)
+    assert len(first["results"]) == 2
+    assert first["has_more"] is True
+    rest = search(client, q="e", limit=2, offset=2)
+    assert not {r["path"] for r in first["results"]} & {r["path"] for r in rest["results"]}
+
+
+def test_index_is_updated_by_writes(client, data_dir, mock_user):
+    """Test that a new file is searchable right after its journal entry"""
+    from app.services.sync.change_journal import record_change
+    from app.services.sync import metadata_index as index_module
+
+    (data_dir / "notes.md").write_text("hi")
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(data_dir.parent.parent)
+    with patch('app.services.sync.change_journal.config', mock_settings), \
+         patch('app.services.sync.change_journal.SessionLocal', index_module.SessionLocal):
+        record_change(mock_user, "create", str(data_dir / "notes.md"))
+
+    assert [r["path"] for r in search(client, q="notes")["results"]] == ["notes.md"]
+
+
+@pytest.mark.parametrize("params", [
+    {"q": ""},
+    {"q": "  "},
+    {"q": "a", "modified_after": "yesterday"},
+    {"q": "a", "limit": 0},
+])
+def test_invalid_queries(client, params):
+    """Test rejected queries"""
+    assert client.get("/api/file/search", params=params).status_code in (400, 422)
@@ -0,0 +1,163 @@
+"""
+Tests for cursor-paginated, sorted folder listings
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# name: (size, mtime)
+FILES = {
+    "b.txt": (300, 1000),
+    "a.txt": (100, 3000),
+    "c.txt": (100, 2000),
+    "d.txt": (200, 2000),
+}
+FOLDERS = ["zeta", "alpha"]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a folder with files of known sizes and mtimes"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "roll").mkdir(parents=True)
+    for name, (size, mtime) in FILES.items():
+        path = data_dir / "roll" / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (mtime, mtime))
+    for name in FOLDERS:
+        (data_dir / "roll" / name).mkdir()
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.api.folder.get_folder.config', mock_settings), \
+         patch('app.services.sync.metadata_index.config', mock_settings), \
+         patch('app.services.sync.metadata_index.hash_executor', Mock()):
+        yield data_dir
+
+
+@pytest.fixture(params=["disk", "index"])
+def source(request, data_dir, mock_user):
+    """Run each test against the disk scan and the metadata index"""
+    from app.core.database import Base
+    from app.services.sync.metadata_index import metadata_index
+    import app.models  # noqa: F401
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    with patch('app.services.sync.metadata_index.SessionLocal', TestSession):
+        if request.param == "index":
+            session = TestSession()
+            metadata_index.reconcile(mock_user, session)
+            session.close()
+        yield request.param
+        metadata_index.mark_stale(mock_user.id)
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.folder.get_folder import getfolderroute
+    from app.api.dependencies import get_current_user
+
+    app = FastAPI()
+    app.include_router(getfolderroute, prefix="/api/folder")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with TestClient(app) as client:
+        yield client
+
+
+def get_page(client, **kwargs):
+    params = {"folder_path": "roll", **kwargs}
+    return client.get("/api/folder/get_folder", params={k: v for k, v in params.items() if v is not None})
+
+
+def list_page(client, **kwargs):
+    response = get_page(client, **kwargs)
+    assert response.status_code == 200
+    return response.json()
+
+
+def list_all_pages(client, limit, **kwargs):
+    names, cursor = [], None
+    while True:
+        page = list_page(client, limit=limit, cursor=cursor, **kwargs)
+        assert len(page["items"]) <= limit
+        names += [item["name"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize("sort,order,expected", [
+    ("name", "asc", ["alpha", "zeta", "a.txt", "b.txt", "c.txt", "d.txt"]),
+    ("name", "desc", ["zeta", "alpha", "d.txt", "c.txt", "b.txt", "a.txt"]),
+    ("size", "asc", ["alpha", "zeta", "a.txt", "c.txt", "d.txt", "b.txt"]),
+    ("size", "desc", ["zeta", "alpha", "b.txt", "d.txt", "c.txt", "a.txt"]),
+    ("modified", "asc", ["alpha", "zeta", "b.txt", "c.txt", "d.txt", "a.txt"]),
+    ("modified", "desc", ["zeta", "alpha", "a.txt", "d.txt", "c.txt", "b.txt"]),
+])
+@pytest.mark.parametrize("limit", [1, 2, 4, 10])
+def test_pages_cover_listing_in_order(source, client, sort, order, expected, limit):
+    """Test that walking every page yields each entry once, in sort order"""
+    assert list_all_pages(client, limit, sort=sort, order=order) == expected
+
+
+def test_page_items_keep_metadata(source, client):
+    """Test that paginated items have the same shape as the plain listing"""
+    page = list_page(client, limit=3)
+    assert page["items"][:2] == [{"name": "alpha", "type": "folder"}, {"name": "zeta", "type": "folder"}]
+    item = page["items"][2]
+    assert (item["name"], item["type"], item["size"]) == ("a.txt", "file", 100)
+    assert item["modified"].startswith("1970-01-01T00:50:00")
+    assert page["next_cursor"] is not None
+
+
+def test_cursor_is_stable_across_inserts(source, mock_user, client, data_dir):
+    """Test that entries added before the cursor do not shift the next page"""
+    from app.services.sync.metadata_index import metadata_index
+
+    first = list_page(client, limit=3, sort="size")
+    (data_dir / "roll" / "0.txt").write_bytes(b"")
+    if source == "index":
+        metadata_index.reconcile(mock_user)
+
+    second = list_page(client, limit=10, sort="size", cursor=first["next_cursor"])
+    assert [item["name"] for item in second["items"]] == ["c.txt", "d.txt", "b.txt"]
+
+
+def forged_cursor(position, sort, order="asc"):
+    import base64
+    import json
+
+    data = json.dumps({"p": position, "s": sort, "o": order}).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"cursor": "not-a-cursor"},
+    {"sort": "size", "cursor": forged_cursor([1, "x", "a.txt"], "size")},
+    {"sort": "name", "cursor": forged_cursor([1, 5, "a.txt"], "name")},
+    {"sort": "modified", "cursor": forged_cursor([1, 1000, 7], "modified")},
+    {"sort": "size", "cursor": forged_cursor([0, 1, "alpha"], "size")},
+    {"sort": "colour"},
+    {"order": "sideways"},
+    {"limit": 0},
+    {"limit": 100000},
+])
+def test_invalid_parameters(source, client, kwargs):
+    """Test that bad pagination parameters are rejected"""
+    assert get_page(client, **kwargs).status_code == 400
+
+
+def test_cursor_bound_to_sort(data_dir, client):
+    """Test that a cursor cannot be reused with another sort order"""
+    page = list_page(client, limit=1, sort="size")
+    assert get_page(client, limit=1, sort="name", cursor=page["next_cursor"]).status_code == 400
@@ -0,0 +1,113 @@
+"""
+Tests for the bounded /api/folder/tree endpoint
+"""
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a small tree with files at the top level"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "photos" / "2024" / "summer").mkdir(parents=True)
+    (data_dir / "photos" / "2025").mkdir(parents=True)
+    (data_dir / "docs").mkdir()
+    (data_dir / "photos" / "2024" / "a.jpg").write_bytes(b"a" * 10)
+    (data_dir / "photos" / "cover.jpg").write_bytes(b"c" * 5)
+    (data_dir / "readme.txt").write_text("hi")
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.services.folder.paths.config', mock_settings), \
+         patch('app.services.folder.getfolder.config', mock_settings):
+        yield data_dir
+
+
+@pytest.fixture
+def client(mock_user, data_dir):
+    """Create a test client with authentication overridden"""
+    from app.api.folder.folder_tree import foldertreeroute
+    from app.api.dependencies import get_current_user
+
+    app = FastAPI()
+    app.include_router(foldertreeroute, prefix="/api/folder")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_tree_depth_one_has_counts(client):
+    """Test that only the first level is expanded and every node has counts"""
+    response = client.get("/api/folder/tree")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["truncated"] is False
+    assert body["entries"] == 2
+    assert body["tree"] == {
+        "name": "",
+        "type": "folder",
+        "folders": 2,
+        "files": 1,
+        "children": [
+            {"name": "docs", "type": "folder", "folders": 0, "files": 0},
+            {"name": "photos", "type": "folder", "folders": 2, "files": 1},
+        ],
+    }
+
+
+def test_tree_deeper_with_files(client):
+    """Test depth and include_files below a sub path"""
+    body = client.get("/api/folder/tree?path=photos&depth=2&include_files=true").json()
+    tree = body["tree"]
+    assert tree["name"] == "photos"
+    assert [child["name"] for child in tree["children"]] == ["2024", "2025", "cover.jpg"]
+    assert tree["children"][2] == {"name": "cover.jpg", "type": "file", "size": 5}
+
+    year = tree["children"][0]
+    assert year["children"] == [
+        {"name": "summer", "type": "folder", "folders": 0, "files": 0},
+        {"name": "a.jpg", "type": "file", "size": 10},
+    ]
+    assert "children" not in year["children"][0]
+
+
+def test_tree_max_entries_is_breadth_first(client):
+    """Test that the entry budget is spent on the nearest levels first"""
+    body = client.get("/api/folder/tree?depth=5&max_entries=3").json()
+    assert body["truncated"] is True
+    assert body["entries"] == 3
+
+    children = body["tree"]["children"]
+    assert [child["name"] for child in children] == ["docs", "photos"]
+    assert [child["name"] for child in children[1]["children"]] == ["2024"]
+    assert children[1]["folders"] == 2
+
+
+def test_tree_conditional_request(client):
+    """Test that an unchanged tree answers 304"""
+    etag = client.get("/api/folder/tree").headers["etag"]
+    assert client.get("/api/folder/tree", headers={"If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("query,status", [
+    ("depth=-1", 400),
+    ("depth=100", 400),
+    ("max_entries=0", 400),
+    ("path=missing", 404),
+    ("path=readme.txt", 400),
+])
+def test_tree_errors(client, query, status):
+    """Test rejected parameters and paths"""
+    assert client.get(f"/api/folder/tree?{query}").status_code == status
+
+
+def test_get_all_folders_skips_files(data_dir):
+    """Test that top-level files no longer break get_all_folders"""
+    from app.services.folder.getfolder import getallfolders
+
+    folders = getallfolders("test_user")
+    assert set(folders) == {"docs", "photos"}
+    assert sorted(folders["photos"]) == ["2024", "2025", "cover.jpg"]
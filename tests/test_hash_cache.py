@@ -0,0 +1,95 @@
+"""
+Tests for the persistent file hash cache
+"""
+import os
+from unittest.mock import patch
+import pytest
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create an isolated hash cache and route hash_utils through it"""
+    from app.services.sync.hash_cache import FileHashCache
+
+    cache = FileHashCache(str(tmp_path / "cache" / "hashes.sqlite3"))
+    with patch('app.services.sync.hash_utils.hash_cache', cache):
+        yield cache
+
+
+@pytest.fixture
+def test_file(tmp_path):
+    """Create a test file"""
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"original content")
+    return path
+
+
+def test_second_lookup_is_a_hit(cache, test_file):
+    """Test that an unchanged file is hashed only once"""
+    from app.services.sync.hash_utils import get_cached_file_hash, calculate_file_hash
+
+    first = get_cached_file_hash(str(test_file))
+
+    with patch('app.services.sync.hash_utils.calculate_file_hash') as mock_hash:
+        second = get_cached_file_hash(str(test_file))
+        mock_hash.assert_not_called()
+
+    assert first == second == calculate_file_hash(str(test_file))
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_modified_file_is_rehashed(cache, test_file):
+    """Test that changing size or mtime invalidates the cached hash"""
+    from app.services.sync.hash_utils import get_cached_file_hash
+
+    old_hash = get_cached_file_hash(str(test_file))
+
+    test_file.write_bytes(b"changed content that is longer")
+    new_hash = get_cached_file_hash(str(test_file))
+
+    assert new_hash != old_hash
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+
+
+def test_cache_persists_across_instances(tmp_path, test_file):
+    """Test that hashes survive a restart"""
+    from app.services.sync.hash_cache import FileHashCache
+
+    db_path = str(tmp_path / "hashes.sqlite3")
+    stat_info = os.stat(test_file)
+
+    FileHashCache(db_path).set(stat_info, "md5", "abc123", str(test_file))
+
+    reopened = FileHashCache(db_path)
+    assert reopened.get(stat_info, "md5") == "abc123"
+    assert reopened.get(stat_info, "sha256") is None
+
+
+def test_prune_removes_deleted_files(cache, test_file):
+    """Test that prune drops entries for files that no longer exist"""
+    from app.services.sync.hash_utils import get_cached_file_hash
+
+    get_cached_file_hash(str(test_file))
+    os.remove(test_file)
+
+    assert cache.prune() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_unavailable_cache_falls_back_to_hashing(tmp_path, test_file):
+    """Test that hashing still works when the cache cannot be opened"""
+    from app.services.sync.hash_cache import FileHashCache
+    from app.services.sync.hash_utils import get_cached_file_hash, calculate_file_hash
+
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    cache = FileHashCache(str(blocker / "hashes.sqlite3"))
+
+    with patch('app.services.sync.hash_utils.hash_cache', cache):
+        assert get_cached_file_hash(str(test_file)) == calculate_file_hash(str(test_file))
+
+    assert cache.stats()["enabled"] is False
@@ -0,0 +1,181 @@
+"""
+Tests for resized image views and the derivative cache
+"""
+import io
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a user directory with a few images"""
+    data_dir = tmp_path / "data" / "test_user"
+    data_dir.mkdir(parents=True)
+    Image.new("RGB", (2000, 1000), (10, 120, 10)).save(data_dir / "landscape.jpg")
+    Image.new("RGBA", (400, 400), (0, 0, 255, 128)).save(data_dir / "logo.png")
+    (data_dir / "clip.mp4").write_bytes(b"0" * 1024)
+    return data_dir
+
+
+@pytest.fixture
+def cache(tmp_path, data_dir):
+    """Point view_file at a derivative cache under tmp_path"""
+    from app.services.media.derivatives import DerivativeCache
+
+    cache = DerivativeCache(cache_dir=str(tmp_path / "cache" / "derivatives"), max_bytes=10 * 1024 * 1024)
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.api.file.view_file.config', mock_settings), \
+         patch('app.api.file.view_file.derivative_cache', cache):
+        yield cache
+
+
+@pytest.fixture
+def client(mock_user, cache):
+    """Create a test client with authentication overridden"""
+    from app.api.file.view_file import view_router
+    from app.api.dependencies import get_current_user
+
+    app = FastAPI()
+    app.include_router(view_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with TestClient(app) as client:
+        yield client
+
+
+def open_response(response) -> Image.Image:
+    return Image.open(io.BytesIO(response.content))
+
+
+def test_resize_contain(client):
+    """Test that w/h fit the image inside the box keeping its aspect ratio"""
+    response = client.get("/api/file/view/landscape.jpg?w=1080")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert open_response(response).size == (1080, 540)
+
+    response = client.get("/api/file/view/landscape.jpg?w=1080&h=200")
+    assert open_response(response).size == (400, 200)
+
+
+def test_resize_cover_and_format(client):
+    """Test that cover crops to the exact box and format re-encodes"""
+    response = client.get("/api/file/view/landscape.jpg?w=300&h=300&fit=cover&format=webp")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    image = open_response(response)
+    assert image.format == "WEBP"
+    assert image.size == (300, 300)
+
+
+def test_images_are_never_enlarged(client):
+    """Test that requesting more pixels than the source returns the source size"""
+    response = client.get("/api/file/view/logo.png?w=4000")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert open_response(response).size == (400, 400)
+
+
+def test_derivative_is_cached(client, cache):
+    """Test that a repeated request is served from disk without rendering"""
+    first = client.get("/api/file/view/landscape.jpg?w=500")
+    with patch('app.services.media.derivatives.submit_media_task') as submit:
+        second = client.get("/api/file/view/landscape.jpg?w=500")
+        submit.assert_not_called()
+
+    assert second.content == first.content
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    response = client.get("/api/file/view/landscape.jpg?w=500", headers={"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_large_images_can_be_viewed_resized(client):
+    """Test that resizing bypasses the inline size limit"""
+    with patch('app.api.file.view_file.MAX_VIEW_SIZE', 1024):
+        assert client.get("/api/file/view/landscape.jpg").status_code == 413
+        response = client.get("/api/file/view/landscape.jpg?w=100")
+    assert response.status_code == 200
+    assert open_response(response).size == (100, 50)
+
+
+@pytest.mark.parametrize("query", ["w=0", "w=5000", "w=10&fit=stretch", "format=gif", "w=abc"])
+def test_invalid_parameters(client, query):
+    """Test that bad resize parameters are rejected"""
+    assert client.get(f"/api/file/view/landscape.jpg?{query}").status_code in (400, 422)
+
+
+def test_resize_rejected_for_non_images(client):
+    """Test that only image types can be resized"""
+    assert client.get("/api/file/view/clip.mp4?w=100").status_code == 400
+
+
+def test_lru_eviction(tmp_path, data_dir):
+    """Test that the least recently used derivatives are evicted over budget"""
+    import asyncio
+    from app.services.media.derivatives import DerivativeCache
+
+    cache = DerivativeCache(cache_dir=str(tmp_path / "lru"), max_bytes=10 ** 9)
+    source = str(data_dir / "landscape.jpg")
+
+    async def render(width):
+        return (await cache.get(source, width, None, "contain", "jpeg"))[0]
+
+    first, second = asyncio.run(render(300)), asyncio.run(render(200))
+    asyncio.run(render(300))  # first becomes the most recently used
+
+    # Room for the two cached renders; the smaller third one needs one evicted
+    cache._max_bytes = os.path.getsize(first) + os.path.getsize(second)
+    third = asyncio.run(render(100))
+
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert os.path.exists(third)
+    assert cache.evictions == 1
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    """Test that recency order survives a restart through file mtimes"""
+    from app.services.media.derivatives import DerivativeCache
+
+    cache_dir = tmp_path / "derivatives" / "ab"
+    cache_dir.mkdir(parents=True)
+    for name, mtime in (("new.webp", 2000), ("old.webp", 1000)):
+        (cache_dir / name).write_bytes(b"x" * 100)
+        os.utime(cache_dir / name, (mtime, mtime))
+
+    cache = DerivativeCache(cache_dir=str(tmp_path / "derivatives"), max_bytes=1000)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["size"] == 200
+    assert list(cache._entries) == [str(cache_dir / "old.webp"), str(cache_dir / "new.webp")]
+
+
+def test_cache_disk_work_runs_off_the_event_loop(cache, data_dir):
+    """Test that index loading, touches and evictions never run on the loop thread"""
+    import asyncio
+    import threading
+
+    index_threads = []
+    load_index = cache._load_index
+
+    def record_load_index():
+        index_threads.append(threading.current_thread())
+        load_index()
+
+    async def render_twice():
+        loop_thread = threading.current_thread()
+        for _ in range(2):
+            await cache.get(str(data_dir / "logo.png"), 100, None, "contain", "webp")
+        return loop_thread
+
+    with patch.object(cache, '_load_index', side_effect=record_load_index):
+        loop_thread = asyncio.run(render_twice())
+
+    assert cache.hits == 1 and cache.misses == 1
+    assert index_threads and loop_thread not in index_threads
@@ -0,0 +1,110 @@
+"""
+Tests for the directory Merkle index and the tree-hash endpoint
+"""
+from unittest.mock import Mock, patch
+import pytest
+from tests.conftest import run_async
+
+
+@pytest.fixture(autouse=True)
+def mock_config():
+    """Mock the config settings before any imports"""
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = "/tmp/test"
+
+    with patch('app.api.sync.sync_routes.config', mock_settings):
+        yield mock_settings
+
+
+@pytest.fixture
+def index():
+    """Create an isolated Merkle index"""
+    from app.services.sync.merkle import MerkleIndex
+
+    index = MerkleIndex()
+    with patch('app.api.sync.sync_routes.merkle_index', index):
+        yield index
+
+
+@pytest.fixture
+def tree(tmp_path, mock_config):
+    """Create a small directory tree"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "photos" / "2024").mkdir(parents=True)
+    (data_dir / "docs").mkdir()
+    (data_dir / "photos" / "2024" / "a.jpg").write_bytes(b"jpeg")
+    (data_dir / "docs" / "notes.txt").write_text("hello")
+    mock_config.DIR_LOCATION = str(tmp_path)
+    return data_dir
+
+
+def test_identical_trees_have_equal_hashes(index, tmp_path):
+    """Test that the hash depends only on names and contents"""
+    for root in ("one", "two"):
+        (tmp_path / root / "sub").mkdir(parents=True)
+        (tmp_path / root / "sub" / "file.txt").write_text("same")
+
+    assert index.directory_hash(str(tmp_path / "one")) == index.directory_hash(str(tmp_path / "two"))
+
+    (tmp_path / "two" / "sub" / "file.txt").write_text("different")
+    index.invalidate(str(tmp_path / "two" / "sub" / "file.txt"))
+
+    assert index.directory_hash(str(tmp_path / "one")) != index.directory_hash(str(tmp_path / "two"))
+
+
+def test_invalidate_only_touches_ancestors(index, tree):
+    """Test that a nested edit changes its ancestors but not its siblings"""
+    root_before = index.directory_hash(str(tree))
+    docs_before = index.directory_hash(str(tree / "docs"))
+    photos_before = index.directory_hash(str(tree / "photos"))
+
+    (tree / "photos" / "2024" / "a.jpg").write_bytes(b"edited jpeg")
+    index.invalidate(str(tree / "photos" / "2024" / "a.jpg"))
+
+    assert index.directory_hash(str(tree / "docs")) == docs_before
+    assert index.directory_hash(str(tree / "photos")) != photos_before
+    assert index.directory_hash(str(tree)) != root_before
+
+
+def test_new_child_detected_by_directory_mtime(index, tree):
+    """Test that adding a file is noticed without an explicit invalidation"""
+    import os
+
+    before = index.directory_hash(str(tree / "docs"))
+    (tree / "docs" / "new.txt").write_text("new")
+    # Make sure the directory mtime moves even on coarse filesystems
+    st = os.stat(tree / "docs")
+    os.utime(tree / "docs", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert index.directory_hash(str(tree / "docs")) != before
+
+
+def test_hash_computed_across_invalidation_is_not_cached(index, tree):
+    """Test that a nested edit during the computation cannot leave a stale hash behind"""
+    real_list_children = index.list_children
+
+    def edit_while_hashing(dir_path):
+        children = real_list_children(dir_path)
+        if dir_path == str(tree.resolve()):
+            (tree / "photos" / "2024" / "a.jpg").write_bytes(b"edited jpeg")
+            index.invalidate(str(tree / "photos" / "2024" / "a.jpg"))
+        return children
+
+    with patch.object(index, 'list_children', side_effect=edit_while_hashing):
+        stale = index.directory_hash(str(tree))
+
+    assert index.directory_hash(str(tree)) != stale
+
+
+def test_tree_hash_endpoint(index, tree, mock_user):
+    """Test that the endpoint returns the folder hash and its children"""
+    from app.api.sync.sync_routes import get_tree_hash
+
+    response = run_async(get_tree_hash("", device_id=None, user=mock_user, db=None))
+
+    assert response.hash == index.directory_hash(str(tree))
+    assert [(c.name, c.type) for c in response.children] == [("docs", "folder"), ("photos", "folder")]
+    assert response.children[0].hash == index.directory_hash(str(tree / "docs"))
+
+    nested = run_async(get_tree_hash("docs", device_id=None, user=mock_user, db=None))
+    assert [(c.name, c.type, c.size) for c in nested.children] == [("notes.txt", "file", 5)]
@@ -0,0 +1,293 @@
+"""
+Tests for the files/folders metadata index
+"""
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from tests.conftest import InlineExecutor, run_async
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a user directory and point every module at it"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "docs" / "old").mkdir(parents=True)
+    (data_dir / "docs" / "a.txt").write_bytes(b"a" * 10)
+    (data_dir / "docs" / "old" / "b.md").write_bytes(b"b" * 20)
+    (data_dir / "photo.jpg").write_bytes(b"c" * 30)
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.services.sync.change_journal.config', mock_settings), \
+         patch('app.services.sync.metadata_index.config', mock_settings), \
+         patch('app.api.folder.get_folder.config', mock_settings), \
+         patch('app.api.sync.sync_routes.config', mock_settings), \
+         patch('app.services.sync.metadata_index.hash_executor', InlineExecutor()):
+        yield data_dir
+
+
+@pytest.fixture
+def db():
+    """Create an in-memory database with all tables"""
+    from app.core.database import Base
+    import app.models  # noqa: F401
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    with patch('app.services.sync.change_journal.SessionLocal', TestSession), \
+         patch('app.services.sync.metadata_index.SessionLocal', TestSession):
+        session = TestSession()
+        yield session
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    from app.models.user import User
+
+    user = User(email="test@example.com", username="test", hashed_password="x", root_foldername="test_user")
+    db.add(user)
+    db.commit()
+    yield user
+
+    from app.services.sync.metadata_index import metadata_index
+    metadata_index.mark_stale(user.id)
+
+
+def folder_sizes(db, user):
+    from app.models.folders import Folder
+
+    db.expire_all()
+    return {f.path: f.size for f in db.query(Folder).filter(Folder.user_id == user.id)}
+
+
+def file_paths(db, user):
+    from app.models.files import File
+
+    db.expire_all()
+    return sorted(f.path for f in db.query(File).filter(File.user_id == user.id))
+
+
+def test_reconcile_builds_index(data_dir, db, user):
+    """Test that reconcile indexes the tree with sizes, MIME types and hashes"""
+    from app.models.files import File
+    from app.services.sync.metadata_index import metadata_index
+    from app.services.sync.hash_utils import calculate_file_hash
+
+    assert not metadata_index.is_ready(user.id)
+    counts = metadata_index.reconcile(user, db)
+
+    assert counts == {"added": 6, "updated": 0, "removed": 0}
+    assert metadata_index.is_ready(user.id)
+    assert file_paths(db, user) == ["docs/a.txt", "docs/old/b.md", "photo.jpg"]
+    assert folder_sizes(db, user) == {"": 60, "docs": 30, "docs/old": 20}
+
+    photo = db.query(File).filter(File.path == "photo.jpg").one()
+    assert (photo.mime_type, photo.type, photo.parent_path) == ("image/jpeg", "media", "")
+    assert photo.hash == calculate_file_hash(str(data_dir / "photo.jpg"))
+
+    assert metadata_index.reconcile(user, db) == {"added": 0, "updated": 0, "removed": 0}
+
+
+def test_reconcile_fixes_drift(data_dir, db, user):
+    """Test that changes made behind the index's back are picked up"""
+    import shutil
+    from app.services.sync.metadata_index import metadata_index
+
+    metadata_index.reconcile(user, db)
+    shutil.rmtree(data_dir / "docs" / "old")
+    (data_dir / "photo.jpg").write_bytes(b"c" * 5)
+    (data_dir / "new.txt").write_bytes(b"n")
+
+    counts = metadata_index.reconcile(user, db)
+    # photo.jpg plus the mtimes of the two folders that changed
+    assert counts == {"added": 1, "updated": 3, "removed": 2}
+    assert file_paths(db, user) == ["docs/a.txt", "new.txt", "photo.jpg"]
+    assert folder_sizes(db, user) == {"": 16, "docs": 10}
+
+
+def test_reconcile_tolerates_concurrent_writes(data_dir, db, user):
+    """Test that writes journaled between reconcile steps are neither duplicated nor lost"""
+    import os
+    from app.services.sync.change_journal import record_change
+    from app.services.sync.metadata_index import metadata_index
+
+    real_user_lock = metadata_index.user_lock
+    calls = []
+
+    def interleave(user_id):
+        calls.append(user_id)
+        # After the root folder, before "docs" is compared
+        if len(calls) == 2:
+            (data_dir / "docs" / "live.txt").write_bytes(b"l" * 7)
+            record_change(user, "create", str(data_dir / "docs" / "live.txt"))
+            os.remove(data_dir / "docs" / "old" / "b.md")
+            record_change(user, "delete", str(data_dir / "docs" / "old" / "b.md"))
+        return real_user_lock(user_id)
+
+    with patch.object(metadata_index, 'user_lock', side_effect=interleave):
+        metadata_index.reconcile(user)
+
+    assert metadata_index.is_ready(user.id)
+    assert file_paths(db, user) == ["docs/a.txt", "docs/live.txt", "photo.jpg"]
+    assert folder_sizes(db, user) == {"": 47, "docs": 17, "docs/old": 0}
+    assert metadata_index.reconcile(user) == {"added": 0, "updated": 0, "removed": 0}
+
+
+def test_temp_artifacts_are_not_indexed(data_dir, db, user):
+    """Test that unfinished uploads and syncs stay out of the index and the journal"""
+    from app.models.files import File
+    from app.models.sync_change import SyncChange
+    from app.services.sync.change_journal import record_change, record_changes
+    from app.services.sync.metadata_index import metadata_index
+
+    (data_dir / "docs" / "abc_parts").mkdir()
+    (data_dir / "docs" / "abc_parts" / "data").write_bytes(b"x" * 5)
+    (data_dir / "docs" / ".video.mp4.part").write_bytes(b"x" * 5)
+    (data_dir / "docs" / ".video.mp4.part.total").write_text("10")
+    (data_dir / f".photo.jpg.delta-{'0' * 32}").write_bytes(b"x" * 5)
+    metadata_index.reconcile(user, db)
+    assert file_paths(db, user) == ["docs/a.txt", "docs/old/b.md", "photo.jpg"]
+    assert "docs/abc_parts" not in folder_sizes(db, user)
+
+    # Writes to temp files are ignored
+    record_change(user, "create", str(data_dir / "docs" / ".video.mp4.part"))
+    assert file_paths(db, user) == ["docs/a.txt", "docs/old/b.md", "photo.jpg"]
+
+    # A row left by an older index goes away once the temp file is removed
+    db.add(File(user_id=user.id, path="docs/.video.mp4.part", filename=".video.mp4.part",
+                parent_path="docs", size=0, mtime=0, type="file"))
+    db.commit()
+    (data_dir / "docs" / ".video.mp4.part").rename(data_dir / "docs" / "video.mp4")
+    record_changes(user, [
+        {"action": "delete", "path": str(data_dir / "docs" / ".video.mp4.part")},
+        {"action": "create", "path": str(data_dir / "docs" / "video.mp4"), "size": 5},
+    ])
+    assert file_paths(db, user) == ["docs/a.txt", "docs/old/b.md", "docs/video.mp4", "photo.jpg"]
+    assert folder_sizes(db, user)["docs"] == 10 + 20 + 5
+
+    db.expire_all()
+    assert [(c.action, c.path) for c in db.query(SyncChange).order_by(SyncChange.id)] == [
+        ("create", "docs/video.mp4"),
+    ]
+
+
+def test_write_paths_update_index(data_dir, db, user):
+    """Test that journal writes keep rows and folder totals in sync"""
+    from app.services.sync.change_journal import record_change
+    from app.services.sync.metadata_index import metadata_index
+
+    metadata_index.reconcile(user, db)
+
+    (data_dir / "music" / "live").mkdir(parents=True)
+    (data_dir / "music" / "live" / "song.mp3").write_bytes(b"m" * 100)
+    record_change(user, "create", str(data_dir / "music" / "live" / "song.mp3"), db=db)
+    assert folder_sizes(db, user) == {"": 160, "docs": 30, "docs/old": 20, "music": 100, "music/live": 100}
+
+    (data_dir / "docs" / "a.txt").write_bytes(b"a" * 15)
+    record_change(user, "modify", str(data_dir / "docs" / "a.txt"), db=db)
+    assert folder_sizes(db, user)["docs"] == 35
+
+    (data_dir / "docs").rename(data_dir / "music" / "docs")
+    record_change(user, "rename", str(data_dir / "music" / "docs"), old_path=str(data_dir / "docs"), is_dir=True, db=db)
+    assert file_paths(db, user) == ["music/docs/a.txt", "music/docs/old/b.md", "music/live/song.mp3", "photo.jpg"]
+    assert folder_sizes(db, user) == {
+        "": 165, "music": 135, "music/live": 100, "music/docs": 35, "music/docs/old": 20,
+    }
+
+    (data_dir / "photo.jpg").rename(data_dir / "music" / "cover.jpg")
+    record_change(user, "rename", str(data_dir / "music" / "cover.jpg"), old_path=str(data_dir / "photo.jpg"), db=db)
+    assert folder_sizes(db, user)["music"] == 165
+
+    record_change(user, "delete", str(data_dir / "music" / "docs"), is_dir=True, db=db)
+    assert file_paths(db, user) == ["music/cover.jpg", "music/live/song.mp3"]
+    assert folder_sizes(db, user) == {"": 130, "music": 130, "music/live": 100}
+
+    # The index agrees with a fresh reconcile
+    assert metadata_index.reconcile(user, db)["removed"] == 0
+
+
+def test_failed_index_update_keeps_journal(data_dir, db, user):
+    """Test that an index failure only makes listings fall back to disk"""
+    from app.models.sync_change import SyncChange
+    from app.services.sync.change_journal import record_change
+    from app.services.sync.metadata_index import metadata_index
+
+    metadata_index.reconcile(user, db)
+    with patch.object(metadata_index, 'apply_changes', side_effect=RuntimeError("boom")):
+        record_change(user, "create", str(data_dir / "photo.jpg"), db=db)
+
+    assert db.query(SyncChange).count() == 1
+    assert not metadata_index.is_ready(user.id)
+
+
+def test_listings_served_from_index(data_dir, db, user):
+    """Test that get_folder and list-all answer from the index once ready"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.dependencies import get_current_user, get_db
+    from app.api.folder.get_folder import getfolderroute
+    from app.api.sync.sync_routes import syncrouter
+    from app.services.sync.metadata_index import metadata_index
+    from app.services.sync.tree_walker import iter_tree
+
+    app = FastAPI()
+    app.include_router(getfolderroute, prefix="/api/folder")
+    app.include_router(syncrouter, prefix="/api/sync")
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+
+    disk = sorted(iter_tree(str(data_dir), str(data_dir)), key=lambda e: e["path"])
+    metadata_index.reconcile(user, db)
+
+    listing = client.get("/api/sync/list-all").json()
+    assert sorted(listing["files"], key=lambda e: e["path"]) == disk
+    assert (listing["total_files"], listing["total_size"]) == (3, 60)
+
+    # A file the index has not seen yet only shows up after a reconcile
+    (data_dir / "docs" / "unseen.txt").write_text("x")
+    items = client.get("/api/folder/get_folder", params={"folder_path": "docs"}).json()["items"]
+    assert items == [
+        {"name": "old", "type": "folder"},
+        {"name": "a.txt", "type": "file", "size": 10, "modified": items[1]["modified"]},
+    ]
+
+    metadata_index.mark_stale(user.id)
+    items = client.get("/api/folder/get_folder", params={"folder_path": "docs"}).json()["items"]
+    assert sorted(item["name"] for item in items) == ["a.txt", "old", "unseen.txt"]
+
+
+def test_device_folders_are_journaled(tmp_path, data_dir, db, user):
+    """Test that registering and deleting a device with its files update the index"""
+    from app.api.devices.device_routes import delete_device, register_device
+    from app.models.sync_change import SyncChange
+    from app.schemas.device import DeviceRegister
+    from app.services.sync.metadata_index import metadata_index
+
+    metadata_index.reconcile(user, db)
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.api.devices.device_routes.config', mock_settings):
+        device = run_async(register_device(DeviceRegister(device_name="Laptop"), user=user, db=db))
+        assert (data_dir / device.folder_name).is_dir()
+        assert device.folder_name in folder_sizes(db, user)
+
+        (data_dir / device.folder_name / "x.txt").write_bytes(b"x" * 5)
+        metadata_index.reconcile(user, db)
+        run_async(delete_device(device.device_id, delete_files=True, user=user, db=db))
+
+    assert device.folder_name not in folder_sizes(db, user)
+    assert file_paths(db, user) == ["docs/a.txt", "docs/old/b.md", "photo.jpg"]
+    assert [(c.action, c.path, c.is_dir) for c in db.query(SyncChange).order_by(SyncChange.id)] == [
+        ("create", device.folder_name, True),
+        ("delete", device.folder_name, True),
+    ]
@@ -0,0 +1,161 @@
+"""
+Tests for HTTP Range support on file view and download
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def content():
+    return os.urandom(100_000)
+
+
+@pytest.fixture
+def data_dir(tmp_path, content):
+    """Create a user directory with a video and a binary file"""
+    data_dir = tmp_path / "data" / "test_user"
+    data_dir.mkdir(parents=True)
+    (data_dir / "clip.mp4").write_bytes(content)
+    (data_dir / "disk.img").write_bytes(content)
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.api.file.view_file.config', mock_settings), \
+         patch('app.api.file.download_file.config', mock_settings):
+        yield data_dir
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from app.api.file.view_file import view_router
+    from app.api.file.download_file import download_file_router
+    from app.api.dependencies import get_current_user
+
+    app = FastAPI()
+    app.include_router(view_router, prefix="/api/file")
+    app.include_router(download_file_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("url", ["/api/file/view/clip.mp4", "/api/file/download/disk.img"])
+def test_full_response_advertises_ranges(data_dir, client, content, url):
+    """Test a plain GET returns 200 with Accept-Ranges"""
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == content
+
+
+@pytest.mark.parametrize("url", ["/api/file/view/clip.mp4", "/api/file/download/disk.img"])
+@pytest.mark.parametrize("range_header,start,end", [
+    ("bytes=0-0", 0, 1),
+    ("bytes=1000-1999", 1000, 2000),
+    ("bytes=99000-", 99000, 100_000),
+    ("bytes=-500", 99_500, 100_000),
+    ("bytes=99990-200000", 99990, 100_000),
+    ("bytes=-200000", 0, 100_000),
+])
+def test_single_range(data_dir, client, content, url, range_header, start, end):
+    """Test single, open-ended, suffix and clamped ranges"""
+    response = client.get(url, headers={"Range": range_header})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end - 1}/{len(content)}"
+    assert response.headers["content-length"] == str(end - start)
+    assert response.content == content[start:end]
+
+
+def test_multiple_ranges(data_dir, client, content):
+    """Test a multi-range request returns a multipart/byteranges body"""
+    response = client.get(
+        "/api/file/download/disk.img",
+        headers={"Range": "bytes=0-9, 500-599, -10"},
+    )
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    body = response.content
+    parts = body.split(f"--{boundary}".encode())
+    assert parts[-1] == b"--\r\n"
+    payloads = []
+    for part in parts[1:-1]:
+        head, data = part.split(b"\r\n\r\n", 1)
+        assert b"Content-Range: bytes" in head
+        payloads.append(data[:-2] if data.endswith(b"\r\n") else data)
+
+    assert payloads == [content[0:10], content[500:600], content[-10:]]
+
+
+def test_overlapping_ranges_are_merged(data_dir, client, content):
+    """Test that overlapping ranges collapse into one 206 range"""
+    response = client.get("/api/file/download/disk.img", headers={"Range": "bytes=50-99, 0-59"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 0-99/{len(content)}"
+    assert response.content == content[:100]
+
+
+def test_unsatisfiable_range(data_dir, client, content):
+    """Test that a range past the end returns 416"""
+    response = client.get("/api/file/view/clip.mp4", headers={"Range": "bytes=100000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_malformed_range_is_ignored(data_dir, client, content):
+    """Test that a malformed Range header falls back to the whole file"""
+    for header in ["bytes=abc", "items=0-5", "bytes=10-5"]:
+        response = client.get("/api/file/download/disk.img", headers={"Range": header})
+        assert response.status_code == 200
+        assert response.content == content
+
+
+def test_if_range(data_dir, client, content):
+    """Test If-Range serves the range only while the validator matches"""
+    from app.services.sync.hash_utils import get_cached_file_hash
+
+    # The strong ETag is served once the hash pool has hashed the file
+    get_cached_file_hash(str(data_dir / "disk.img"))
+    etag = client.get("/api/file/download/disk.img").headers["etag"]
+    assert not etag.startswith("W/")
+
+    response = client.get(
+        "/api/file/download/disk.img",
+        headers={"Range": "bytes=0-99", "If-Range": etag},
+    )
+    assert response.status_code == 206
+    assert response.content == content[:100]
+
+    response = client.get(
+        "/api/file/download/disk.img",
+        headers={"Range": "bytes=0-99", "If-Range": '"stale"'},
+    )
+    assert response.status_code == 200
+    assert response.content == content
+
+    response = client.get(
+        "/api/file/download/disk.img",
+        headers={"Range": "bytes=0-99", "If-Range": "W/" + etag},
+    )
+    assert response.status_code == 200
+
+
+def test_ranged_media_exempt_from_view_size_limit(data_dir, client, content):
+    """Test that video players can seek in files over the inline size limit"""
+    with patch('app.api.file.view_file.MAX_VIEW_SIZE', 1000):
+        assert client.get("/api/file/view/clip.mp4").status_code == 413
+
+        response = client.get("/api/file/view/clip.mp4", headers={"Range": "bytes=50000-50099"})
+        assert response.status_code == 206
+        assert response.content == content[50000:50100]
+
+        # Only a usable range lifts the limit
+        assert client.get("/api/file/view/clip.mp4", headers={"Range": "lines=1-2"}).status_code == 413
@@ -0,0 +1,147 @@
+"""
+Tests for raw streaming PUT uploads
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Point storage at a temporary directory"""
+    data_dir = tmp_path / "data" / "test_user"
+    data_dir.mkdir(parents=True)
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+
+    with patch('app.api.file.raw_upload.config', mock_settings), \
+         patch('app.api.file.raw_upload.record_changes'):
+        yield data_dir
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from app.api.file.raw_upload import raw_upload_router
+    from app.api.dependencies import get_current_user, get_db
+
+    app = FastAPI()
+    app.include_router(raw_upload_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    app.dependency_overrides[get_db] = lambda: None
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_whole_file_upload(data_dir, client):
+    """Test uploading a whole file without Content-Range"""
+    content = os.urandom(5 * 1024 * 1024 + 3)
+    response = client.put("/api/file/raw/docs/report.bin", content=content)
+
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+    assert (data_dir / "docs" / "report.bin").read_bytes() == content
+    assert os.listdir(data_dir / "docs") == ["report.bin"]
+
+
+def test_ranged_upload_resume(data_dir, client):
+    """Test sending a file in ordered Content-Range pieces"""
+    content = os.urandom(3000)
+
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[:1000],
+        headers={"Content-Range": "bytes 0-999/3000"},
+    )
+    assert response.status_code == 202
+    assert response.headers["Range"] == "bytes=0-999"
+    assert not (data_dir / "video.mp4").exists()
+
+    # Out-of-order range is rejected with the received offset
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[2000:],
+        headers={"Content-Range": "bytes 2000-2999/3000"},
+    )
+    assert response.status_code == 409
+    assert response.headers["Range"] == "bytes=0-999"
+
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[1000:],
+        headers={"Content-Range": "bytes 1000-2999/3000"},
+    )
+    assert response.status_code == 200
+    assert (data_dir / "video.mp4").read_bytes() == content
+    assert os.listdir(data_dir) == ["video.mp4"]
+
+
+def test_ranged_upload_total_must_not_change(data_dir, client):
+    """Test that a piece declaring a different total than the first is rejected"""
+    content = os.urandom(3000)
+
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[:1000],
+        headers={"Content-Range": "bytes 0-999/3000"},
+    )
+    assert response.status_code == 202
+
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[1000:2000],
+        headers={"Content-Range": "bytes 1000-1999/2000"},
+    )
+    assert response.status_code == 409
+    assert response.headers["Range"] == "bytes=0-999"
+    assert not (data_dir / "video.mp4").exists()
+
+    response = client.put(
+        "/api/file/raw/video.mp4",
+        content=content[1000:],
+        headers={"Content-Range": "bytes 1000-2999/3000"},
+    )
+    assert response.status_code == 200
+    assert (data_dir / "video.mp4").read_bytes() == content
+
+
+def test_change_is_recorded_off_the_event_loop(data_dir, client):
+    """Test that journaling, which may wait on a reconcile, runs in a worker thread"""
+    import threading
+    from app.api.file import raw_upload
+
+    threads = []
+    raw_upload.record_changes.side_effect = lambda *args, **kwargs: threads.append(threading.current_thread())
+    loop_thread = client.portal.call(threading.current_thread)
+
+    response = client.put("/api/file/raw/a.txt", content=b"hello")
+    assert response.status_code == 200
+    assert len(threads) == 1 and threads[0] is not loop_thread
+
+
+def test_range_length_mismatch(data_dir, client):
+    """Test that a body longer than its Content-Range is rejected"""
+    response = client.put(
+        "/api/file/raw/a.txt",
+        content=b"0123456789",
+        headers={"Content-Range": "bytes 0-4/10"},
+    )
+    assert response.status_code == 400
+
+
+def test_invalid_content_range(data_dir, client):
+    """Test malformed and unsatisfiable Content-Range headers"""
+    response = client.put("/api/file/raw/a.txt", content=b"x", headers={"Content-Range": "bytes=0-0"})
+    assert response.status_code == 400
+
+    response = client.put("/api/file/raw/a.txt", content=b"x", headers={"Content-Range": "bytes 5-5/5"})
+    assert response.status_code == 416
+
+
+def test_path_traversal_denied(data_dir, client):
+    """Test that uploads cannot escape the user's directory"""
+    response = client.put("/api/file/raw/..%2F..%2Fevil.txt", content=b"x")
+    assert response.status_code == 403
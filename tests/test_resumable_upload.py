@@ -0,0 +1,179 @@
+"""
+Tests for resumable offset-based uploads (HEAD / PATCH on upload sessions)
+"""
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def env(tmp_path):
+    """Point storage and the session registry at a temporary directory"""
+    from app.services.upload.upload_sessions import UploadSessionRegistry
+
+    (tmp_path / "data" / "test_user").mkdir(parents=True)
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    registry = UploadSessionRegistry(str(tmp_path / "sessions"))
+
+    with patch('app.api.file.upload_session.config', mock_settings), \
+         patch('app.api.file.upload_session.record_changes') as record, \
+         patch('app.api.file.upload_session.upload_sessions', registry):
+        yield tmp_path, registry, record
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from app.api.file.upload_session import upload_session_router
+    from app.api.dependencies import get_current_user, get_db
+
+    app = FastAPI()
+    app.include_router(upload_session_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    app.dependency_overrides[get_db] = lambda: None
+
+    with TestClient(app) as client:
+        yield client
+
+
+def create_session(client, total_size, chunk_size):
+    response = client.post("/api/file/upload-session", json={
+        "filename": "movie.bin",
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+    })
+    assert response.status_code == 200
+    return response.json()["upload_id"]
+
+
+def head_offset(client, upload_id):
+    response = client.head(f"/api/file/upload-session/{upload_id}")
+    assert response.status_code == 200
+    return int(response.headers["Upload-Offset"])
+
+
+def test_patch_resume_after_restart(env, client):
+    """Test that a partial PATCH upload resumes from HEAD after a restart"""
+    tmp_path, registry, record = env
+    content = os.urandom(10000)
+    upload_id = create_session(client, len(content), 4096)
+    assert head_offset(client, upload_id) == 0
+
+    # Stops in the middle of the second chunk
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=content[:5000],
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "5000"
+
+    # Simulate a restart: forget all in-memory sessions
+    registry._sessions.clear()
+    offset = head_offset(client, upload_id)
+    assert offset == 5000
+
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=content[offset:],
+        headers={"Upload-Offset": str(offset)},
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == str(len(content))
+
+    final_path = tmp_path / "data" / "test_user" / "movie.bin"
+    assert final_path.read_bytes() == content
+    assert not (tmp_path / "data" / "test_user" / f"{upload_id}_parts").exists()
+    assert not (tmp_path / "sessions" / f"{upload_id}.json").exists()
+    record.assert_called_once()
+
+
+def test_patch_offset_mismatch(env, client):
+    """Test that PATCH at a stale offset is rejected with the current offset"""
+    content = os.urandom(3000)
+    upload_id = create_session(client, len(content), 1024)
+    client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=content[:1500],
+        headers={"Upload-Offset": "0"},
+    )
+
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=content[1000:],
+        headers={"Upload-Offset": "1000"},
+    )
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "1500"
+
+
+def test_patch_rejects_data_past_length(env, client):
+    """Test that PATCH cannot write beyond Upload-Length"""
+    upload_id = create_session(client, 100, 64)
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=b"x" * 101,
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 400
+
+
+def test_patch_rejected_while_another_is_writing(env, client):
+    """Test that a second writer gets 423 and the upload is free again afterwards"""
+    tmp_path, registry, record = env
+    upload_id = create_session(client, 100, 64)
+    session = registry.get(upload_id)
+
+    session.patching = True
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=b"x" * 10,
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 423
+    assert response.headers["Upload-Offset"] == "0"
+    session.patching = False
+
+    # A failed PATCH releases the upload too
+    client.patch(f"/api/file/upload-session/{upload_id}", content=b"x" * 10, headers={"Upload-Offset": "5"})
+    assert not session.patching
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=b"x" * 10,
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "10"
+
+
+def test_offset_follows_chunk_puts(env, client):
+    """Test that HEAD reports the contiguous prefix of chunks sent with PUT"""
+    tmp_path, registry, record = env
+    chunk_size = 1024
+    content = os.urandom(chunk_size * 4)
+    upload_id = create_session(client, len(content), chunk_size)
+
+    for index in (0, 2):
+        client.put(
+            f"/api/file/upload-session/{upload_id}/chunks/{index}",
+            content=content[index * chunk_size:(index + 1) * chunk_size],
+        )
+    assert head_offset(client, upload_id) == chunk_size
+
+    # Filling the gap with PATCH completes chunk 1; chunk 2 is already there
+    response = client.patch(
+        f"/api/file/upload-session/{upload_id}",
+        content=content[chunk_size:2 * chunk_size],
+        headers={"Upload-Offset": str(chunk_size)},
+    )
+    assert response.headers["Upload-Offset"] == str(2 * chunk_size)
+    assert head_offset(client, upload_id) == 3 * chunk_size
+
+
+def test_head_unknown_session(env, client):
+    """Test HEAD on an unknown upload id"""
+    response = client.head("/api/file/upload-session/" + "a" * 32)
+    assert response.status_code == 404
@@ -6,6 +6,7 @@ import tempfile
 from unittest.mock import Mock, patch
 import pytest
 from datetime import datetime, timezone, timedelta
+from tests.conftest import run_async
 
 
 @pytest.fixture(autouse=True)
@@ -25,26 +26,20 @@ def mock_config():
 
 
 @pytest.fixture
-def mock_user():
-    """Create a mock user"""
-    user = Mock()
-    user.root_foldername = "test_user"
-    return user
+def client(mock_user):
+    """Create a test client for the sync routes with authentication overridden"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.sync.sync_routes import syncrouter
+    from app.api.dependencies import get_current_user, get_db
 
+    app = FastAPI()
+    app.include_router(syncrouter, prefix="/api/sync")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    app.dependency_overrides[get_db] = lambda: None
 
-@pytest.fixture
-def test_dir(tmp_path, mock_config):
-    """Create a temporary test directory structure"""
-    data_dir = tmp_path / "data" / "test_user"
-    data_dir.mkdir(parents=True)
-    mock_config.DIR_LOCATION = str(tmp_path)
-    return tmp_path, data_dir
-
-
-def run_async(coro):
-    """Helper to run async functions in tests"""
-    import asyncio
-    return asyncio.run(coro)
+    with TestClient(app) as client:
+        yield client
 
 
 def test_get_file_hash_success(test_dir, mock_user):
@@ -59,7 +54,7 @@ def test_get_file_hash_success(test_dir, mock_user):
     with open(test_file, 'wb') as f:
         f.write(test_content)
     
-    response = run_async(get_file_hash("test.txt", mock_user))
+    response = run_async(get_file_hash("test.txt", device_id=None, user=mock_user, db=None))
     
     assert response.file_path == "test.txt"
     assert response.exists is True
@@ -76,7 +71,7 @@ def test_get_file_hash_not_found(test_dir, mock_user):
     tmp_path, data_dir = test_dir
     
     with pytest.raises(HTTPException) as exc_info:
-        run_async(get_file_hash("nonexistent.txt", mock_user))
+        run_async(get_file_hash("nonexistent.txt", device_id=None, user=mock_user, db=None))
     
     assert exc_info.value.status_code == 404
 
@@ -90,7 +85,7 @@ def test_get_file_hash_path_traversal(test_dir, mock_user):
     
     # Try to access file outside user directory
     with pytest.raises(HTTPException) as exc_info:
-        run_async(get_file_hash("../../../etc/passwd", mock_user))
+        run_async(get_file_hash("../../../etc/passwd", device_id=None, user=mock_user, db=None))
     
     assert exc_info.value.status_code == 403
     assert "Access denied" in str(exc_info.value.detail)
@@ -208,9 +203,68 @@ def test_batch_sync_check_local_newer(test_dir, mock_user):
     assert response.results[0].status == "local_newer"
 
 
-def test_list_all_files(test_dir, mock_user):
+def test_batch_sync_check_preserves_order(test_dir, mock_user):
+    """Test that parallel checks return results in request order"""
+    from app.api.sync.sync_routes import batch_sync_check, BatchSyncCheckRequest, FileCheckItem
+    
+    tmp_path, data_dir = test_dir
+    
+    names = [f"file_{i}.txt" for i in range(40)]
+    for name in names[::2]:
+        with open(data_dir / name, 'w') as f:
+            f.write(name)
+    
+    request = BatchSyncCheckRequest(files=[
+        FileCheckItem(
+            path=name,
+            local_hash="abc123",
+            local_modified=datetime.now(timezone.utc).isoformat()
+        )
+        for name in names
+    ])
+    
+    response = run_async(batch_sync_check(request, mock_user))
+    
+    assert [r.path for r in response.results] == names
+    assert [r.status for r in response.results][1::2] == ["local_only"] * 20
+
+
+def test_batch_sync_check_ndjson_stream(test_dir, mock_user):
+    """Test streaming batch sync results as NDJSON"""
+    import json
+    from app.api.sync.sync_routes import batch_sync_check, BatchSyncCheckRequest, FileCheckItem
+    from app.services.sync.hash_utils import calculate_file_hash
+    
+    tmp_path, data_dir = test_dir
+    
+    test_file = data_dir / "test.txt"
+    with open(test_file, 'wb') as f:
+        f.write(b"Hello, World!")
+    (data_dir / "folder").mkdir()
+    
+    modified = datetime.fromtimestamp(os.stat(test_file).st_mtime, tz=timezone.utc).isoformat()
+    request = BatchSyncCheckRequest(files=[
+        FileCheckItem(path="test.txt", local_hash=calculate_file_hash(str(test_file)), local_modified=modified),
+        FileCheckItem(path="missing.txt", local_hash="abc123", local_modified=modified),
+        FileCheckItem(path="folder", local_hash="abc123", local_modified=modified),
+    ])
+    
+    async def collect():
+        response = await batch_sync_check(request, mock_user, None, "ndjson")
+        assert response.media_type == "application/x-ndjson"
+        return [line async for line in response.body_iterator]
+    
+    lines = run_async(collect())
+    results = {r["path"]: r for r in map(json.loads, lines)}
+    
+    # Directories are skipped, same as the JSON response
+    assert set(results) == {"test.txt", "missing.txt"}
+    assert results["test.txt"]["status"] == "in_sync"
+    assert results["missing.txt"]["status"] == "local_only"
+
+
+def test_list_all_files(test_dir, client):
     """Test listing all files"""
-    from app.api.sync.sync_routes import list_all_files
     
     tmp_path, data_dir = test_dir
     
@@ -223,21 +277,20 @@ def test_list_all_files(test_dir, mock_user):
     with open(data_dir / "subfolder" / "file3.txt", 'w') as f:
         f.write("File 3")
     
-    response = run_async(list_all_files("", mock_user))
+    response = client.get("/api/sync/list-all").json()
     
     # Should have 1 folder and 3 files
-    assert response.total_files == 3
-    assert len(response.files) == 4  # 1 folder + 3 files
+    assert response["total_files"] == 3
+    assert len(response["files"]) == 4  # 1 folder + 3 files
     
     # Check that we have both files and folders
-    file_types = [item.type for item in response.files]
+    file_types = [item["type"] for item in response["files"]]
     assert "file" in file_types
     assert "folder" in file_types
 
 
-def test_list_all_files_specific_folder(test_dir, mock_user):
+def test_list_all_files_specific_folder(test_dir, client):
     """Test listing files in a specific folder"""
-    from app.api.sync.sync_routes import list_all_files
     
     tmp_path, data_dir = test_dir
     
@@ -248,11 +301,41 @@ def test_list_all_files_specific_folder(test_dir, mock_user):
     with open(data_dir / "subfolder" / "file2.txt", 'w') as f:
         f.write("File 2")
     
-    response = run_async(list_all_files("subfolder", mock_user))
+    response = client.get("/api/sync/list-all", params={"folder_path": "subfolder"}).json()
     
     # Should only have 1 file in subfolder
-    assert response.total_files == 1
-    assert len(response.files) == 1
+    assert response["total_files"] == 1
+    assert len(response["files"]) == 1
+
+
+def test_list_all_files_ndjson_stream(test_dir, client):
+    """Test streaming the file list as NDJSON with a summary trailer"""
+    import json
+    
+    tmp_path, data_dir = test_dir
+    
+    (data_dir / "subfolder" / "nested").mkdir(parents=True)
+    with open(data_dir / "file1.txt", 'w') as f:
+        f.write("File 1")
+    with open(data_dir / "subfolder" / "nested" / "file2.txt", 'w') as f:
+        f.write("File 22")
+    
+    response = client.get("/api/sync/list-all", params={"format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    
+    # Summary trailer comes last
+    assert records[-1] == {"type": "summary", "total_files": 2, "total_size": 13}
+    
+    entries = {r["path"]: r for r in records[:-1]}
+    assert set(entries) == {
+        "file1.txt",
+        "subfolder",
+        os.path.join("subfolder", "nested"),
+        os.path.join("subfolder", "nested", "file2.txt"),
+    }
+    assert entries["subfolder"]["type"] == "folder"
+    assert entries["file1.txt"]["hash"] is not None
 
 
 def test_delete_file_sync_success(test_dir, mock_user):
@@ -268,7 +351,7 @@ def test_delete_file_sync_success(test_dir, mock_user):
     
     assert test_file.exists()
     
-    response = run_async(delete_file_sync("to_delete.txt", mock_user))
+    response = run_async(delete_file_sync("to_delete.txt", device_id=None, user=mock_user, db=None))
     
     assert response.success is True
     assert response.path == "to_delete.txt"
@@ -283,7 +366,7 @@ def test_delete_file_sync_not_found(test_dir, mock_user):
     tmp_path, data_dir = test_dir
     
     with pytest.raises(HTTPException) as exc_info:
-        run_async(delete_file_sync("nonexistent.txt", mock_user))
+        run_async(delete_file_sync("nonexistent.txt", device_id=None, user=mock_user, db=None))
     
     assert exc_info.value.status_code == 404
 
@@ -297,7 +380,7 @@ def test_delete_file_sync_path_traversal(test_dir, mock_user):
     
     # Try to delete file outside user directory
     with pytest.raises(HTTPException) as exc_info:
-        run_async(delete_file_sync("../../../etc/passwd", mock_user))
+        run_async(delete_file_sync("../../../etc/passwd", device_id=None, user=mock_user, db=None))
     
     assert exc_info.value.status_code == 403
 
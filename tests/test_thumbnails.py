@@ -0,0 +1,269 @@
+"""
+Tests for thumbnail rendering, caching and the thumbnail endpoint
+"""
+import io
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Create a user directory with a few images"""
+    data_dir = tmp_path / "data" / "test_user"
+    (data_dir / "photos").mkdir(parents=True)
+    Image.new("RGB", (1200, 800), (200, 30, 30)).save(data_dir / "photos" / "wide.jpg")
+    Image.new("RGBA", (300, 600), (0, 0, 255, 128)).save(data_dir / "photos" / "tall.png")
+    (data_dir / "photos" / "broken.jpg").write_bytes(b"not an image")
+    (data_dir / "notes.txt").write_text("hello")
+    return data_dir
+
+
+@pytest.fixture
+def service(tmp_path, data_dir):
+    """Point the endpoint at a thumbnail service caching under tmp_path"""
+    from app.services.media.thumbnails import ThumbnailService
+
+    service = ThumbnailService(cache_dir=str(tmp_path / "cache" / "thumbnails"))
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(tmp_path)
+    with patch('app.services.folder.paths.config', mock_settings), \
+         patch('app.api.file.thumbnail.thumbnail_service', service):
+        yield service
+
+
+@pytest.fixture
+def client(mock_user, service):
+    """Create a test client with authentication overridden"""
+    from app.api.file.thumbnail import thumbnail_router
+    from app.api.dependencies import get_current_user
+
+    app = FastAPI()
+    app.include_router(thumbnail_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_thumbnail_fits_requested_size(client):
+    """Test that thumbnails keep the aspect ratio inside the size box"""
+    response = client.get("/api/file/thumb/256/photos/wide.jpg?format=jpeg")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+
+    image = Image.open(io.BytesIO(response.content))
+    assert image.format == "JPEG"
+    assert image.size == (256, 171)
+
+
+def test_format_is_negotiated_from_accept(client):
+    """Test that WebP is served to clients that accept it"""
+    response = client.get("/api/file/thumb/128/photos/tall.png", headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    assert Image.open(io.BytesIO(response.content)).size == (64, 128)
+
+    response = client.get("/api/file/thumb/128/photos/tall.png")
+    assert response.headers["content-type"] == "image/jpeg"
+
+
+def test_thumbnails_are_cached_by_content_hash(client, service, data_dir):
+    """Test that every size and format is rendered once and keyed by content hash"""
+    from app.services.sync.hash_utils import calculate_file_hash
+    from app.services.media.thumbnails import THUMBNAIL_SIZES
+    from app.services.media.imaging import IMAGE_FORMATS
+
+    response = client.get("/api/file/thumb/512/photos/wide.jpg")
+    content_hash = calculate_file_hash(str(data_dir / "photos" / "wide.jpg"))
+    assert response.headers["x-content-hash"] == content_hash
+
+    for size in THUMBNAIL_SIZES:
+        for fmt in IMAGE_FORMATS:
+            with open(service.thumbnail_path(content_hash, size, fmt), "rb") as f:
+                assert f.read()
+
+    with patch('app.services.media.thumbnails.submit_media_task') as submit:
+        assert client.get("/api/file/thumb/128/photos/wide.jpg").status_code == 200
+        submit.assert_not_called()
+
+
+def test_versioned_url_is_immutable(client):
+    """Test that only URLs carrying the current content hash are cached forever"""
+    response = client.get("/api/file/thumb/128/photos/wide.jpg")
+    assert "immutable" not in response.headers["cache-control"]
+    content_hash = response.headers["x-content-hash"]
+
+    response = client.get(f"/api/file/thumb/128/photos/wide.jpg?v={content_hash}")
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+    response = client.get(
+        "/api/file/thumb/128/photos/wide.jpg", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_concurrent_requests_share_one_render(service, data_dir):
+    """Test that rendering the same image twice waits on the same job"""
+    from concurrent.futures import Future
+
+    pending = Future()
+    with patch('app.services.media.thumbnails.submit_media_task', return_value=pending) as submit:
+        first = service.ensure(str(data_dir / "photos" / "wide.jpg"), "a" * 32)
+        second = service.ensure(str(data_dir / "photos" / "wide.jpg"), "a" * 32)
+
+    assert first is second
+    submit.assert_called_once()
+    pending.set_result(None)
+    assert service._inflight == {}
+
+
+def test_only_decode_failures_are_remembered(service, data_dir):
+    """Test that undecodable images are not retried but transient errors are"""
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from app.services.media.imaging import ImageDecodeError
+    from app.services.media.thumbnails import ThumbnailError
+
+    def failed(error):
+        future = Future()
+        future.set_exception(error)
+        return future
+
+    source = str(data_dir / "photos" / "wide.jpg")
+    with patch('app.services.media.thumbnails.submit_media_task',
+               side_effect=[failed(BrokenProcessPool()), failed(ImageDecodeError("bad"))]) as submit:
+        with pytest.raises(BrokenProcessPool):
+            service.ensure(source, "a" * 32).result()
+        with pytest.raises(ImageDecodeError):
+            service.ensure(source, "a" * 32).result()
+        with pytest.raises(ThumbnailError):
+            service.ensure(source, "a" * 32).result()
+
+    assert submit.call_count == 2
+
+
+def test_remembered_failures_are_bounded(service, data_dir):
+    """Test that the least recently seen undecodable hashes are forgotten"""
+    from concurrent.futures import Future
+    from app.services.media.imaging import ImageDecodeError
+
+    def failed(*args):
+        future = Future()
+        future.set_exception(ImageDecodeError("bad"))
+        return future
+
+    source = str(data_dir / "photos" / "wide.jpg")
+    with patch('app.services.media.thumbnails.MAX_FAILED_HASHES', 2), \
+         patch('app.services.media.thumbnails.submit_media_task', side_effect=failed):
+        for content_hash in ("a" * 32, "b" * 32, "a" * 32, "c" * 32):
+            service.ensure(source, content_hash)
+
+    assert list(service._failed) == ["a" * 32, "c" * 32]
+
+
+@pytest.mark.parametrize("url,status", [
+    ("/api/file/thumb/100/photos/wide.jpg", 400),
+    ("/api/file/thumb/128/notes.txt", 415),
+    ("/api/file/thumb/128/photos/missing.jpg", 404),
+    ("/api/file/thumb/128/photos/broken.jpg", 422),
+])
+def test_thumbnail_errors(client, url, status):
+    """Test rejected sizes, paths and undecodable images"""
+    assert client.get(url).status_code == status
+
+
+def test_upload_schedules_background_render(service, data_dir):
+    """Test that scheduling renders thumbnails without a request"""
+    from app.services.sync.hash_utils import calculate_file_hash
+
+    source = str(data_dir / "photos" / "tall.png")
+    with patch('app.services.media.thumbnails.hash_executor') as executor:
+        service.schedule(str(data_dir / "notes.txt"))
+        executor.submit.assert_not_called()
+        service.schedule(source)
+        executor.submit.assert_called_once()
+
+    service._render_in_background(source)
+    content_hash = calculate_file_hash(source)
+    service._inflight[content_hash].result(timeout=60)
+    with open(service.thumbnail_path(content_hash, 256, "webp"), "rb") as f:
+        assert Image.open(f).size == (128, 256)
+
+
+def read_pack(body: bytes) -> list:
+    """Decode a length-prefixed thumbnail pack"""
+    import json
+    import struct
+
+    entries, position = [], 0
+    while position < len(body):
+        (header_length,) = struct.unpack_from(">I", body, position)
+        position += 4
+        info = json.loads(body[position:position + header_length])
+        position += header_length
+        (data_length,) = struct.unpack_from(">I", body, position)
+        position += 4
+        entries.append((info, body[position:position + data_length]))
+        position += data_length
+    return entries
+
+
+def test_batch_binary_pack(client):
+    """Test that a batch returns every thumbnail and per-path errors"""
+    response = client.post("/api/file/thumbs", json={
+        "paths": ["photos/wide.jpg", "photos/tall.png", "notes.txt", "photos/missing.jpg"],
+        "size": 128,
+        "format": "webp",
+        "pack": "binary",
+    })
+    assert response.status_code == 200
+
+    entries = {info["path"]: (info, data) for info, data in read_pack(response.content)}
+    assert set(entries) == {"photos/wide.jpg", "photos/tall.png", "notes.txt", "photos/missing.jpg"}
+
+    info, data = entries["photos/wide.jpg"]
+    assert info["status"] == 200
+    assert info["content_type"] == "image/webp"
+    assert Image.open(io.BytesIO(data)).size == (128, 86)
+    assert entries["notes.txt"][0]["status"] == 415
+    assert entries["photos/missing.jpg"] == ({"path": "photos/missing.jpg", "status": 404, "detail": "File not found"}, b"")
+
+
+def test_batch_multipart(client):
+    """Test that the multipart batch parses as one part per path"""
+    from email.parser import BytesParser
+    from email.policy import HTTP
+
+    response = client.post("/api/file/thumbs", json={
+        "paths": ["photos/wide.jpg", "photos/broken.jpg"],
+        "size": 256,
+    })
+    assert response.status_code == 200
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/mixed; boundary=")
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + response.content
+    )
+    parts = {part["Content-Location"]: part for part in message.iter_parts()}
+    assert parts["photos/wide.jpg"]["X-Status"] == "200"
+    assert parts["photos/wide.jpg"].get_content_type() == "image/jpeg"
+    image = Image.open(io.BytesIO(parts["photos/wide.jpg"].get_payload(decode=True)))
+    assert image.size == (256, 171)
+    assert parts["photos/broken.jpg"]["X-Status"] == "422"
+
+
+def test_batch_rejects_bad_requests(client):
+    """Test batch size and thumbnail size limits"""
+    from app.api.file.thumbnail import MAX_BATCH_THUMBNAILS
+
+    response = client.post("/api/file/thumbs", json={"paths": ["photos/wide.jpg"], "size": 100})
+    assert response.status_code == 400
+    response = client.post("/api/file/thumbs", json={
+        "paths": ["photos/wide.jpg"] * (MAX_BATCH_THUMBNAILS + 1), "size": 128,
+    })
+    assert response.status_code == 422
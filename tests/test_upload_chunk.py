@@ -0,0 +1,124 @@
+"""
+Tests for chunked uploads assembled in place
+"""
+import io
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import UploadFile
+from tests.conftest import run_async
+
+
+@pytest.fixture(autouse=True)
+def mock_config():
+    """Mock the config settings before any imports"""
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = "/tmp/test"
+
+    with patch('app.api.file.upload_file.config', mock_settings):
+        with patch('app.api.file.upload_file.record_changes'):
+            yield mock_settings
+
+
+def send_chunk(user, file_id, index, total, data, **kwargs):
+    from app.api.file.upload_file import upload_chunk
+
+    upload = UploadFile(file=io.BytesIO(data), filename="video.mp4", size=len(data))
+    return run_async(upload_chunk(
+        user=user,
+        db=None,
+        file_id=file_id,
+        chunk_index=index,
+        total_chunks=total,
+        file=upload,
+        folder_path="root",
+        device_id=None,
+        chunk_size=kwargs.get("chunk_size"),
+        total_size=kwargs.get("total_size"),
+    ))
+
+
+def test_chunks_out_of_order(test_dir, mock_user):
+    """Test that chunks sent in any order assemble into the right file"""
+    tmp_path, data_dir = test_dir
+    content = os.urandom(10 * 1024 + 123)
+    chunk_size = 1024
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    order = [3, 0, 10, 7, 1, 2, 9, 4, 5, 8, 6]
+
+    for n, index in enumerate(order):
+        response = send_chunk(
+            mock_user, "upload1", index, len(chunks), chunks[index],
+            chunk_size=chunk_size, total_size=len(content),
+        )
+        # Nothing is visible until the last chunk lands
+        assert (data_dir / "video.mp4").exists() == (n == len(order) - 1)
+
+    assert b'"Upload complete"' in response.body
+    assert (data_dir / "video.mp4").read_bytes() == content
+    assert not (data_dir / "upload1_parts").exists()
+
+
+def test_chunk_size_inferred_from_first_chunk(test_dir, mock_user):
+    """Test legacy clients that do not send chunk_size"""
+    tmp_path, data_dir = test_dir
+    content = b"a" * 100 + b"b" * 100 + b"c" * 50
+
+    send_chunk(mock_user, "upload2", 0, 3, content[:100])
+    send_chunk(mock_user, "upload2", 1, 3, content[100:200])
+    send_chunk(mock_user, "upload2", 2, 3, content[200:])
+
+    assert (data_dir / "video.mp4").read_bytes() == content
+
+
+def test_last_chunk_first_requires_chunk_size(test_dir, mock_user):
+    """Test that the offset of a leading last chunk cannot be guessed"""
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as exc_info:
+        send_chunk(mock_user, "upload3", 2, 3, b"tail")
+
+    assert exc_info.value.status_code == 400
+
+
+def test_wrong_chunk_length_rejected(test_dir, mock_user):
+    """Test that a short middle chunk is refused instead of leaving a hole"""
+    from fastapi import HTTPException
+
+    send_chunk(mock_user, "upload4", 0, 3, b"x" * 100, chunk_size=100)
+
+    with pytest.raises(HTTPException) as exc_info:
+        send_chunk(mock_user, "upload4", 1, 3, b"x" * 60, chunk_size=100)
+
+    assert exc_info.value.status_code == 400
+
+
+def test_chunk_racing_completion_gets_conflict(test_dir, mock_user):
+    """Test that a chunk whose data file was finalized meanwhile gets 409"""
+    from fastapi import HTTPException
+
+    send_chunk(mock_user, "upload5", 0, 2, b"x" * 100, chunk_size=100)
+
+    with patch('app.services.upload.chunk_assembler.ChunkedFile.write_chunk', side_effect=FileNotFoundError):
+        with pytest.raises(HTTPException) as exc_info:
+            send_chunk(mock_user, "upload5", 1, 2, b"y" * 10, chunk_size=100)
+
+    assert exc_info.value.status_code == 409
+
+
+def test_abandoned_upload_locks_are_pruned(tmp_path):
+    """Test that cleanup drops path locks of uploads that never completed"""
+    import time
+    from app.services.upload.upload_sessions import UploadSessionRegistry
+
+    registry = UploadSessionRegistry(str(tmp_path / "sessions"))
+    registry.path_lock("abandoned")
+    busy = registry.path_lock("busy")
+    registry.path_lock("recent")
+    for key in ("abandoned", "busy"):
+        registry._path_lock_used[key] = time.time() - 7200
+
+    with busy:
+        registry.cleanup_expired(max_age_seconds=3600)
+
+    assert set(registry._path_locks) == {"busy", "recent"}
@@ -0,0 +1,113 @@
+"""
+Tests for upload sessions with parallel chunk uploads
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(autouse=True)
+def mock_config():
+    """Mock the config settings before any imports"""
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = "/tmp/test"
+
+    with patch('app.api.file.upload_session.config', mock_settings):
+        with patch('app.api.file.upload_session.record_changes'):
+            yield mock_settings
+
+
+@pytest.fixture
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from app.api.file.upload_session import upload_session_router
+    from app.api.dependencies import get_current_user, get_db
+
+    app = FastAPI()
+    app.include_router(upload_session_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    app.dependency_overrides[get_db] = lambda: None
+
+    with TestClient(app) as client:
+        yield client
+
+
+def create_session(client, total_size, chunk_size, **kwargs):
+    response = client.post("/api/file/upload-session", json={
+        "filename": "archive.bin",
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        **kwargs,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_parallel_chunks_and_finalize(test_dir, client):
+    """Test sending chunks 8-way in parallel then finalizing"""
+    tmp_path, data_dir = test_dir
+    chunk_size = 4096
+    content = os.urandom(chunk_size * 31 + 17)
+    session = create_session(client, len(content), chunk_size)
+    upload_id = session["upload_id"]
+    assert session["total_chunks"] == 32
+
+    def send(index):
+        data = content[index * chunk_size:(index + 1) * chunk_size]
+        return client.put(f"/api/file/upload-session/{upload_id}/chunks/{index}", content=data)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(send, reversed(range(32))))
+    assert all(r.status_code == 200 for r in responses)
+
+    status = client.get(f"/api/file/upload-session/{upload_id}").json()
+    assert status["received_chunks"] == list(range(32))
+
+    response = client.post(f"/api/file/upload-session/{upload_id}/finalize")
+    assert response.status_code == 200
+    assert (data_dir / "archive.bin").read_bytes() == content
+    assert not (data_dir / f"{upload_id}_parts").exists()
+
+    # The session is gone once finalized
+    response = client.put(f"/api/file/upload-session/{upload_id}/chunks/0", content=b"x")
+    assert response.status_code == 404
+
+
+def test_finalize_incomplete_upload(test_dir, client):
+    """Test that finalizing reports missing chunks"""
+    session = create_session(client, 300, 100)
+    upload_id = session["upload_id"]
+    client.put(f"/api/file/upload-session/{upload_id}/chunks/1", content=b"y" * 100)
+
+    response = client.post(f"/api/file/upload-session/{upload_id}/finalize")
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing_chunks"] == [0, 2]
+
+
+def test_wrong_chunk_length(test_dir, client):
+    """Test that chunks must match the session layout"""
+    session = create_session(client, 250, 100)
+    upload_id = session["upload_id"]
+
+    too_long = client.put(f"/api/file/upload-session/{upload_id}/chunks/0", content=b"z" * 101)
+    short_last = client.put(f"/api/file/upload-session/{upload_id}/chunks/2", content=b"z" * 10)
+    exact_last = client.put(f"/api/file/upload-session/{upload_id}/chunks/2", content=b"z" * 50)
+
+    assert too_long.status_code == 400
+    assert short_last.status_code == 400
+    assert exact_last.status_code == 200
+
+
+def test_session_target_outside_user_dir(test_dir, client):
+    """Test path traversal prevention on session creation"""
+    response = client.post("/api/file/upload-session", json={
+        "filename": "evil.bin",
+        "total_size": 1,
+        "folder_path": "../../..",
+    })
+
+    assert response.status_code == 403
@@ -23,32 +23,24 @@ def mock_config():
 
 
 @pytest.fixture
-def mock_user():
-    """Create a mock user"""
-    user = Mock()
-    user.root_foldername = "test_user"
-    return user
+def client(mock_user):
+    """Create a test client with authentication overridden"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.file.view_file import view_router
+    from app.api.dependencies import get_current_user
 
+    app = FastAPI()
+    app.include_router(view_router, prefix="/api/file")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
 
-@pytest.fixture
-def test_dir(tmp_path, mock_config):
-    """Create a temporary test directory structure"""
-    data_dir = tmp_path / "data" / "test_user"
-    data_dir.mkdir(parents=True)
-    mock_config.DIR_LOCATION = str(tmp_path)
-    return tmp_path, data_dir
-
-
-def run_async(coro):
-    """Helper to run async functions in tests"""
-    import asyncio
-    return asyncio.run(coro)
+    with TestClient(app) as client:
+        yield client
 
 
-def test_file_too_large(test_dir, mock_user):
+def test_file_too_large(test_dir, client):
     """Test that files over 30MB return appropriate error"""
-    from app.api.file.view_file import view_file, MAX_VIEW_SIZE
-    from fastapi import HTTPException
+    from app.api.file.view_file import MAX_VIEW_SIZE
     
     tmp_path, data_dir = test_dir
     
@@ -58,14 +50,13 @@ def test_file_too_large(test_dir, mock_user):
     with open(large_file, 'wb') as f:
         f.write(b'0' * (MAX_VIEW_SIZE + 1024 * 1024))  # 1MB over limit
     
-    with pytest.raises(HTTPException) as exc_info:
-        run_async(view_file("large_video.mp4", mock_user))
+    response = client.get("/api/file/view/large_video.mp4")
     
     # Check status code
-    assert exc_info.value.status_code == 413
+    assert response.status_code == 413
     
     # Check response details
-    detail = exc_info.value.detail
+    detail = response.json()["detail"]
     assert detail["error"] == "file_too_large"
     assert "too large for inline viewing" in detail["message"]
     assert detail["file_size"] > MAX_VIEW_SIZE
@@ -74,10 +65,8 @@ def test_file_too_large(test_dir, mock_user):
     assert detail["filename"] == "large_video.mp4"
 
 
-def test_unsupported_file_type(test_dir, mock_user):
+def test_unsupported_file_type(test_dir, client):
     """Test that unsupported file types return appropriate error"""
-    from app.api.file.view_file import view_file
-    from fastapi import HTTPException
     
     tmp_path, data_dir = test_dir
     
@@ -86,14 +75,13 @@ def test_unsupported_file_type(test_dir, mock_user):
     with open(exe_file, 'wb') as f:
         f.write(b'MZ')  # DOS header signature
     
-    with pytest.raises(HTTPException) as exc_info:
-        run_async(view_file("installer.exe", mock_user))
+    response = client.get("/api/file/view/installer.exe")
     
     # Check status code
-    assert exc_info.value.status_code == 415
+    assert response.status_code == 415
     
     # Check response details
-    detail = exc_info.value.detail
+    detail = response.json()["detail"]
     assert detail["error"] == "unsupported_file_type"
     assert "cannot be viewed in browser" in detail["message"]
     assert detail["file_extension"] == ".exe"
@@ -101,9 +89,8 @@ def test_unsupported_file_type(test_dir, mock_user):
     assert detail["filename"] == "installer.exe"
 
 
-def test_viewable_file_small_size(test_dir, mock_user):
+def test_viewable_file_small_size(test_dir, client):
     """Test that small viewable files work correctly"""
-    from app.api.file.view_file import view_file
     
     tmp_path, data_dir = test_dir
     
@@ -112,16 +99,14 @@ def test_viewable_file_small_size(test_dir, mock_user):
     with open(text_file, 'w') as f:
         f.write("Hello, World!")
     
-    response = run_async(view_file("test.txt", mock_user))
+    response = client.get("/api/file/view/test.txt")
     
     # Check that we got a FileResponse (not an exception)
-    assert response is not None
+    assert response.status_code == 200
 
 
-def test_download_url_format(test_dir, mock_user):
+def test_download_url_format(test_dir, client):
     """Test that download URLs are correctly formatted with URL encoding"""
-    from app.api.file.view_file import view_file
-    from fastapi import HTTPException
     
     tmp_path, data_dir = test_dir
     
@@ -130,19 +115,18 @@ def test_download_url_format(test_dir, mock_user):
     with open(special_file, 'wb') as f:
         f.write(b'test')
     
-    with pytest.raises(HTTPException) as exc_info:
-        run_async(view_file("test file with spaces.exe", mock_user))
+    response = client.get("/api/file/view/test file with spaces.exe")
     
     # Check that download URL is properly encoded
-    detail = exc_info.value.detail
+    detail = response.json()["detail"]
     assert "download_url" in detail
     # Spaces should be URL encoded
     assert "test%20file%20with%20spaces.exe" in detail["download_url"]
 
 
-def test_file_size_exactly_at_limit(test_dir, mock_user):
+def test_file_size_exactly_at_limit(test_dir, client):
     """Test file exactly at 30MB limit (should pass)"""
-    from app.api.file.view_file import view_file, MAX_VIEW_SIZE
+    from app.api.file.view_file import MAX_VIEW_SIZE
     
     tmp_path, data_dir = test_dir
     
@@ -152,14 +136,13 @@ def test_file_size_exactly_at_limit(test_dir, mock_user):
         f.write(b'0' * MAX_VIEW_SIZE)
     
     # Should not raise an exception
-    response = run_async(view_file("exactly_at_limit.mp4", mock_user))
-    assert response is not None
+    response = client.get("/api/file/view/exactly_at_limit.mp4")
+    assert response.status_code == 200
 
 
-def test_file_size_just_over_limit(test_dir, mock_user):
+def test_file_size_just_over_limit(test_dir, client):
     """Test file just over 30MB limit (should fail)"""
-    from app.api.file.view_file import view_file, MAX_VIEW_SIZE
-    from fastapi import HTTPException
+    from app.api.file.view_file import MAX_VIEW_SIZE
     
     tmp_path, data_dir = test_dir
     
@@ -168,8 +151,7 @@ def test_file_size_just_over_limit(test_dir, mock_user):
     with open(over_file, 'wb') as f:
         f.write(b'0' * (MAX_VIEW_SIZE + 1))
     
-    with pytest.raises(HTTPException) as exc_info:
-        run_async(view_file("just_over.mp4", mock_user))
+    response = client.get("/api/file/view/just_over.mp4")
     
     # Check status code
-    assert exc_info.value.status_code == 413
+    assert response.status_code == 413
@@ -0,0 +1,123 @@
+"""
+Tests for deterministic, range-addressable stored zip archives
+"""
+import io
+import os
+import zipfile
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """Create a folder with a few files"""
+    root = tmp_path / "data" / "test_user" / "backup"
+    (root / "docs").mkdir(parents=True)
+    (root / "docs" / "readme.md").write_text("# backup\n" * 50)
+    (root / "empty").write_bytes(b"")
+    (root / "video.mp4").write_bytes(os.urandom(700_000))
+    (root / "naïve.txt").write_text("unicode")
+    return root
+
+
+def build(folder):
+    from app.services.archive.zip_layout import StoredZipLayout
+    from app.services.archive.listing import iter_folder_files
+
+    return StoredZipLayout(iter_folder_files(str(folder)))
+
+
+def test_layout_matches_output(folder):
+    """Test that the precomputed size matches the generated archive"""
+    layout = build(folder)
+    data = b"".join(layout.iter_range())
+    assert len(data) == layout.total_size
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+        assert zf.read("video.mp4") == (folder / "video.mp4").read_bytes()
+        assert zf.read("naïve.txt") == b"unicode"
+        assert len(zf.namelist()) == 4
+
+
+def test_layout_is_deterministic(folder):
+    """Test that the same files produce identical bytes and ETag"""
+    first, second = build(folder), build(folder)
+    assert first.etag == second.etag
+    assert b"".join(first.iter_range()) == b"".join(second.iter_range())
+
+    (folder / "new.txt").write_text("added")
+    assert build(folder).etag != first.etag
+
+
+def test_any_range_matches_full_archive(folder):
+    """Test that every range equals the same slice of the full archive"""
+    layout = build(folder)
+    full = b"".join(layout.iter_range())
+    size = layout.total_size
+
+    cuts = [0, 1, 29, 30, 100, 600_000, layout.cd_offset - 1, layout.cd_offset, size - 22, size - 1]
+    for start in cuts:
+        for end in (start + 1, start + 77, size):
+            end = min(end, size)
+            assert b"".join(layout.iter_range(start, end)) == full[start:end]
+
+
+def test_changed_file_is_detected(folder):
+    """Test that a file changing after the layout was computed aborts"""
+    from app.services.archive.zip_layout import ArchiveChangedError
+
+    layout = build(folder)
+    (folder / "video.mp4").write_bytes(b"shorter")
+    with pytest.raises(ArchiveChangedError):
+        b"".join(layout.iter_range())
+
+
+@pytest.fixture
+def client(folder, mock_user):
+    """Create a test client for the folder download route"""
+    from app.api.folder.download_folder import download_folder_router
+    from app.api.dependencies import get_current_user
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(folder.parent.parent.parent)
+
+    app = FastAPI()
+    app.include_router(download_folder_router, prefix="/api/folder")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with patch('app.services.folder.paths.config', mock_settings):
+        with TestClient(app) as client:
+            yield client
+
+
+def test_resumable_download(folder, client):
+    """Test Content-Length and resuming with Range / If-Range"""
+    url = "/api/folder/download/backup?resumable=true"
+    response = client.get(url)
+    assert response.status_code == 200
+    full = response.content
+    assert response.headers["content-length"] == str(len(full))
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+
+    # Resume after the connection dropped half way
+    half = len(full) // 2
+    response = client.get(url, headers={"Range": f"bytes={half}-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {half}-{len(full) - 1}/{len(full)}"
+    assert full[:half] + response.content == full
+
+    # A stale validator restarts the download
+    response = client.get(url, headers={"Range": f"bytes={half}-", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == full
+
+    response = client.get(url, headers={"Range": f"bytes={len(full)}-"})
+    assert response.status_code == 416
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,146 @@
+"""
+Tests for the streaming zip writer used by folder downloads
+"""
+import io
+import os
+import zipfile
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """Create a folder with nested, empty, binary and unicode-named files"""
+    root = tmp_path / "data" / "test_user" / "album"
+    (root / "sub" / "deeper").mkdir(parents=True)
+    (root / "a.txt").write_text("hello world\n" * 1000)
+    (root / "empty.bin").write_bytes(b"")
+    (root / "sub" / "random.bin").write_bytes(os.urandom(3 * 1024 * 1024 + 5))
+    (root / "sub" / "deeper" / "café.md").write_text("# menu")
+    return root
+
+
+def read_expected(folder):
+    expected = {}
+    for dirpath, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            arcname = os.path.relpath(path, folder).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                expected[arcname] = f.read()
+    return expected
+
+
+def test_stream_is_valid_zip(folder):
+    """Test that the streamed archive opens and matches the folder"""
+    from app.services.archive.listing import iter_folder_files
+    from app.services.archive.zip_stream import ZipStream
+
+    data = b"".join(ZipStream(iter_folder_files(str(folder))))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        contents = {name: zf.read(name) for name in zf.namelist()}
+        assert zf.getinfo("a.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("sub/random.bin").compress_type == zipfile.ZIP_STORED
+
+    assert contents == read_expected(folder)
+
+
+def test_stream_is_lazy(tmp_path):
+    """Test that output starts before files past the prefetch window are opened"""
+    from app.services.archive.listing import iter_folder_files
+    from app.services.archive.zip_stream import ZipStream, PREFETCH_ENTRIES
+
+    for index in range(PREFETCH_ENTRIES * 2):
+        (tmp_path / f"{index:04}.bin").write_bytes(os.urandom(300_000))
+
+    opened = []
+
+    def tracking_files():
+        for item in iter_folder_files(str(tmp_path)):
+            opened.append(item[1])
+            yield item
+
+    stream = iter(ZipStream(tracking_files()))
+    next(stream)
+    assert len(opened) <= PREFETCH_ENTRIES + 1
+    stream.close()
+
+
+def test_adaptive_methods(tmp_path):
+    """Test that media and incompressible data are stored, text is deflated"""
+    from app.services.archive.listing import iter_folder_files
+    from app.services.archive.zip_stream import ZipStream, BLOCK_SIZE
+
+    (tmp_path / "photo.jpg").write_bytes(os.urandom(5000))
+    (tmp_path / "noise.bin").write_bytes(os.urandom(5000))
+    (tmp_path / "big-noise.dat").write_bytes(os.urandom(BLOCK_SIZE * 2 + 7))
+    text = "".join(f"line {i} of the log file\n" for i in range(200_000)).encode()
+    (tmp_path / "server.log").write_bytes(text)
+    (tmp_path / "tiny.txt").write_bytes(b"hi")
+
+    data = b"".join(ZipStream(iter_folder_files(str(tmp_path)), compression_level=6))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+        assert zf.read("server.log") == text
+        # Blocks compressed in parallel still compress well
+        assert zf.getinfo("server.log").compress_size < len(text) // 5
+
+    assert methods == {
+        "big-noise.dat": zipfile.ZIP_STORED,
+        "noise.bin": zipfile.ZIP_STORED,
+        "photo.jpg": zipfile.ZIP_STORED,
+        "server.log": zipfile.ZIP_DEFLATED,
+        "tiny.txt": zipfile.ZIP_STORED,
+    }
+
+
+def test_compression_level_zero_stores_everything(folder):
+    """Test that level 0 disables compression"""
+    from app.services.archive.listing import iter_folder_files
+    from app.services.archive.zip_stream import ZipStream
+
+    data = b"".join(ZipStream(iter_folder_files(str(folder)), compression_level=0))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+        assert {name: zf.read(name) for name in zf.namelist()} == read_expected(folder)
+
+
+def test_zip64_end_records(folder):
+    """Test that ZIP64 end records are written when the entry count overflows"""
+    from app.services.archive import zip_stream
+    from app.services.archive.listing import iter_folder_files
+
+    with patch.object(zip_stream, "ZIP_MAX_ENTRIES", 2):
+        data = b"".join(zip_stream.ZipStream(iter_folder_files(str(folder))))
+
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert len(zf.namelist()) == 4
+        assert zf.testzip() is None
+
+
+def test_download_folder_streams(folder, mock_user):
+    """Test the download endpoint returns a streamed zip"""
+    from app.api.folder.download_folder import download_folder_router
+    from app.api.dependencies import get_current_user
+
+    mock_settings = Mock()
+    mock_settings.DIR_LOCATION = str(folder.parent.parent.parent)
+
+    app = FastAPI()
+    app.include_router(download_folder_router, prefix="/api/folder")
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+
+    with patch('app.services.folder.paths.config', mock_settings):
+        with TestClient(app) as client:
+            response = client.get("/api/folder/download/album")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert 'filename="album.zip"' in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == read_expected(folder)